@@ -0,0 +1,129 @@
+# analyzer-service/app/bench_clients.py
+"""Compare a client per call with the shared clients from clients.py.
+
+Starts a local HTTP/1.1 keep-alive server standing in for database-service,
+the team matcher and scraped sites, then:
+
+- simulates analyses, each making the three internal hops (GET the lead,
+  POST the analysis, POST the team match), with a new httpx.AsyncClient per
+  hop and with the shared one from create_http_client();
+- fetches pages with a new aiohttp.ClientSession per page and with the
+  shared session from create_scraper_session().
+
+Reports throughput, p50 latency and the TCP connections the server saw,
+counted as distinct client addresses (a lower bound once closed ports are
+reused).
+
+Usage: python -m app.bench_clients [analyses] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List, Set, Tuple
+
+import aiohttp
+import httpx
+from aiohttp import web
+
+from .clients import create_http_client, create_scraper_session
+
+# The internal calls one analysis makes
+ANALYSIS_HOPS = [("GET", "/leads/{index}"), ("POST", "/analyses/"), ("POST", "/team-matches/")]
+
+PAGE_HTML = "<html><body>" + "<p>Company page text.</p>" * 200 + "</body></html>"
+
+
+async def start_server() -> Tuple[web.AppRunner, str, Set[Tuple[str, int]]]:
+    """A local server answering every path; returns its runner, base URL and the client ends it has seen"""
+    peers: Set[Tuple[str, int]] = set()
+
+    async def handle(request: web.Request) -> web.Response:
+        peers.add(request.transport.get_extra_info("peername"))
+        if request.path.startswith("/pages/"):
+            return web.Response(text=PAGE_HTML, content_type="text/html")
+        return web.json_response({"id": 1, "company_name": "Bench", "email": "bench@bench.test"})
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}", peers
+
+
+async def measure(task: Callable[[int], Awaitable[None]], count: int, concurrency: int) -> Tuple[float, float]:
+    """Run `task` `count` times with `concurrency` in flight; returns (runs/s, p50 seconds)"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(count):
+        queue.put_nowait(index)
+    latencies: List[float] = []
+
+    async def worker():
+        while not queue.empty():
+            index = queue.get_nowait()
+            started = time.perf_counter()
+            await task(index)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return count / (time.perf_counter() - started), statistics.median(latencies)
+
+
+async def run(analyses: int, concurrency: int):
+    runner, base_url, peers = await start_server()
+    try:
+        async def hop(client: httpx.AsyncClient, method: str, path: str, index: int):
+            body = None if method == "GET" else {"lead_id": index}
+            response = await client.request(method, f"{base_url}{path}", json=body)
+            response.raise_for_status()
+
+        async def analysis_client_per_hop(index: int):
+            for method, path in ANALYSIS_HOPS:
+                async with httpx.AsyncClient() as client:
+                    await hop(client, method, path.format(index=index), index)
+
+        shared_client = create_http_client()
+
+        async def analysis_shared_client(index: int):
+            for method, path in ANALYSIS_HOPS:
+                await hop(shared_client, method, path.format(index=index), index)
+
+        async def page_session_per_fetch(index: int):
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{base_url}/pages/{index}") as response:
+                    await response.read()
+
+        shared_session = create_scraper_session()
+
+        async def page_shared_session(index: int):
+            async with shared_session.get(f"{base_url}/pages/{index}") as response:
+                await response.read()
+
+        cases = [
+            ("analyses, client per hop", analysis_client_per_hop),
+            ("analyses, shared client", analysis_shared_client),
+            ("pages, session per fetch", page_session_per_fetch),
+            ("pages, shared session", page_shared_session),
+        ]
+        try:
+            for label, task in cases:
+                peers.clear()
+                rate, p50 = await measure(task, analyses, concurrency)
+                print(f"{label:26} {rate:8,.1f}/s  p50 {p50 * 1000:7.1f} ms  {len(peers):5} TCP connections")
+        finally:
+            await shared_client.aclose()
+            await shared_session.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) > 2 or not all(arg.isdigit() for arg in args):
+        print("Usage: python -m app.bench_clients [analyses] [concurrency]")
+        sys.exit(2)
+    asyncio.run(run(int(args[0]) if args else 600, int(args[1]) if len(args) > 1 else 20))
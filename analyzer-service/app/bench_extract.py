@@ -0,0 +1,146 @@
+# analyzer-service/app/bench_extract.py
+"""Micro-benchmark of page text extraction over a directory of saved pages.
+
+Compares the old path (whole page decoded, BeautifulSoup's html.parser,
+truncated afterwards) with the scraper's current one (byte budget, lxml).
+Each implementation runs in its own subprocess so its peak RSS is measured
+on its own.
+
+Without a corpus_dir, the synthetic corpus from generate_corpus() is written
+to a scratch directory and measured: six pages of 20 KB to 8 MB with a long
+nav, inline scripts and styles, and comments.
+
+Usage: python -m app.bench_extract [corpus_dir] [rounds]
+"""
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+from .services.html_text import MAX_PAGE_BYTES, MAX_TEXT_CHARS, html_to_text
+
+
+def legacy_html_to_text(html: bytes) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html.decode("utf-8", errors="replace"), "html.parser")
+    for element in soup(["script", "style", "nav", "footer", "header"]):
+        element.decompose()
+    lines = (line.strip() for line in soup.get_text().splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)[:MAX_TEXT_CHARS]
+
+
+def current_html_to_text(html: bytes) -> str:
+    # What read_html would have handed over
+    return html_to_text(html[:MAX_PAGE_BYTES])
+
+
+IMPLEMENTATIONS = {"legacy": legacy_html_to_text, "current": current_html_to_text}
+
+# Synthetic pages: file name and approximate size in characters
+SYNTHETIC_PAGES = [
+    ("a_50k", 50_000), ("b_300k", 300_000), ("c_2m", 2_000_000),
+    ("d_8m", 8_000_000), ("e_20k", 20_000), ("f_120k", 120_000),
+]
+SYNTHETIC_WORDS = (
+    "acme widgets enterprise cloud logistics founded employees clients revenue "
+    "platform global offices customers solutions"
+).split()
+
+
+def synthetic_page(rng: random.Random, size: int) -> str:
+    def words(count: int) -> str:
+        return " ".join(rng.choice(SYNTHETIC_WORDS) for _ in range(count))
+
+    head = (
+        "<html><head><meta charset='utf-8'><title>Acme</title>"
+        f"<style>{'body{color:red}' * 200}</style><script>{'var x=1;' * 500}</script></head><body>"
+    )
+    nav = "<header><nav>" + "".join(f"<a href='/p{index}'>Link {index}</a>" for index in range(80)) + "</nav></header>"
+    parts = [head, nav]
+    length = len(head) + len(nav)
+    section = 0
+    while length < size:
+        text = f"<p>{words(60)} <b>{words(3)}</b> {words(20)}</p>"
+        items = "".join(f"<li>{words(5)}</li>" for _ in range(5))
+        part = (
+            f"<div class='sec'><h2>Section {section}</h2>{text}"
+            f"<!-- c --><ul>{items}</ul><script>track({section})</script></div>\n"
+        )
+        parts.append(part)
+        length += len(part)
+        section += 1
+    parts.append(f"<footer>{words(50)}</footer></body></html>")
+    return "".join(parts)
+
+
+def generate_corpus(corpus_dir: str):
+    """Write the synthetic corpus; the same seed gives the same pages on every run"""
+    rng = random.Random(1)
+    for name, size in SYNTHETIC_PAGES:
+        with open(os.path.join(corpus_dir, f"{name}.html"), "w") as f:
+            f.write(synthetic_page(rng, size))
+
+
+def load_corpus(corpus_dir: str) -> List[bytes]:
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith((".html", ".htm")):
+            with open(os.path.join(corpus_dir, name), "rb") as f:
+                pages.append(f.read())
+    return pages
+
+
+def run(name: str, corpus_dir: str, rounds: int):
+    """Child process: extract every page `rounds` times and report timings and peak RSS"""
+    extract: Callable[[bytes], str] = IMPLEMENTATIONS[name]
+    pages = load_corpus(corpus_dir)
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    chars = 0
+    for _ in range(rounds):
+        for page in pages:
+            started = time.perf_counter()
+            chars += len(extract(page))
+            timings.append(time.perf_counter() - started)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings.sort()
+    print(
+        f"{name:8} pages={len(pages)} total={sum(timings):.3f}s "
+        f"p50={timings[len(timings) // 2] * 1000:.1f}ms max={timings[-1] * 1000:.1f}ms "
+        f"peak_rss={peak_kb / 1024:.1f}MB (+{(peak_kb - baseline_kb) / 1024:.1f}MB over corpus load) "
+        f"chars/page={chars // max(len(timings), 1)}"
+    )
+
+
+def main(corpus_dir: str, rounds: int):
+    pages = load_corpus(corpus_dir)
+    if not pages:
+        print(f"No .html files in {corpus_dir}")
+        sys.exit(1)
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / 1e6:.1f}MB, {rounds} rounds")
+    for name in IMPLEMENTATIONS:
+        subprocess.run(
+            [sys.executable, "-m", "app.bench_extract", "--run", name, corpus_dir, str(rounds)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--run"]:
+        run(args[1], args[2], int(args[3]))
+    elif not args:
+        corpus_dir = tempfile.mkdtemp(prefix="bench-extract-")
+        generate_corpus(corpus_dir)
+        main(corpus_dir, 3)
+    elif len(args) in (1, 2):
+        main(args[0], int(args[1]) if len(args) == 2 else 3)
+    else:
+        print("Usage: python -m app.bench_extract [corpus_dir] [rounds]")
+        sys.exit(2)
@@ -0,0 +1,191 @@
+# analyzer-service/app/bench_select.py
+"""Compare the extraction prompt content of the old truncation and of content selection.
+
+The corpus directory holds saved pages plus a facts.json listing, per
+company, its pages (best search match first) and the facts a good
+extraction should find, e.g. "founded in 1998" or "250 employees":
+
+    [{"company": "Acme", "pages": ["acme_home.html", "acme_about.html"], "facts": ["..."]}]
+
+For each company both paths build the text that goes into the extraction
+prompt; a fact counts as recalled if it appears in that text (ignoring case
+and whitespace). Smaller content with equal or better recall means a
+cheaper, faster call that has at least the same information to work with.
+
+Without a corpus_dir, both synthetic fixtures from generate_corpus() are
+written to scratch directories and measured: 20 companies with a home and
+an about page each and seven facts per company, once with long pages whose
+facts are spread through the page and once with short pages.
+
+Usage: python -m app.bench_select [corpus_dir]
+"""
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .services.content_select import EXTRACTION_TOKEN_BUDGET, estimate_tokens, select_content
+from .services.html_text import html_to_text
+from .services.web_scraper import PAGE_TEXT_CHARS
+
+# What the scraper did before content selection
+LEGACY_PAGE_CHARS = 15000
+LEGACY_MERGED_CHARS = 10000
+
+
+def legacy_content(pages: Dict[str, bytes]) -> str:
+    texts = {name: html_to_text(html, max_chars=LEGACY_PAGE_CHARS) for name, html in pages.items()}
+    share = LEGACY_MERGED_CHARS // max(len(texts), 1)
+    merged = "\n\n".join(f"Source: {name}\n{text[:share]}" for name, text in texts.items())
+    return merged[:LEGACY_MERGED_CHARS]
+
+
+def selected_content(pages: Dict[str, bytes], company_name: str) -> str:
+    texts = {name: html_to_text(html, max_chars=PAGE_TEXT_CHARS) for name, html in pages.items()}
+    return select_content(texts, company_name)
+
+
+COMPANIES = [
+    "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark Tools", "Wayne Foods", "Acme Labs", "Soylent",
+    "Tyrell", "Cyberdyne", "Massive Dynamic", "Aperture", "Oscorp", "Pied Piper", "Wonka", "Gringotts",
+    "Nakatomi", "Virtucon", "Monarch",
+]
+CITIES = ["Austin, Texas", "Denver, Colorado", "Leeds, UK", "Toronto, Canada", "Lyon, France"]
+INDUSTRIES = ["logistics software", "organic food distribution", "industrial robotics", "fintech payments", "dental clinics"]
+CLIENTS = ["Northwind", "Contoso", "Fabrikam", "Tailspin", "Litware", "Adventure Works", "Proseware"]
+MENU = ["Home", "About", "Services", "Work", "Blog", "Careers", "Contact", "Privacy", "Terms", "Login", "Pricing", "Partners"]
+# Marketing copy with no facts in it
+FILLER = [
+    "We deliver innovative solutions that help ambitious brands grow faster.",
+    "Our award-winning approach blends creativity with data to unlock value.",
+    "Discover how we transform ideas into outcomes across every channel.",
+    "Read the latest insights from our experts on strategy and design.",
+    "Posted on March 3, 2023 by the editorial desk in News.",
+    "Sign up for our newsletter to receive monthly tips and updates.",
+    "We believe great work starts with listening and ends with measurable results.",
+    "Explore our portfolio of projects across retail, health and finance.",
+    "Cookies help us deliver our services. By using the site you agree to our use of cookies.",
+    "Learn more about how our process works from discovery to launch.",
+]
+
+
+def generate_corpus(corpus_dir: str, long_pages: bool = True):
+    """Write pages and facts.json; the same seed gives the same corpus on every run.
+
+    With `long_pages` the facts sit among hundreds of filler paragraphs, below
+    a menu and a link grid; otherwise there are only a few paragraphs around them.
+    """
+    rng = random.Random(7)
+
+    def fillers(count: int) -> str:
+        return "".join(f"<p>{rng.choice(FILLER)} {rng.choice(FILLER)}</p>" for _ in range(count))
+
+    def page(name: str, sections: List[str]) -> str:
+        menu = "<header><div class='menu'>" + "".join(
+            f"<div class='item'><a href='#'>{link}</a></div>" for link in MENU * 4
+        ) + "</div></header>"
+        # Outside <nav> and <header>, so boilerplate stripping keeps it
+        grid = "<div class='grid'>" + "".join(
+            f"<div><a href='#'>{rng.choice(['Read more', 'Case study', 'Learn more', 'View project'])} {index}</a></div>"
+            for index in range(40)
+        ) + "</div>"
+        footer = "<div class='f'>" + "".join(
+            f"<p>{line}</p>" for line in [f"© 2024 {name}", "All rights reserved", "Subscribe", FILLER[8]]
+        ) + "</div>"
+        return f"<html><head><title>{name}</title></head><body>{menu}{grid}{''.join(sections)}{footer}</body></html>"
+
+    companies = []
+    for index, name in enumerate(COMPANIES):
+        founded = rng.randint(1950, 2018)
+        employees = rng.choice([12, 45, 120, 250, 800, 3400])
+        revenue = rng.choice([3, 12, 45, 210])
+        city = rng.choice(CITIES)
+        industry = rng.choice(INDUSTRIES)
+        clients = rng.sample(CLIENTS, 2)
+        linkedin = f"linkedin.com/company/{name.lower().replace(' ', '-')}"
+        facts = [
+            f"founded in {founded}", f"{employees} employees", f"${revenue} million",
+            f"headquartered in {city}", industry, clients[0], linkedin,
+        ]
+        home = page(name, [
+            f"<h1>{name}</h1><p>Leaders in {industry}.</p>",
+            fillers(rng.randint(60, 160) if long_pages else rng.randint(1, 4)),
+            f"<h2>Trusted by</h2><p>{clients[0]} and {clients[1]} rely on us every day.</p>",
+            fillers(40 if long_pages else 2),
+        ])
+        about = page(name, [
+            fillers(rng.randint(80, 200) if long_pages else rng.randint(1, 3)),
+            f"<h2>About us</h2><p>{name} was founded in {founded} and is headquartered in {city}.</p>",
+            fillers(20 if long_pages else 1),
+            f"<h2>Our team</h2><p>Today we have {employees} employees across three offices.</p>",
+            fillers(30 if long_pages else 2),
+            f"<p>Last year revenue reached ${revenue} million.</p>",
+            f"<p>Follow us: {linkedin}</p>",
+        ])
+        files = []
+        for kind, html in (("home", home), ("about", about)):
+            file_name = f"{index:02d}_{kind}.html"
+            with open(os.path.join(corpus_dir, file_name), "w") as f:
+                f.write(html)
+            files.append(file_name)
+        companies.append({"company": name, "pages": files, "facts": facts})
+    with open(os.path.join(corpus_dir, "facts.json"), "w") as f:
+        json.dump(companies, f, indent=1)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).lower()
+
+
+def recalled(content: str, facts: List[str]) -> int:
+    content = _normalize(content)
+    return sum(_normalize(fact) in content for fact in facts)
+
+
+def main(corpus_dir: str):
+    with open(os.path.join(corpus_dir, "facts.json")) as f:
+        companies = json.load(f)
+
+    totals = {"legacy": [0, 0, 0.0], "selected": [0, 0, 0.0]}  # tokens, facts recalled, seconds
+    fact_count = 0
+    for company in companies:
+        pages = {}
+        for name in company["pages"]:
+            with open(os.path.join(corpus_dir, name), "rb") as f:
+                pages[name] = f.read()
+        fact_count += len(company["facts"])
+        for label, build in (
+            ("legacy", lambda: legacy_content(pages)),
+            ("selected", lambda: selected_content(pages, company["company"])),
+        ):
+            started = time.perf_counter()
+            content = build()
+            totals[label][2] += time.perf_counter() - started
+            totals[label][0] += estimate_tokens(content)
+            totals[label][1] += recalled(content, company["facts"])
+
+    print(f"{len(companies)} companies, {fact_count} facts, budget {EXTRACTION_TOKEN_BUDGET} tokens")
+    for label, (tokens, hits, seconds) in totals.items():
+        print(
+            f"{label:8} tokens/prompt={tokens / len(companies):.0f} "
+            f"fact recall={hits}/{fact_count} ({hits / fact_count:.0%}) "
+            f"time/company={seconds / len(companies) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        for label, long_pages in (("long pages, facts spread through the page", True), ("short pages", False)):
+            corpus_dir = tempfile.mkdtemp(prefix="bench-select-")
+            generate_corpus(corpus_dir, long_pages)
+            print(f"Synthetic corpus, {label}")
+            main(corpus_dir)
+    elif len(sys.argv) == 2:
+        main(sys.argv[1])
+    else:
+        print("Usage: python -m app.bench_select [corpus_dir]")
+        sys.exit(2)
@@ -0,0 +1,141 @@
+# analyzer-service/app/check_cascade.py
+"""Behaviour check for the analysis model cascade.
+
+Runs AnalyzerService.analyze_lead over a two-tier ModelCascade of FakeModels
+scripted per case, so the escalation policy is exercised offline with the
+real prompt parsing. Any case where the decision, the tier that answered,
+the calls made or the tier counters differ from what the cascade promises
+fails the run:
+
+- a valid first-tier answer is served without calling the stronger tier
+- a first-tier "Maybe" is escalated and the stronger tier's answer served
+- unparseable output is escalated
+- an erroring stronger tier falls back to the cheaper tier's valid answer
+- when no tier gives a valid answer, the lead gets the fallback "Maybe"
+
+Usage: python -m app.check_cascade
+"""
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Any, List, Optional
+
+from .services.analyzer_service import AnalyzerService
+from .services.llm import FakeModel, ModelCascade
+
+CHEAP_TIER = "fake-flash"
+STRONG_TIER = "fake-pro"
+
+LEAD = {"id": 1, "company_name": "Acme", "revenue": 2000000, "service_type": "SEO", "message": "New site"}
+
+
+def answer(decision: str) -> Callable[[str], str]:
+    """A model that returns a valid analysis with `decision`, fenced like Gemini does"""
+    body = json.dumps({
+        "analysis": f"Scripted {decision} analysis",
+        "decision": decision,
+        "company_details": {"estimated_revenue": "$2M", "key_findings": []},
+    })
+    return lambda prompt: f"```json\n{body}\n```"
+
+
+def garbage(prompt: str) -> str:
+    return "I think this lead is promising, but I can't say more."
+
+
+def failure(prompt: str) -> str:
+    raise RuntimeError("Scripted model failure")
+
+
+@dataclass
+class CascadeCheck:
+    name: str
+    cheap: Callable[[str], str]
+    strong: Callable[[str], str]
+    decision: str
+    model: Optional[str]  # Tier that answered; None for the fallback result
+    calls: Dict[str, int]
+    # Expected non-zero tier counters, e.g. {"fake-flash": {"escalated": 1}}
+    counters: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+
+CHECKS: List[CascadeCheck] = [
+    CascadeCheck(
+        "confident first tier", answer("Yes"), answer("No"), "Yes", CHEAP_TIER,
+        calls={CHEAP_TIER: 1, STRONG_TIER: 0},
+        counters={CHEAP_TIER: {"served": 1}},
+    ),
+    CascadeCheck(
+        "escalates Maybe", answer("Maybe"), answer("Yes"), "Yes", STRONG_TIER,
+        calls={CHEAP_TIER: 1, STRONG_TIER: 1},
+        counters={CHEAP_TIER: {"escalated": 1}, STRONG_TIER: {"served": 1}},
+    ),
+    CascadeCheck(
+        "escalates unparseable", garbage, answer("No"), "No", STRONG_TIER,
+        calls={CHEAP_TIER: 1, STRONG_TIER: 1},
+        counters={CHEAP_TIER: {"invalid": 1}, STRONG_TIER: {"served": 1}},
+    ),
+    CascadeCheck(
+        "strong tier errors", answer("Maybe"), failure, "Maybe", CHEAP_TIER,
+        calls={CHEAP_TIER: 1, STRONG_TIER: 1},
+        counters={CHEAP_TIER: {"escalated": 1, "served": 1}, STRONG_TIER: {"errors": 1}},
+    ),
+    CascadeCheck(
+        "every tier fails", failure, garbage, "Maybe", None,
+        calls={CHEAP_TIER: 1, STRONG_TIER: 1},
+        counters={CHEAP_TIER: {"errors": 1}, STRONG_TIER: {"invalid": 1}},
+    ),
+]
+
+COUNTERS = ("errors", "invalid", "escalated", "served")
+
+
+async def run_check(check: CascadeCheck) -> List[str]:
+    calls = {CHEAP_TIER: 0, STRONG_TIER: 0}
+
+    def counted(name: str, respond: Callable[[str], str]) -> Callable[[str], str]:
+        def generate(prompt: str) -> str:
+            calls[name] += 1
+            return respond(prompt)
+        return generate
+
+    cascade = ModelCascade([
+        FakeModel(CHEAP_TIER, counted(CHEAP_TIER, check.cheap)),
+        FakeModel(STRONG_TIER, counted(STRONG_TIER, check.strong)),
+    ])
+    result = await AnalyzerService(cascade).analyze_lead(LEAD)
+
+    failures = []
+    if result.final_decision != check.decision:
+        failures.append(f"{check.name}: decision {result.final_decision!r}, expected {check.decision!r}")
+    if result.model != check.model:
+        failures.append(f"{check.name}: answered by {result.model!r}, expected {check.model!r}")
+    if check.model is None and "error" not in result.company_details:
+        failures.append(f"{check.name}: expected the fallback result, got {result.company_details}")
+    if calls != check.calls:
+        failures.append(f"{check.name}: calls {calls}, expected {check.calls}")
+    for name, stats in cascade.stats()["by_tier"].items():
+        got = {counter: stats[counter] for counter in COUNTERS if stats[counter]}
+        expected = check.counters.get(name, {})
+        if got != expected:
+            failures.append(f"{check.name}: {name} counters {got}, expected {expected}")
+    return failures
+
+
+async def run_checks() -> List[str]:
+    failures: List[str] = []
+    for check in CHECKS:
+        check_failures = await run_check(check)
+        print(f"{check.name:22} {'failed' if check_failures else 'passed'}")
+        failures.extend(check_failures)
+    return failures
+
+
+if __name__ == "__main__":
+    failures = asyncio.run(run_checks())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(CHECKS)} cascade checks passed")
@@ -0,0 +1,201 @@
+# analyzer-service/app/check_scraper.py
+"""Behaviour check for the concurrent page scrape.
+
+Starts a local aiohttp server with fast, slow, failing and very large pages
+and runs WebScraper._scrape_pages on the shared scraping session against it,
+with a short deadline. Any case whose pages or timing differ from what the
+scraper promises fails the run:
+
+- pages that finish in time are used, slower ones are abandoned at the deadline
+- a failing page is dropped without holding up the others
+- a large page is cut off after MAX_PAGE_BYTES, not downloaded whole
+- no more than MAX_FETCHES_PER_DOMAIN fetches hit one site at a time
+
+Usage: python -m app.check_scraper
+"""
+import asyncio
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Short enough to keep the run quick, long enough for the fast pages on a busy machine
+DEADLINE_SECONDS = 2.0
+# Allowed lateness when the scrape should end at the deadline
+DEADLINE_SLACK_SECONDS = 0.5
+
+# Served slower than the deadline
+SLOW_PAGE_SECONDS = 30
+# Served in full unless the client stops reading
+LARGE_PAGE_BYTES = 64 * 1024 * 1024
+LARGE_PAGE_CHUNK_BYTES = 64 * 1024
+# On top of MAX_PAGE_BYTES: what socket buffers may hold when the client stops reading
+LARGE_PAGE_SLACK_BYTES = 16 * 1024 * 1024
+
+PAGE_HTML = "<html><body><h1>{name}</h1><p>About {name}: founded in 1998, 250 employees.</p></body></html>"
+
+
+@dataclass
+class StubServer:
+    base_url: str = ""
+    in_flight: int = 0
+    max_in_flight: int = 0
+    large_page_bytes_sent: int = 0
+
+
+@dataclass
+class ScrapeCheck:
+    name: str
+    pages: List[str]  # Stub pages, in search-rank order
+    expected: List[str]  # Pages whose text must come back, in this order
+    ends_at_deadline: bool = False  # Otherwise it must finish well before the deadline
+    max_in_flight: Optional[int] = None
+
+
+def html_page(name: str) -> bytes:
+    return PAGE_HTML.format(name=name).encode()
+
+
+async def start_server(stub: StubServer):
+    from aiohttp import web
+
+    async def fast(request: web.Request) -> web.Response:
+        return web.Response(body=html_page(request.match_info["name"]), content_type="text/html")
+
+    async def slow(request: web.Request) -> web.Response:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # Stop once the client has gone, so shutdown doesn't wait for the full delay
+        while loop.time() - started < SLOW_PAGE_SECONDS:
+            if request.transport is None or request.transport.is_closing():
+                break
+            await asyncio.sleep(0.05)
+        return web.Response(body=html_page("slow"), content_type="text/html")
+
+    async def error(request: web.Request) -> web.Response:
+        return web.Response(status=500, text="Internal Server Error")
+
+    async def large(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        chunk = b"<p>" + b"x" * (LARGE_PAGE_CHUNK_BYTES - 8) + b"</p>\n"
+        await response.write(b"<html><body><h1>large</h1>")
+        try:
+            while stub.large_page_bytes_sent < LARGE_PAGE_BYTES:
+                await response.write(chunk)
+                stub.large_page_bytes_sent += len(chunk)
+        except (ConnectionResetError, ConnectionError):
+            pass
+        return response
+
+    @web.middleware
+    async def count_in_flight(request: web.Request, handler):
+        stub.in_flight += 1
+        stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+        try:
+            # A little work per page, so concurrent fetches overlap
+            await asyncio.sleep(0.05)
+            return await handler(request)
+        finally:
+            stub.in_flight -= 1
+
+    app = web.Application(middlewares=[count_in_flight])
+    app.router.add_get("/fast/{name}", fast)
+    app.router.add_get("/slow/{name}", slow)
+    app.router.add_get("/error/{name}", error)
+    app.router.add_get("/large/{name}", large)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    stub.base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    return runner
+
+
+def checks() -> List[ScrapeCheck]:
+    from .services.web_scraper import MAX_FETCHES_PER_DOMAIN
+
+    return [
+        ScrapeCheck("deadline", ["fast/a", "slow/b"], ["fast/a"], ends_at_deadline=True),
+        ScrapeCheck("only slow pages", ["slow/a", "slow/b"], [], ends_at_deadline=True),
+        ScrapeCheck("failing page", ["error/a", "fast/b"], ["fast/b"]),
+        ScrapeCheck("large page", ["large/a", "fast/b"], ["large/a", "fast/b"]),
+        ScrapeCheck(
+            "per-domain limit", [f"fast/{index}" for index in range(8)], [f"fast/{index}" for index in range(8)],
+            max_in_flight=MAX_FETCHES_PER_DOMAIN,
+        ),
+    ]
+
+
+async def run_check(scraper, stub: StubServer, check: ScrapeCheck) -> Tuple[List[str], str]:
+    """Returns the failures of one check and a one-line summary"""
+    from .services.html_text import MAX_PAGE_BYTES
+    from .services.web_scraper import PAGE_TEXT_CHARS
+
+    # Let the server finish with abandoned pages of the previous check
+    while stub.in_flight:
+        await asyncio.sleep(0.05)
+    stub.max_in_flight = 0
+    stub.large_page_bytes_sent = 0
+    urls = [f"{stub.base_url}/{page}" for page in check.pages]
+
+    started = time.perf_counter()
+    pages = await scraper._scrape_pages(urls)
+    elapsed = time.perf_counter() - started
+
+    failures = []
+    got = [url[len(stub.base_url) + 1:] for url in pages]
+    if got != check.expected:
+        failures.append(f"{check.name}: returned {got}, expected {check.expected}")
+    if check.ends_at_deadline:
+        if not DEADLINE_SECONDS <= elapsed <= DEADLINE_SECONDS + DEADLINE_SLACK_SECONDS:
+            failures.append(f"{check.name}: took {elapsed:.2f} s, expected about {DEADLINE_SECONDS:g} s")
+    elif elapsed >= DEADLINE_SECONDS:
+        failures.append(f"{check.name}: took {elapsed:.2f} s, reaching the {DEADLINE_SECONDS:g} s deadline")
+    if check.max_in_flight is not None and stub.max_in_flight > check.max_in_flight:
+        failures.append(f"{check.name}: {stub.max_in_flight} fetches at once, limit {check.max_in_flight}")
+    if "large/a" in check.pages:
+        sent = stub.large_page_bytes_sent
+        if sent >= MAX_PAGE_BYTES + LARGE_PAGE_SLACK_BYTES:
+            failures.append(f"{check.name}: server sent {sent:,} bytes, read budget is {MAX_PAGE_BYTES:,}")
+        text = pages.get(f"{stub.base_url}/large/a", "")
+        if len(text) > PAGE_TEXT_CHARS:
+            failures.append(f"{check.name}: kept {len(text):,} characters, limit {PAGE_TEXT_CHARS:,}")
+
+    summary = f"{check.name:18} {elapsed:5.2f} s  pages={got}  max in flight={stub.max_in_flight}"
+    if "large/a" in check.pages:
+        summary += f"  large page bytes sent={stub.large_page_bytes_sent:,}"
+    return failures, summary
+
+
+async def run_checks() -> List[str]:
+    from .clients import create_scraper_session
+    from .services.web_scraper import WebScraper
+
+    stub = StubServer()
+    runner = await start_server(stub)
+    session = create_scraper_session()
+    # Only the fetching is checked, so there is no cache or model behind the scraper
+    scraper = WebScraper(session, cache=None, models=None)
+    failures: List[str] = []
+    try:
+        for check in checks():
+            check_failures, summary = await run_check(scraper, stub, check)
+            print(summary)
+            failures.extend(check_failures)
+    finally:
+        await session.close()
+        await runner.cleanup()
+    return failures
+
+
+if __name__ == "__main__":
+    # Set before the scraper is imported, which reads it at import time
+    os.environ["SCRAPE_DEADLINE_SECONDS"] = str(DEADLINE_SECONDS)
+    failures = asyncio.run(run_checks())
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(checks())} scrape checks passed")
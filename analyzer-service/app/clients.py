@@ -0,0 +1,92 @@
+# analyzer-service/app/clients.py
+"""Process-wide clients, created once at startup and shared by every request.
+
+Building an httpx.AsyncClient / aiohttp.ClientSession per hop meant a new TCP
+(and TLS) handshake for every call to database-service, the team matcher and
+every scraped site, and building the services per request re-ran
+genai.configure and a GenerativeModel each time. main.py creates these on
+startup, keeps them on app.state and closes them on shutdown; routes get them
+through the dependencies below.
+"""
+import os
+
+import aiohttp
+import google.generativeai as genai
+import httpx
+from fastapi import Request
+
+from .pipeline import AnalysisRunner
+from .services.analyzer_service import ANALYSIS_GENERATION_CONFIG, ANALYSIS_MODEL_TIERS, AnalyzerService
+from .services.batch_jobs import BatchRunner
+from .services.prescreen import PreScreener
+from .services.llm import ModelCascade, gemini_cascade
+from .services.rate_limit import RateLimits
+from .services.web_scraper import EXTRACTION_GENERATION_CONFIG, EXTRACTION_MODEL_TIERS, WebScraper, USER_AGENT
+
+# Internal service calls: a handful of hosts, so a small keep-alive pool per host is plenty
+INTERNAL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+INTERNAL_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+# Scraping: many hosts, so bound the total and stay polite to any single site
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "100"))
+SCRAPER_MAX_PER_HOST = int(os.getenv("SCRAPER_MAX_PER_HOST", "4"))
+SCRAPER_KEEPALIVE_SECONDS = 30
+SCRAPER_DNS_CACHE_SECONDS = 300
+SCRAPER_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)
+
+
+def configure_genai():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is not set")
+    genai.configure(api_key=api_key)
+
+
+def create_analysis_models(limits: RateLimits) -> ModelCascade:
+    return gemini_cascade(ANALYSIS_MODEL_TIERS, ANALYSIS_GENERATION_CONFIG, limits)
+
+
+def create_extraction_models(limits: RateLimits) -> ModelCascade:
+    return gemini_cascade(EXTRACTION_MODEL_TIERS, EXTRACTION_GENERATION_CONFIG, limits)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(limits=INTERNAL_LIMITS, timeout=INTERNAL_TIMEOUT)
+
+
+def create_scraper_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=SCRAPER_MAX_CONNECTIONS,
+        limit_per_host=SCRAPER_MAX_PER_HOST,
+        keepalive_timeout=SCRAPER_KEEPALIVE_SECONDS,
+        ttl_dns_cache=SCRAPER_DNS_CACHE_SECONDS,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=SCRAPER_TIMEOUT,
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+async def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
+
+async def get_analyzer_service(request: Request) -> AnalyzerService:
+    return request.app.state.analyzer_service
+
+
+async def get_prescreener(request: Request) -> PreScreener:
+    return request.app.state.prescreener
+
+
+async def get_web_scraper(request: Request) -> WebScraper:
+    return request.app.state.web_scraper
+
+
+async def get_analysis_runner(request: Request) -> AnalysisRunner:
+    return request.app.state.analysis_runner
+
+
+async def get_batch_runner(request: Request) -> BatchRunner:
+    return request.app.state.batch_runner
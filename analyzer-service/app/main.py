@@ -1,12 +1,54 @@
 # analyzer-service/app/main.py
 import os
+from functools import partial
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .clients import (
+    configure_genai, create_analysis_models, create_extraction_models, create_http_client, create_scraper_session,
+)
+from .pipeline import AnalysisRunner, LeadNotFound, select_lead_ids
 from .routes import router
+from .services.analyzer_service import AnalyzerService
+from .services.batch_jobs import BatchJobStore, BatchRunner
+from .services.company_cache import CompanyIntelCache
+from .services.prescreen import PreScreener
+from .services.rate_limit import RateLimits
+from .services.web_scraper import WebScraper
 
 app = FastAPI(title="Lead Automation Analyzer Service")
 
+@app.on_event("startup")
+async def startup():
+    configure_genai()
+    app.state.http_client = create_http_client()
+    app.state.scraper_session = create_scraper_session()
+    app.state.llm_limits = RateLimits()
+    app.state.analysis_models = create_analysis_models(app.state.llm_limits)
+    app.state.extraction_models = create_extraction_models(app.state.llm_limits)
+    app.state.analyzer_service = AnalyzerService(app.state.analysis_models)
+    app.state.company_cache = CompanyIntelCache()
+    app.state.web_scraper = WebScraper(app.state.scraper_session, app.state.company_cache, app.state.extraction_models)
+    app.state.prescreener = PreScreener()
+    app.state.analysis_runner = AnalysisRunner(
+        app.state.http_client, app.state.analyzer_service, app.state.web_scraper, app.state.prescreener
+    )
+    app.state.batch_runner = BatchRunner(
+        BatchJobStore(),
+        analyze=app.state.analysis_runner.analyze,
+        select_leads=partial(select_lead_ids, app.state.http_client),
+        permanent_errors=(LeadNotFound,),
+    )
+    await app.state.batch_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.batch_runner.close()
+    await app.state.analysis_runner.close()
+    await app.state.http_client.aclose()
+    await app.state.scraper_session.close()
+    await app.state.company_cache.close()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
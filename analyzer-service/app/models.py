@@ -1,10 +1,13 @@
 # analyzer-service/app/models.py
 from pydantic import BaseModel
+from datetime import datetime
 from typing import Dict, Any, Optional, List
 
 class AnalysisRequest(BaseModel):
     """Optional additional context that can be provided to the analyzer"""
     additional_context: Optional[Dict[str, Any]] = None
+    # Call the model even if an analysis of identical inputs exists
+    force: bool = False
 
 class AnalysisResult(BaseModel):
     """Result of the lead analysis"""
@@ -12,10 +15,49 @@ class AnalysisResult(BaseModel):
     company_details: Dict[str, Any]
     llm_analysis: str
     final_decision: str  # "Yes", "No", "Maybe"
+    # Served from an earlier stored analysis of identical inputs instead of being worked out again
+    reused: bool = False
+    # Set when a pre-screening rule decided the lead without research or a model call
+    prescreen_rule: Optional[str] = None
+    # Model tier whose answer this is, when one was called
+    model: Optional[str] = None
+    # ID of the stored analysis
+    analysis_id: Optional[int] = None
 
 class WebScrapingResult(BaseModel):
     """Results from web scraping"""
     company_name: str
     website_url: Optional[str] = None
     found_data: Dict[str, Any]
-    raw_text: Optional[str] = None
\ No newline at end of file
+    raw_text: Optional[str] = None
+class BatchAnalysisRequest(BaseModel):
+    """Leads to (re-)analyse: explicit IDs, those matching a full-text search, or every lead"""
+    lead_ids: Optional[List[int]] = None
+    search: Optional[str] = None
+    all_leads: bool = False
+    # Re-analyse even leads whose inputs haven't changed since their last analysis
+    force: bool = False
+    # Leads analysed at once; the Gemini rate limit, not this, normally sets the pace
+    concurrency: Optional[int] = None
+
+class BatchItemFailure(BaseModel):
+    lead_id: int
+    attempts: int
+    error: Optional[str] = None
+
+class BatchJobStatus(BaseModel):
+    """Progress of a batch analysis job"""
+    job_id: str
+    status: str  # "resolving", "running", "completed", "failed"
+    selector: Dict[str, Any]
+    concurrency: int
+    created_at: datetime
+    updated_at: datetime
+    total: int
+    pending: int
+    done: int
+    failed: int
+    decisions: Dict[str, int]  # Final decision -> leads
+    leads_per_minute: float
+    failures: List[BatchItemFailure] = []
+    error: Optional[str] = None
@@ -0,0 +1,340 @@
+# analyzer-service/app/pipeline.py
+"""The scrape -> analyze -> save pipeline for one lead.
+
+Shared by POST /analyze/{lead_id} and the batch runner, so a lead analysed
+in a batch goes through exactly the same steps as one analysed on its own.
+Both go through AnalysisRunner, which runs it at most once at a time per lead.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from functools import partial
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+import httpx
+
+from .models import AnalysisResult
+from .services.analyzer_service import AnalyzerService
+from .services.prescreen import PreScreener
+from .services.singleflight import SingleFlight
+from .services.web_scraper import WebScraper
+
+DATABASE_SERVICE_URL = os.getenv("DATABASE_SERVICE_URL", "http://localhost:8000")
+TEAM_MATCHER_URL = os.getenv("TEAM_MATCHER_URL", "http://localhost:8003")
+
+# Lead IDs fetched per page when a batch is selected by search or covers every lead
+LEAD_PAGE_SIZE = 100
+
+# Lease on a lead's analysis in database-service; renewed while the run lasts,
+# so this only bounds how long a crashed worker blocks the lead
+ANALYSIS_LOCK_TTL_SECONDS = float(os.getenv("ANALYSIS_LOCK_TTL_SECONDS", "60"))
+# How often a worker waiting on another worker's lease checks it
+ANALYSIS_LOCK_POLL_SECONDS = 0.5
+
+
+class LeadNotFound(Exception):
+    pass
+
+
+class AnalysisNotSaved(Exception):
+    pass
+
+
+async def find_analysis(client: httpx.AsyncClient, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Latest stored analysis with this input fingerprint, if any"""
+    try:
+        response = await client.get(f"{DATABASE_SERVICE_URL}/analyses/by-fingerprint/{fingerprint}")
+    except httpx.HTTPError as e:
+        print(f"Error looking up analysis fingerprint: {str(e)}")
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+async def is_latest_analysis(client: httpx.AsyncClient, analysis: Dict[str, Any]) -> bool:
+    response = await client.get(f"{DATABASE_SERVICE_URL}/analyses/{analysis['lead_id']}", params={"fields": "id"})
+    return response.status_code == 200 and response.json().get("id") == analysis["id"]
+
+
+async def save_analysis(client: httpx.AsyncClient, analysis_result: AnalysisResult, fingerprint: Optional[str]) -> int:
+    """Store the analysis; returns its ID"""
+    analysis_data = {
+        "lead_id": analysis_result.lead_id,
+        "company_details": analysis_result.company_details,
+        "llm_analysis": analysis_result.llm_analysis,
+        "final_decision": analysis_result.final_decision,
+        "fingerprint": fingerprint
+    }
+
+    response = await client.post(f"{DATABASE_SERVICE_URL}/analyses/", json=analysis_data)
+
+    if response.status_code != 200:
+        print(f"Error saving analysis: {response.text}")
+        raise AnalysisNotSaved(f"Failed to save analysis for lead {analysis_result.lead_id}")
+    return response.json()["id"]
+
+
+async def run_analysis(
+    lead_id: int,
+    client: httpx.AsyncClient,
+    analyzer_service: AnalyzerService,
+    web_scraper: WebScraper,
+    prescreener: PreScreener,
+    force: bool = False,
+) -> AnalysisResult:
+    """Analyse a lead and save the result.
+
+    Clear-cut leads are decided by the pre-screening rules without any research
+    or model call, even with `force`; a verdict already stored as the lead's
+    latest analysis is not stored again. Otherwise, if an analysis of identical inputs
+    is stored (same lead details, company research, prompt and model), it is reused
+    instead of calling the model, unless `force`.
+    """
+    # Get lead data from database service
+    response = await client.get(f"{DATABASE_SERVICE_URL}/leads/{lead_id}")
+
+    if response.status_code != 200:
+        raise LeadNotFound(f"Lead {lead_id} not found")
+
+    lead_data = response.json()
+
+    # Reject obvious misfits before paying for a scrape and a model call
+    analysis_result = prescreener.screen(lead_data)
+    if analysis_result is not None:
+        fingerprint = prescreener.fingerprint(analysis_result)
+        previous = await find_analysis(client, fingerprint)
+        # A re-trigger for an unchanged verdict: the lead's latest analysis already records it
+        if previous is not None and await is_latest_analysis(client, previous):
+            prescreener.reused += 1
+            analysis_result.reused = True
+            analysis_result.analysis_id = previous["id"]
+            return analysis_result
+        analysis_result.analysis_id = await save_analysis(client, analysis_result, fingerprint)
+        return analysis_result
+
+    # Perform web scraping to get company information
+    company_info = None
+    if lead_data.get("company_name"):
+        try:
+            company_info = await web_scraper.scrape_company_info(
+                lead_data["company_name"], lead_data.get("company_fingerprint")
+            )
+        except Exception as e:
+            print(f"Error during web scraping: {str(e)}")
+            company_info = {"error": str(e)}
+
+    # Reuse an earlier analysis of identical inputs, if there is one
+    fingerprint = analyzer_service.fingerprint(lead_data, company_info)
+    previous = None
+    if force:
+        analyzer_service.forced += 1
+    elif fingerprint:
+        previous = await find_analysis(client, fingerprint)
+
+    if previous is not None:
+        analyzer_service.reused += 1
+        analysis_result = AnalysisResult(
+            lead_id=lead_id,
+            company_details=previous["company_details"],
+            llm_analysis=previous["llm_analysis"],
+            final_decision=previous["final_decision"],
+            reused=True,
+        )
+        # A re-trigger for an unchanged lead: already saved, and team matching ran back then
+        if previous["lead_id"] == lead_id and await is_latest_analysis(client, previous):
+            analysis_result.analysis_id = previous["id"]
+            return analysis_result
+    else:
+        # Analyze the lead
+        analysis_result = await analyzer_service.analyze_lead(lead_data, company_info)
+        # The fallback for an unparseable response must not be served again
+        if "error" in analysis_result.company_details:
+            fingerprint = None
+
+    # Save the analysis to the database
+    analysis_result.analysis_id = await save_analysis(client, analysis_result, fingerprint)
+
+    # If the decision is "Yes" or "Maybe", trigger team matching
+    if analysis_result.final_decision in ["Yes", "Maybe"]:
+        try:
+            await client.post(
+                f"{TEAM_MATCHER_URL}/match/{lead_id}",
+                json={"analysis_context": analysis_result.dict()}
+            )
+        except Exception as e:
+            print(f"Error triggering team matching: {str(e)}")
+
+    return analysis_result
+
+
+class AnalysisRunner:
+    """run_analysis at most once at a time per lead, across requests, batch jobs and worker processes.
+
+    Calls for a lead already being analysed in this process share that run.
+    Across processes, a run holds a lease on the lead in database-service; a
+    worker that finds the lease taken waits for the holder to release it and
+    then serves the analysis the holder stored. If the holder failed or its
+    lease lapsed, the waiter takes the lease and runs the pipeline itself. If
+    the lock service can't be reached the run goes ahead without a lease: a
+    duplicate analysis is better than none.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        analyzer_service: AnalyzerService,
+        web_scraper: WebScraper,
+        prescreener: PreScreener,
+    ):
+        self.client = client
+        self.run = partial(
+            run_analysis,
+            client=client,
+            analyzer_service=analyzer_service,
+            web_scraper=web_scraper,
+            prescreener=prescreener,
+        )
+        self.flights = SingleFlight()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.waited = 0  # Runs that found the lead leased by another worker
+        self.shared = 0  # Of those, runs that served the other worker's analysis
+        self.unlocked = 0  # Runs that went ahead without a lease
+
+    async def analyze(self, lead_id: int, force: bool = False) -> AnalysisResult:
+        # A forced call must reach the model, so it doesn't join a run that may reuse an analysis
+        return await self.flights.do((lead_id, force), partial(self._run_leased, lead_id, force))
+
+    async def close(self):
+        await self.flights.close()
+
+    async def _run_leased(self, lead_id: int, force: bool) -> AnalysisResult:
+        owner = f"{self.worker_id}:{uuid.uuid4().hex}"
+        waited = False
+        while True:
+            try:
+                holder = await self._acquire(lead_id, owner)
+            except httpx.HTTPError as e:
+                print(f"Error acquiring the analysis lock for lead {lead_id}: {str(e)}")
+                self.unlocked += 1
+                return await self.run(lead_id, force=force)
+            if holder is None:
+                break
+            if not waited:
+                waited = True
+                self.waited += 1
+            analysis_id = await self._wait(lead_id, holder)
+            if analysis_id is not None and not force:
+                analysis_result = await self._stored_result(lead_id)
+                if analysis_result is not None:
+                    self.shared += 1
+                    return analysis_result
+
+        renewal = asyncio.create_task(self._renew(lead_id, owner))
+        analysis_id = None
+        try:
+            analysis_result = await self.run(lead_id, force=force)
+            analysis_id = analysis_result.analysis_id
+            return analysis_result
+        finally:
+            renewal.cancel()
+            await self._release(lead_id, owner, analysis_id)
+
+    async def _acquire(self, lead_id: int, owner: str) -> Optional[str]:
+        """Take the lease; returns None if it is ours, else the owner holding it"""
+        response = await self.client.post(
+            f"{DATABASE_SERVICE_URL}/locks/analysis/{lead_id}",
+            json={"owner": owner, "ttl_seconds": ANALYSIS_LOCK_TTL_SECONDS},
+        )
+        if response.status_code == 409:
+            return response.json()["detail"]["owner"]
+        response.raise_for_status()
+        return None
+
+    async def _wait(self, lead_id: int, holder: str) -> Optional[int]:
+        """Wait until `holder` no longer has the lease; returns the analysis it stored, if any"""
+        while True:
+            await asyncio.sleep(ANALYSIS_LOCK_POLL_SECONDS)
+            try:
+                response = await self.client.get(f"{DATABASE_SERVICE_URL}/locks/analysis/{lead_id}")
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"Error checking the analysis lock for lead {lead_id}: {str(e)}")
+                return None
+            lock = response.json()
+            if lock["owner"] != holder:
+                # Lapsed and taken by a third worker; wait for that one instead
+                return None
+            if not lock["held"]:
+                return lock["analysis_id"]
+
+    async def _renew(self, lead_id: int, owner: str):
+        while True:
+            await asyncio.sleep(ANALYSIS_LOCK_TTL_SECONDS / 3)
+            try:
+                holder = await self._acquire(lead_id, owner)
+            except httpx.HTTPError as e:
+                print(f"Error renewing the analysis lock for lead {lead_id}: {str(e)}")
+                continue
+            if holder is not None:
+                print(f"Analysis lock for lead {lead_id} lapsed and was taken by {holder}")
+                return
+
+    async def _release(self, lead_id: int, owner: str, analysis_id: Optional[int]):
+        try:
+            await self.client.post(
+                f"{DATABASE_SERVICE_URL}/locks/analysis/{lead_id}/release",
+                json={"owner": owner, "analysis_id": analysis_id},
+            )
+        except httpx.HTTPError as e:
+            print(f"Error releasing the analysis lock for lead {lead_id}: {str(e)}")
+
+    async def _stored_result(self, lead_id: int) -> Optional[AnalysisResult]:
+        try:
+            response = await self.client.get(f"{DATABASE_SERVICE_URL}/analyses/{lead_id}")
+        except httpx.HTTPError as e:
+            print(f"Error fetching the shared analysis for lead {lead_id}: {str(e)}")
+            return None
+        if response.status_code != 200:
+            return None
+        analysis = response.json()
+        return AnalysisResult(
+            lead_id=lead_id,
+            company_details=analysis["company_details"],
+            llm_analysis=analysis["llm_analysis"],
+            final_decision=analysis["final_decision"],
+            analysis_id=analysis["id"],
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.flights.stats(),
+            "waited_for_other_worker": self.waited,
+            "served_from_other_worker": self.shared,
+            "ran_without_lock": self.unlocked,
+        }
+
+
+async def select_lead_ids(client: httpx.AsyncClient, search: Optional[str] = None) -> AsyncIterator[List[int]]:
+    """Pages of lead IDs: those matching the full-text `search`, or every lead if it is None"""
+    if search is not None:
+        offset = 0
+        while offset is not None:
+            response = await client.get(
+                f"{DATABASE_SERVICE_URL}/search",
+                params={"q": search, "limit": LEAD_PAGE_SIZE, "offset": offset},
+            )
+            response.raise_for_status()
+            page = response.json()
+            yield [hit["lead_id"] for hit in page["hits"]]
+            offset = page["next_offset"]
+        return
+
+    params = {"limit": LEAD_PAGE_SIZE}
+    while True:
+        response = await client.get(f"{DATABASE_SERVICE_URL}/leads/", params=params)
+        response.raise_for_status()
+        yield [lead["id"] for lead in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return
+        params = {"limit": LEAD_PAGE_SIZE, "cursor": cursor}
@@ -1,76 +1,87 @@
 # analyzer-service/app/routes.py
-import os
-import httpx
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Dict, Any
 
-from .models import AnalysisRequest, AnalysisResult
+from .clients import get_analysis_runner, get_analyzer_service, get_batch_runner, get_prescreener
+from .models import AnalysisRequest, AnalysisResult, BatchAnalysisRequest, BatchJobStatus
+from .pipeline import AnalysisNotSaved, AnalysisRunner, LeadNotFound
 from .services.analyzer_service import AnalyzerService
-from .services.web_scraper import WebScraper
+from .services.batch_jobs import BATCH_CONCURRENCY, MAX_BATCH_CONCURRENCY, BatchRunner
+from .services.prescreen import PreScreener
 
 router = APIRouter()
 
-DATABASE_SERVICE_URL = os.getenv("DATABASE_SERVICE_URL", "http://localhost:8000")
-TEAM_MATCHER_URL = os.getenv("TEAM_MATCHER_URL", "http://localhost:8003")
+# Declared before /analyze/{lead_id}, which would otherwise match "batch" and reject it as a lead ID
+@router.post("/analyze/batch", response_model=BatchJobStatus, status_code=202)
+async def analyze_batch(request: BatchAnalysisRequest, runner: BatchRunner = Depends(get_batch_runner)):
+    """Queue a re-analysis of many leads; poll GET /analyze/batch/{job_id} for progress.
 
-async def get_analyzer_service():
-    return AnalyzerService()
+    Select leads with exactly one of `lead_ids`, `search` (full-text, as GET /search
+    on the database service) or `all_leads`.
+    """
+    selectors = [request.lead_ids is not None, request.search is not None, request.all_leads]
+    if sum(selectors) != 1:
+        raise HTTPException(status_code=400, detail="Pass exactly one of lead_ids, search or all_leads")
+    if request.lead_ids is not None and not request.lead_ids:
+        raise HTTPException(status_code=400, detail="lead_ids is empty")
+    concurrency = request.concurrency or BATCH_CONCURRENCY
+    if not 1 <= concurrency <= MAX_BATCH_CONCURRENCY:
+        raise HTTPException(status_code=400, detail=f"concurrency must be between 1 and {MAX_BATCH_CONCURRENCY}")
 
-async def get_web_scraper():
-    return WebScraper()
+    selector = request.dict(exclude={"concurrency"}, exclude_none=True)
+    job_id = await runner.submit(selector, concurrency)
+    return await runner.get_job(job_id)
+
+@router.get("/analyze/batch/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(job_id: str, runner: BatchRunner = Depends(get_batch_runner)):
+    job = await runner.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
 
 @router.post("/analyze/{lead_id}", response_model=AnalysisResult)
 async def analyze_lead(
     lead_id: int,
     request: AnalysisRequest = AnalysisRequest(),
-    analyzer_service: AnalyzerService = Depends(get_analyzer_service),
-    web_scraper: WebScraper = Depends(get_web_scraper)
+    runner: AnalysisRunner = Depends(get_analysis_runner)
 ):
-    # Get lead data from database service
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{DATABASE_SERVICE_URL}/leads/{lead_id}")
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail="Lead not found")
-        
-        lead_data = response.json()
-    
-    # Perform web scraping to get company information
-    company_info = None
-    if lead_data.get("company_name"):
-        try:
-            company_info = await web_scraper.scrape_company_info(lead_data["company_name"])
-        except Exception as e:
-            print(f"Error during web scraping: {str(e)}")
-            company_info = {"error": str(e)}
-    
-    # Analyze the lead
-    analysis_result = await analyzer_service.analyze_lead(lead_data, company_info)
-    
-    # Save the analysis to the database
-    async with httpx.AsyncClient() as client:
-        analysis_data = {
-            "lead_id": lead_id,
-            "company_details": analysis_result.company_details,
-            "llm_analysis": analysis_result.llm_analysis,
-            "final_decision": analysis_result.final_decision
-        }
-        
-        response = await client.post(f"{DATABASE_SERVICE_URL}/analyses/", json=analysis_data)
-        
-        if response.status_code != 200:
-            print(f"Error saving analysis: {response.text}")
-            raise HTTPException(status_code=500, detail="Failed to save analysis")
-    
-    # If the decision is "Yes" or "Maybe", trigger team matching
-    if analysis_result.final_decision in ["Yes", "Maybe"]:
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    f"{TEAM_MATCHER_URL}/match/{lead_id}",
-                    json={"analysis_context": analysis_result.dict()}
-                )
-        except Exception as e:
-            print(f"Error triggering team matching: {str(e)}")
-    
-    return analysis_result
\ No newline at end of file
+    """Analyse a lead; concurrent calls for the same lead, from any worker, share one run and one stored analysis"""
+    try:
+        return await runner.analyze(lead_id, force=request.force)
+    except LeadNotFound:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    except AnalysisNotSaved:
+        raise HTTPException(status_code=500, detail="Failed to save analysis")
+
+@router.get("/debug/company-cache")
+async def get_company_cache_stats(request: Request):
+    """Hit/miss counters for the company research cache"""
+    return request.app.state.company_cache.stats()
+
+@router.get("/debug/analysis-reuse")
+async def get_analysis_reuse_stats(analyzer_service: AnalyzerService = Depends(get_analyzer_service)):
+    """Model calls made, and those avoided by reusing an analysis of identical inputs"""
+    return analyzer_service.stats()
+
+@router.get("/debug/analysis-coalescing")
+async def get_analysis_coalescing_stats(runner: AnalysisRunner = Depends(get_analysis_runner)):
+    """Analyses run, and those that shared a run in this process or waited for another worker's"""
+    return runner.stats()
+
+@router.get("/debug/prescreen")
+async def get_prescreen_stats(prescreener: PreScreener = Depends(get_prescreener)):
+    """Leads each pre-screening rule decided without research or a model call"""
+    return prescreener.stats()
+
+@router.get("/debug/llm-tiers")
+async def get_llm_tier_stats(request: Request):
+    """Calls, escalations and latency per model tier, for analysis and for extraction"""
+    return {
+        "analysis": request.app.state.analysis_models.stats(),
+        "extraction": request.app.state.extraction_models.stats(),
+    }
+
+@router.get("/debug/llm-rate-limit")
+async def get_llm_rate_limit_stats(request: Request):
+    """Gemini calls made and time spent waiting for the shared rate limit, per model"""
+    return request.app.state.llm_limits.stats()
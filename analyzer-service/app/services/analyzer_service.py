@@ -1,31 +1,53 @@
 # analyzer-service/app/services/analyzer_service.py
-import os
+import hashlib
 import json
-import google.generativeai as genai
+import os
 from typing import Dict, Any, Optional
 
 from ..models import AnalysisResult
+from .company_cache import is_cacheable
+from .llm import InvalidModelOutput, ModelCascade, parse_json_response, parse_model_names
+
+# Cheapest first; a first-pass "Maybe" or an unusable answer goes to the next tier
+ANALYSIS_MODEL_TIERS = parse_model_names(os.getenv("ANALYSIS_MODEL_TIERS", "gemini-1.5-flash,gemini-1.5-pro"))
+
+ANALYSIS_GENERATION_CONFIG = {
+    "temperature": 0.2,  # Low temperature for more deterministic results
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 2048,
+}
+
+DECISIONS = ("Yes", "Maybe", "No")
+
+# Lead fields that identify the row rather than describe the prospect, or are derived from
+# fields that do; a duplicate lead with the same details gets the same fingerprint
+FINGERPRINT_EXCLUDED_FIELDS = {"id", "created_at", "company_fingerprint"}
+
+
+def parse_analysis(text: str) -> Dict[str, Any]:
+    """The analysis JSON the prompt asks for; raises InvalidModelOutput if it isn't that"""
+    data = parse_json_response(text)
+    if not isinstance(data, dict):
+        raise InvalidModelOutput("Analysis is not a JSON object")
+    if data.get("decision") not in DECISIONS:
+        raise InvalidModelOutput(f"Unexpected decision: {data.get('decision')!r}")
+    if not isinstance(data.get("analysis"), str) or not data["analysis"].strip():
+        raise InvalidModelOutput("Analysis text is missing")
+    if not isinstance(data.get("company_details"), dict):
+        raise InvalidModelOutput("Company details are missing")
+    return data
+
 
 class AnalyzerService:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is not set")
-        
-        genai.configure(api_key=api_key)
-        
-        # Create a model
-        generation_config = {
-            "temperature": 0.2,  # Low temperature for more deterministic results
-            "top_p": 0.8,
-            "top_k": 40,
-            "max_output_tokens": 2048,
-        }
-        
-        self.model = genai.GenerativeModel(
-            model_name="gemini-1.5-pro",
-            generation_config=generation_config
-        )
+    """Created once per process around the analysis model cascade (see clients.py)"""
+
+    def __init__(self, models: ModelCascade):
+        self.models = models
+
+        self.llm_calls = 0
+        self.reused = 0
+        self.forced = 0
         
         self.analysis_prompt = """
         You are an expert business development consultant analyzing potential client leads.
@@ -67,6 +89,43 @@ class AnalyzerService:
         }}
         """
 
+    def fingerprint(self, lead_data: Dict[str, Any], company_info: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Hash of everything the analysis depends on: lead details, company research, prompt and model.
+
+        Editing the prompt, the model tiers or their settings changes every fingerprint, so nothing
+        analysed under the old criteria is reused. None when the company research failed
+        transiently, so an analysis made without it is never reused once it succeeds.
+        """
+        if company_info and not is_cacheable(company_info):
+            return None
+        lead = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in lead_data.items()
+            if key not in FINGERPRINT_EXCLUDED_FIELDS and value not in (None, "")
+        }
+        canonical = json.dumps(
+            {
+                "lead": lead,
+                "company_info": company_info or {},
+                "prompt": self.analysis_prompt,
+                "models": self.models.names,
+                "generation_config": ANALYSIS_GENERATION_CONFIG,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        analyses = self.llm_calls + self.reused
+        return {
+            "llm_calls": self.llm_calls,
+            "llm_calls_avoided": self.reused,
+            "forced": self.forced,
+            "reuse_rate": round(self.reused / analyses, 4) if analyses else 0.0,
+        }
+
     async def analyze_lead(
         self, 
         lead_data: Dict[str, Any], 
@@ -78,31 +137,13 @@ class AnalyzerService:
             company_info=json.dumps(company_info if company_info else {})
         )
         
-        # Generate analysis using Gemini
-        response = await self.model.generate_content_async(prompt)
-        
-        # Parse the response text to extract JSON
+        # Generate analysis, escalating a first-pass "Maybe" to the stronger model
+        self.llm_calls += 1
         try:
-            response_text = response.text
-            
-            # Clean the response if it contains markdown code blocks
-            if "```json" in response_text:
-                json_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_text = response_text.split("```")[1].split("```")[0].strip()
-            else:
-                json_text = response_text
-                
-            analysis_data = json.loads(json_text)
-            
-            # Create the analysis result
-            return AnalysisResult(
-                lead_id=lead_data["id"],
-                company_details=analysis_data["company_details"],
-                llm_analysis=analysis_data["analysis"],
-                final_decision=analysis_data["decision"]
+            analysis_data, model_name = await self.models.generate(
+                prompt, parse=parse_analysis, escalate=lambda data: data["decision"] == "Maybe"
             )
-        except Exception as e:
+        except InvalidModelOutput as e:
             print(f"Error parsing analysis response: {str(e)}")
             # Fallback with partial data
             return AnalysisResult(
@@ -110,4 +151,13 @@ class AnalyzerService:
                 company_details={"error": "Failed to parse company details"},
                 llm_analysis=f"Error analyzing lead: {str(e)}",
                 final_decision="Maybe"  # Default to "Maybe" on error
-            )
\ No newline at end of file
+            )
+
+        # Create the analysis result
+        return AnalysisResult(
+            lead_id=lead_data["id"],
+            company_details=analysis_data["company_details"],
+            llm_analysis=analysis_data["analysis"],
+            final_decision=analysis_data["decision"],
+            model=model_name
+        )
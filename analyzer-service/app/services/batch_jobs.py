@@ -0,0 +1,305 @@
+# analyzer-service/app/services/batch_jobs.py
+"""Batch analysis jobs, kept in SQLite so they survive a crash or restart.
+
+A job is a list of lead IDs, each analysed by the same pipeline as a single
+POST /analyze/{lead_id}. Leads are worked on by `concurrency` tasks, and the
+pace is set by the shared Gemini token bucket, not by the client.
+
+- Lead IDs are stored with the job before any analysis starts, either as
+  given or by listing the leads the job's search (or "all leads") selects.
+- A lead is marked done or failed as soon as it finishes, so after a crash
+  only the leads that were in flight are analysed again.
+- The process running a job heartbeats it. Jobs whose owner has gone quiet
+  for STALE_OWNER_SECONDS, e.g. because it crashed, are picked up by the
+  next worker that checks, including the restarted one.
+- Failed leads are retried with a growing pause, up to BATCH_MAX_ATTEMPTS.
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple, Type
+
+from ..models import AnalysisResult
+
+BATCH_JOBS_PATH = os.getenv("BATCH_JOBS_PATH", "./data/batch_jobs.db")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+MAX_BATCH_CONCURRENCY = 32
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+# Pause before retry n is n times this
+RETRY_BACKOFF_SECONDS = 5.0
+HEARTBEAT_SECONDS = 5.0
+STALE_OWNER_SECONDS = 30.0
+# Failed leads listed in a job's status
+MAX_REPORTED_FAILURES = 20
+
+# Job states
+RESOLVING = "resolving"  # Listing the leads the job selects
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"  # The leads couldn't be listed; failed leads in a completed job are counted per lead
+ACTIVE_STATES = (RESOLVING, RUNNING)
+
+# Lead states
+PENDING = "pending"
+DONE = "done"
+
+
+class BatchJobStore:
+    def __init__(self, path: str = BATCH_JOBS_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Calls run in worker threads; one connection guarded by a lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # Other workers share the file; wait for their writes instead of failing
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS batch_jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, selector TEXT NOT NULL,"
+                " concurrency INTEGER NOT NULL, owner TEXT, heartbeat_at REAL,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL, error TEXT);"
+                "CREATE TABLE IF NOT EXISTS batch_items ("
+                " job_id TEXT NOT NULL, lead_id INTEGER NOT NULL, status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, decision TEXT, error TEXT,"
+                " PRIMARY KEY (job_id, lead_id));"
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def create_job(self, job_id: str, selector: Dict[str, Any], concurrency: int, owner: str, lead_ids: List[int]):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO batch_jobs (id, status, selector, concurrency, owner, heartbeat_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, RUNNING if lead_ids else RESOLVING, json.dumps(selector), concurrency, owner, now, now, now),
+            )
+            self._insert_items(job_id, lead_ids)
+            self._db.commit()
+
+    def _insert_items(self, job_id: str, lead_ids: List[int]):
+        # Ignoring duplicates makes re-listing after a crash during RESOLVING harmless
+        self._db.executemany(
+            "INSERT OR IGNORE INTO batch_items (job_id, lead_id, status) VALUES (?, ?, ?)",
+            [(job_id, lead_id, PENDING) for lead_id in lead_ids],
+        )
+
+    def add_items(self, job_id: str, lead_ids: List[int]):
+        with self._lock:
+            self._insert_items(job_id, lead_ids)
+            self._db.commit()
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE batch_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._db.commit()
+
+    def heartbeat(self, owner: str, job_ids: List[str]):
+        if not job_ids:
+            return
+        with self._lock:
+            self._db.execute(
+                f"UPDATE batch_jobs SET heartbeat_at = ? WHERE owner = ? AND id IN ({','.join('?' * len(job_ids))})",
+                (time.time(), owner, *job_ids),
+            )
+            self._db.commit()
+
+    def claim_abandoned(self, owner: str) -> List[str]:
+        """Take over active jobs whose owner stopped heartbeating; returns their IDs"""
+        stale_before = time.time() - STALE_OWNER_SECONDS
+        claimed = []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id FROM batch_jobs WHERE status IN ({','.join('?' * len(ACTIVE_STATES))})"
+                " AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (*ACTIVE_STATES, stale_before),
+            ).fetchall()
+            for row in rows:
+                # Conditional on the heartbeat still being stale, so only one worker wins
+                cursor = self._db.execute(
+                    "UPDATE batch_jobs SET owner = ?, heartbeat_at = ? WHERE id = ?"
+                    " AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                    (owner, time.time(), row["id"], stale_before),
+                )
+                if cursor.rowcount:
+                    claimed.append(row["id"])
+            self._db.commit()
+        return claimed
+
+    def pending_items(self, job_id: str) -> List[Tuple[int, int]]:
+        """(lead_id, attempts so far) for every lead not yet done or failed"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT lead_id, attempts FROM batch_items WHERE job_id = ? AND status = ? ORDER BY lead_id",
+                (job_id, PENDING),
+            ).fetchall()
+        return [(row["lead_id"], row["attempts"]) for row in rows]
+
+    def finish_item(
+        self, job_id: str, lead_id: int, status: str, attempts: int,
+        decision: Optional[str] = None, error: Optional[str] = None,
+    ):
+        with self._lock:
+            self._db.execute(
+                "UPDATE batch_items SET status = ?, attempts = ?, decision = ?, error = ? WHERE job_id = ? AND lead_id = ?",
+                (status, attempts, decision, error, job_id, lead_id),
+            )
+            self._db.execute("UPDATE batch_jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+            self._db.commit()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job with its progress, or None if there is no such job"""
+        with self._lock:
+            job = self._db.execute("SELECT * FROM batch_jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM batch_items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+            decisions = dict(self._db.execute(
+                "SELECT decision, COUNT(*) FROM batch_items WHERE job_id = ? AND status = ? GROUP BY decision",
+                (job_id, DONE),
+            ).fetchall())
+            failures = self._db.execute(
+                "SELECT lead_id, attempts, error FROM batch_items WHERE job_id = ? AND status = ?"
+                " ORDER BY lead_id LIMIT ?",
+                (job_id, FAILED, MAX_REPORTED_FAILURES),
+            ).fetchall()
+
+        finished = counts.get(DONE, 0) + counts.get(FAILED, 0)
+        elapsed_minutes = (job["updated_at"] - job["created_at"]) / 60
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "selector": json.loads(job["selector"]),
+            "concurrency": job["concurrency"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "total": sum(counts.values()),
+            "pending": counts.get(PENDING, 0),
+            "done": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "decisions": decisions,
+            "leads_per_minute": round(finished / elapsed_minutes, 2) if elapsed_minutes > 0 else 0.0,
+            "failures": [dict(row) for row in failures],
+            "error": job["error"],
+        }
+
+
+class BatchRunner:
+    """Runs this process's batch jobs and adopts abandoned ones (see module docstring)"""
+
+    def __init__(
+        self,
+        store: BatchJobStore,
+        analyze: Callable[..., Awaitable[AnalysisResult]],
+        select_leads: Callable[[Optional[str]], AsyncIterator[List[int]]],
+        permanent_errors: Tuple[Type[Exception], ...] = (),
+    ):
+        self.store = store
+        self.analyze = analyze
+        self.select_leads = select_leads
+        # Not worth retrying, e.g. a lead that doesn't exist
+        self.permanent_errors = permanent_errors
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._supervisor: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def close(self):
+        # Unfinished leads stay pending; whoever adopts the job picks them up
+        tasks = [task for task in (self._supervisor, *self._jobs.values()) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.store.close()
+
+    async def submit(self, selector: Dict[str, Any], concurrency: int) -> str:
+        job_id = uuid.uuid4().hex
+        lead_ids = list(dict.fromkeys(selector.get("lead_ids") or []))
+        await asyncio.to_thread(self.store.create_job, job_id, selector, concurrency, self.owner, lead_ids)
+        self._launch(job_id)
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get_job, job_id)
+
+    def _launch(self, job_id: str):
+        task = asyncio.create_task(self._run_job(job_id))
+        self._jobs[job_id] = task
+        task.add_done_callback(lambda _: self._jobs.pop(job_id, None))
+
+    async def _supervise(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.store.heartbeat, self.owner, list(self._jobs))
+                for job_id in await asyncio.to_thread(self.store.claim_abandoned, self.owner):
+                    if job_id not in self._jobs:
+                        print(f"Resuming batch job {job_id}")
+                        self._launch(job_id)
+            except Exception as e:
+                print(f"Error supervising batch jobs: {str(e)}")
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    async def _run_job(self, job_id: str):
+        job = await asyncio.to_thread(self.store.get_job, job_id)
+        if job["status"] == RESOLVING:
+            try:
+                async for lead_ids in self.select_leads(job["selector"].get("search")):
+                    await asyncio.to_thread(self.store.add_items, job_id, lead_ids)
+            except Exception as e:
+                print(f"Error listing leads for batch job {job_id}: {str(e)}")
+                await asyncio.to_thread(self.store.set_status, job_id, FAILED, f"Failed to list leads: {str(e)}")
+                return
+            await asyncio.to_thread(self.store.set_status, job_id, RUNNING)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in await asyncio.to_thread(self.store.pending_items, job_id):
+            queue.put_nowait(item)
+        force = job["selector"].get("force", False)
+        workers = [asyncio.create_task(self._work(job_id, queue, force)) for _ in range(job["concurrency"])]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        await asyncio.to_thread(self.store.set_status, job_id, COMPLETED)
+
+    async def _work(self, job_id: str, queue: asyncio.Queue, force: bool):
+        while True:
+            lead_id, attempts = await queue.get()
+            try:
+                attempts += 1
+                try:
+                    result = await self.analyze(lead_id, force=force)
+                except Exception as e:
+                    if isinstance(e, self.permanent_errors) or attempts >= BATCH_MAX_ATTEMPTS:
+                        await asyncio.to_thread(
+                            self.store.finish_item, job_id, lead_id, FAILED, attempts, None, str(e) or type(e).__name__
+                        )
+                    else:
+                        await asyncio.sleep(RETRY_BACKOFF_SECONDS * attempts)
+                        queue.put_nowait((lead_id, attempts))
+                    continue
+                await asyncio.to_thread(
+                    self.store.finish_item, job_id, lead_id, DONE, attempts, result.final_decision
+                )
+            finally:
+                queue.task_done()
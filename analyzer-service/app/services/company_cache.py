@@ -0,0 +1,249 @@
+# analyzer-service/app/services/company_cache.py
+"""Two-tier cache of company research (search + page fetch + extraction).
+
+Entries are keyed by the lead's company fingerprint (the normalized company
+name the database service stores with each lead) and, once the company's
+site is known, by its domain too, so "Acme Inc" and "ACME" share one entry
+and a new spelling that resolves to a known site skips the fetch and
+extraction.
+
+- Memory: bounded LRU, checked first.
+- Disk: a SQLite file, so entries survive restarts and are shared by workers.
+- Fresh entries (younger than the TTL) are served as is. Stale entries (up to
+  STALE_SECONDS past the TTL) are served immediately while one background
+  refresh replaces them. Anything older is a miss.
+- "No search results" is cached too, with its own shorter TTL.
+- Concurrent misses for the same company share one fetch.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Any, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+CACHE_PATH = os.getenv("COMPANY_CACHE_PATH", "./data/company_cache.db")
+MAX_MEMORY_ENTRIES = int(os.getenv("COMPANY_CACHE_MAX_ENTRIES", "1000"))
+TTL_SECONDS = float(os.getenv("COMPANY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+STALE_SECONDS = float(os.getenv("COMPANY_CACHE_STALE_SECONDS", str(7 * 24 * 3600)))
+NEGATIVE_TTL_SECONDS = float(os.getenv("COMPANY_CACHE_NEGATIVE_TTL_SECONDS", str(24 * 3600)))
+
+NO_RESULTS_ERROR = "No search results found"
+
+def company_key(company_name: str, fingerprint: Optional[str] = None) -> str:
+    """Cache key for a company: the database service's company_fingerprint when the lead has one"""
+    return "name:" + (fingerprint or company_name.strip().casefold())
+
+
+def domain_key(url: str) -> Optional[str]:
+    host = (urlparse(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return "domain:" + host if host else None
+
+
+def is_negative(result: Dict[str, Any]) -> bool:
+    return result.get("error") == NO_RESULTS_ERROR
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Complete research, or a definite "no results"; transient failures are retried next time"""
+    if is_negative(result):
+        return True
+    found = result.get("found_data")
+    return "error" not in result and isinstance(found, dict) and "error" not in found
+
+
+@dataclass
+class _Entry:
+    value: Dict[str, Any]
+    fetched_at: float
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def ttl(self) -> float:
+        return NEGATIVE_TTL_SECONDS if is_negative(self.value) else TTL_SECONDS
+
+
+class CompanyIntelCache:
+    def __init__(self, path: str = CACHE_PATH, max_memory_entries: int = MAX_MEMORY_ENTRIES):
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Disk calls run in worker threads; one connection guarded by a lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS company_intel ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.domain_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        with self._db_lock:
+            self._db.close()
+
+    # Storage
+
+    def _remember(self, key: str, entry: _Entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[_Entry]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, fetched_at FROM company_intel WHERE key = ?", (key,)
+            ).fetchone()
+        return _Entry(json.loads(row[0]), row[1]) if row else None
+
+    def _write_disk(self, keys, entry: _Entry):
+        value = json.dumps(entry.value)
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO company_intel (key, value, fetched_at) VALUES (?, ?, ?)",
+                [(key, value, entry.fetched_at) for key in keys],
+            )
+            self._db.commit()
+
+    async def _lookup(self, key: str) -> Tuple[Optional[_Entry], str]:
+        """Entry for `key` if it is still servable (fresh or stale), and the tier it came from"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            tier = "memory"
+            self._memory.move_to_end(key)
+        else:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            tier = "disk"
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None or entry.age() > entry.ttl() + STALE_SECONDS:
+            return None, tier
+        return entry, tier
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        """Store a research result under `key` and, if it names a website, under its domain"""
+        if not is_cacheable(value):
+            return
+        entry = _Entry(value, time.time())
+        keys = [key]
+        website_key = domain_key(value.get("website_url") or "")
+        if website_key:
+            keys.append(website_key)
+        for cache_key in keys:
+            self._remember(cache_key, entry)
+        await asyncio.to_thread(self._write_disk, keys, entry)
+
+    async def get_domain(self, url: str) -> Optional[Dict[str, Any]]:
+        """Fresh research already stored for the site at `url`, if any"""
+        key = domain_key(url)
+        if key is None:
+            return None
+        entry, _ = await self._lookup(key)
+        if entry is None or entry.age() > entry.ttl():
+            return None
+        self.domain_hits += 1
+        return entry.value
+
+    # Read-through
+
+    async def get_or_fetch(
+        self, company_name: str, fetch: Callable[[], Awaitable[Dict[str, Any]]], fingerprint: Optional[str] = None
+    ) -> Dict[str, Any]:
+        key = company_key(company_name, fingerprint)
+        entry, tier = await self._lookup(key)
+        if entry is not None:
+            if tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            if is_negative(entry.value):
+                self.negative_hits += 1
+            if entry.age() > entry.ttl():
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch)
+            return entry.value
+
+        self.misses += 1
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            await self.put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _refresh_in_background(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self.put(key, await fetch())
+                self.refreshes += 1
+            except Exception as e:
+                self.refresh_failures += 1
+                print(f"Error refreshing company cache for {key}: {str(e)}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "max_memory_entries": self.max_memory_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "domain_hits": self.domain_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
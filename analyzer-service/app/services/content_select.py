@@ -0,0 +1,184 @@
+# analyzer-service/app/services/content_select.py
+"""Relevance-ranked selection of scraped page text for the extraction prompt.
+
+Taking the first N characters of each page filled the prompt with
+navigation and hero copy and cut off the "About", "Clients" and "Team"
+sections further down. Instead:
+
+1. Page text is split into blocks of roughly BLOCK_CHARS, on line breaks,
+   or on sentence ends where a line is longer than that.
+2. Lines (or sentences) already seen, on this page or an earlier one (menus, footers,
+   cookie banners repeated across pages), are dropped.
+3. Blocks are scored with BM25 against terms for the fields the extraction
+   prompt asks for and the company's own name, plus a bonus for concrete
+   facts (headcounts, years, amounts). Blocks made of short lines, i.e.
+   link lists, are discounted.
+4. The best blocks are packed into the token budget and emitted in their
+   original order, under a "Source:" header per page.
+
+When everything fits the budget, all of it is sent, less repeated lines.
+Tokens are estimated at CHARS_PER_TOKEN characters each; the budget is a
+cost control, not an exact limit.
+"""
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+EXTRACTION_TOKEN_BUDGET = int(os.getenv("EXTRACTION_TOKEN_BUDGET", "1500"))
+CHARS_PER_TOKEN = 4
+BLOCK_CHARS = 400
+
+# Stems of words that signal the fields in the extraction prompt
+FIELD_TERMS = (
+    # Size
+    "employ", "staff", "people", "team", "headcount", "workforce",
+    # Age
+    "found", "establish", "since", "history", "year",
+    # Products and services
+    "product", "service", "solution", "platform", "offer", "specializ", "specialis",
+    # Clients
+    "client", "customer", "testimonial", "partner", "case stud", "trusted",
+    # Revenue
+    "revenue", "turnover", "million", "billion", "sales", "funding",
+    # Social media
+    "linkedin", "twitter", "facebook", "instagram", "youtube",
+    # Locations
+    "headquarter", "located", "office", "address", "based in",
+    # Industry
+    "industr", "market", "sector", "about", "mission", "leader",
+)
+_FIELD_PATTERN = re.compile(r"\b(" + "|".join(re.escape(term) for term in FIELD_TERMS) + r")\w*")
+_FACT_PATTERN = re.compile(
+    r"\b\d[\d,.]*\s*\+?\s*(?:employees|people|staff|clients|customers|countries|offices|locations|years)\b"
+    r"|\b(?:18|19|20)\d{2}\b"
+    r"|[$€£]\s?\d"
+    r"|\b\d[\d,.]*\s*(?:million|billion|m|bn)\b",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+FACT_BONUS = 1.0
+MAX_FACT_BONUS = 3.0
+# Average line length under which a block reads as a menu or link list
+LINK_LIST_LINE_CHARS = 25
+LINK_LIST_DISCOUNT = 0.3
+
+
+@dataclass
+class Block:
+    page: int  # Index of the page in the input
+    position: int  # Order in the input, across pages
+    text: str
+    score: float = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text) + 1
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _pieces(text: str) -> Iterator[str]:
+    """Lines of `text`, with lines longer than a block (e.g. from minified HTML) split into sentences"""
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) <= BLOCK_CHARS:
+            yield line
+            continue
+        for sentence in _SENTENCE_END.split(line):
+            # A run-on "sentence" still mustn't outgrow a block
+            for start in range(0, len(sentence), BLOCK_CHARS):
+                yield sentence[start:start + BLOCK_CHARS]
+
+
+def split_blocks(pages: List[str]) -> List[Block]:
+    """Blocks of consecutive lines, with lines repeated anywhere earlier dropped"""
+    seen = set()
+    blocks = []
+    for page_index, text in enumerate(pages):
+        lines: List[str] = []
+        size = 0
+        for line in _pieces(text):
+            key = " ".join(_WORD.findall(line.lower()))
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+            size += len(line) + 1
+            if size >= BLOCK_CHARS:
+                blocks.append(Block(page_index, len(blocks), "\n".join(lines)))
+                lines, size = [], 0
+        if lines:
+            blocks.append(Block(page_index, len(blocks), "\n".join(lines)))
+    return blocks
+
+
+def score_blocks(blocks: List[Block], company_name: str = ""):
+    """Set each block's score: BM25 over field and company-name terms, plus a fact bonus"""
+    if not blocks:
+        return
+    name_pattern = None
+    name_words = [word for word in _WORD.findall(company_name.lower()) if len(word) > 2]
+    if name_words:
+        name_pattern = re.compile(r"\b(" + "|".join(map(re.escape, name_words)) + r")\b")
+
+    term_counts = []
+    for block in blocks:
+        lowered = block.text.lower()
+        counts = Counter(match.group(1) for match in _FIELD_PATTERN.finditer(lowered))
+        if name_pattern is not None:
+            counts.update(name_pattern.findall(lowered))
+        term_counts.append(counts)
+
+    document_frequency = Counter(term for counts in term_counts for term in counts)
+    lengths = [len(block.text) for block in blocks]
+    average_length = sum(lengths) / len(lengths)
+    for block, counts, length in zip(blocks, term_counts, lengths):
+        norm = K1 * (1 - B + B * length / average_length)
+        score = sum(
+            math.log(1 + (len(blocks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            * tf * (K1 + 1) / (tf + norm)
+            for term, tf in counts.items()
+        )
+        score += min(len(_FACT_PATTERN.findall(block.text)) * FACT_BONUS, MAX_FACT_BONUS)
+        line_count = block.text.count("\n") + 1
+        if length / line_count < LINK_LIST_LINE_CHARS:
+            score *= LINK_LIST_DISCOUNT
+        block.score = score
+
+
+def select_content(pages: Dict[str, str], company_name: str = "", token_budget: int = EXTRACTION_TOKEN_BUDGET) -> str:
+    """The most relevant text of `pages` (url -> text, best search match first) within `token_budget`"""
+    urls = list(pages)
+    blocks = split_blocks([pages[url] for url in urls])
+    score_blocks(blocks, company_name)
+
+    headers = {page: f"Source: {url}" for page, url in enumerate(urls)}
+    remaining = token_budget
+    chosen = []
+    used_pages = set()
+    # Ties go to the better search result, then to text nearer the top of the page
+    for block in sorted(blocks, key=lambda block: (-block.score, block.page, block.position)):
+        cost = block.tokens
+        if block.page not in used_pages:
+            cost += estimate_tokens(headers[block.page]) + 1
+        if cost > remaining:
+            continue
+        chosen.append(block)
+        used_pages.add(block.page)
+        remaining -= cost
+
+    sections = []
+    for page in sorted(used_pages):
+        page_blocks = sorted((block for block in chosen if block.page == page), key=lambda block: block.position)
+        sections.append(headers[page] + "\n" + "\n".join(block.text for block in page_blocks))
+    return "\n\n".join(sections)
@@ -0,0 +1,95 @@
+# analyzer-service/app/services/html_text.py
+"""Bounded page download and fast HTML-to-text extraction for the scraper.
+
+Only the first MAX_PAGE_BYTES of a page are read, and only for HTML content
+types, so a multi-megabyte page or a PDF costs no more than a normal page.
+Text is extracted with lxml (libxml2's HTML parser) in one pass: boilerplate
+subtrees are dropped in C, and text is collected only until there is enough
+for the extraction prompt.
+"""
+import os
+import re
+from typing import Optional
+
+import aiohttp
+from lxml import etree
+
+# Bytes of a page that are downloaded; the text we keep is in the first part of the document anyway
+MAX_PAGE_BYTES = int(os.getenv("SCRAPE_MAX_PAGE_BYTES", str(1024 * 1024)))
+READ_CHUNK_BYTES = 64 * 1024
+
+# Characters of cleaned text kept per page
+MAX_TEXT_CHARS = 15000
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+# Subtrees that never carry company information
+BOILERPLATE_TAGS = ("script", "style", "noscript", "template", "svg", "nav", "footer", "header", "iframe")
+
+# Elements whose text is a separate line; otherwise "<p>One.</p><p>Two</p>" reads "One.Two"
+BLOCK_TAGS = (
+    "p", "div", "section", "article", "aside", "main", "li", "ul", "ol", "dl", "dt", "dd", "table", "tr",
+    "td", "th", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "address", "figcaption", "br", "hr",
+)
+
+# Raw text collected per character kept; cleaning only removes whitespace
+RAW_TEXT_FACTOR = 2
+
+# Splits text into lines and multi-space separated phrases, like the old get_text() clean-up
+_PHRASE_SPLIT = re.compile(r"\s*\n\s*|\s{2,}")
+
+
+class NotHtml(ValueError):
+    pass
+
+
+async def read_html(response: aiohttp.ClientResponse, max_bytes: int = MAX_PAGE_BYTES) -> bytes:
+    """Read at most `max_bytes` of an HTML response body; raises NotHtml for other content types"""
+    content_type = response.content_type or ""
+    # aiohttp reports application/octet-stream when the header is missing; let those through
+    if content_type not in HTML_CONTENT_TYPES and response.headers.get("Content-Type"):
+        raise NotHtml(f"Not an HTML page: {content_type}")
+
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(READ_CHUNK_BYTES):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            # Leaving the rest unread makes aiohttp close this connection instead of reusing it
+            break
+    return b"".join(chunks)[:max_bytes]
+
+
+def html_to_text(html: bytes, encoding: Optional[str] = None, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """Visible text of an HTML document, one phrase per line, at most `max_chars` long.
+
+    `encoding` is the charset from the Content-Type header; without it libxml2
+    uses the document's <meta charset> and falls back to its own detection.
+    """
+    if not html:
+        return ""
+    try:
+        parser = etree.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True, no_network=True)
+    except LookupError:
+        # Charset name from the server that libxml2 doesn't know; let it detect one
+        parser = etree.HTMLParser(remove_comments=True, remove_pis=True, no_network=True)
+    root = etree.fromstring(html, parser)
+    if root is None:
+        return ""
+    etree.strip_elements(root, *BOILERPLATE_TAGS, with_tail=False)
+    for element in root.iter(*BLOCK_TAGS):
+        element.tail = "\n" + element.tail if element.tail else "\n"
+
+    # Collect text until there is comfortably enough, then clean it up in one pass;
+    # whitespace-only nodes (source indentation) don't count towards that
+    pieces = []
+    size = 0
+    for piece in root.itertext():
+        pieces.append(piece)
+        if not piece.isspace():
+            size += len(piece)
+            if size > max_chars * RAW_TEXT_FACTOR:
+                break
+    phrases = (phrase.strip() for phrase in _PHRASE_SPLIT.split("".join(pieces)))
+    return "\n".join(phrase for phrase in phrases if phrase)[:max_chars]
@@ -0,0 +1,173 @@
+# analyzer-service/app/services/llm.py
+"""Language models behind one small interface, and the tier cascade over them.
+
+Every model call in the service goes through a ModelCascade: the prompt is
+sent to the cheapest tier first and only moves up a tier when the answer
+can't be parsed or validated, when the caller's escalation policy asks for
+a second opinion (e.g. a "Maybe" decision), or when the call fails. The
+best valid answer seen is returned, so a failing top tier never loses a
+usable cheaper answer.
+
+Anything with a `name` and `async generate(prompt) -> str` is a model:
+GeminiModel in production, FakeModel to exercise the policy offline.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+import google.generativeai as genai
+
+from .rate_limit import RateLimits, TokenBucket
+
+
+class LanguageModel(Protocol):
+    name: str
+
+    async def generate(self, prompt: str) -> str:
+        ...
+
+
+class InvalidModelOutput(ValueError):
+    """The model answered, but not with something the caller can use"""
+
+
+def parse_json_response(text: str) -> Any:
+    """JSON from a model response, with any markdown code fence removed"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise InvalidModelOutput(f"Response is not JSON: {str(e)}")
+
+
+class GeminiModel:
+    def __init__(self, model_name: str, generation_config: Dict[str, Any], limiter: TokenBucket):
+        self.name = model_name
+        self.model = genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
+        self.generation_config = generation_config
+        # This model's quota, shared with every other user of it; each call, escalations included, takes a token
+        self.limiter = limiter
+
+    async def generate(self, prompt: str) -> str:
+        await self.limiter.acquire()
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+class FakeModel:
+    """Local stand-in that answers with `respond(prompt)` after `latency` seconds"""
+
+    def __init__(self, name: str, respond: Callable[[str], str], latency: float = 0.0):
+        self.name = name
+        self.respond = respond
+        self.latency = latency
+
+    async def generate(self, prompt: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(prompt)
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    errors: int = 0  # The call itself failed
+    invalid: int = 0  # Answered, but failed parsing or validation
+    escalated: int = 0  # Valid, but the policy asked the next tier
+    served: int = 0  # Its answer was the one returned
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, seconds: float):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "invalid": self.invalid,
+            "escalated": self.escalated,
+            "served": self.served,
+            "mean_ms": round(self.total_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+
+class ModelCascade:
+    def __init__(self, tiers: List[LanguageModel]):
+        if not tiers:
+            raise ValueError("A model cascade needs at least one tier")
+        self.tiers = tiers
+        self.tier_stats: Dict[str, TierStats] = {model.name: TierStats() for model in tiers}
+        self.requests = 0
+
+    @property
+    def names(self) -> List[str]:
+        return [model.name for model in self.tiers]
+
+    async def generate(
+        self,
+        prompt: str,
+        parse: Callable[[str], Any],
+        escalate: Callable[[Any], bool] = lambda result: False,
+    ) -> Tuple[Any, str]:
+        """The parsed answer and the name of the tier that gave it.
+
+        `parse` turns response text into a result, raising InvalidModelOutput if it
+        isn't usable. `escalate` says whether a valid result should still go to the
+        next tier. Raises the last error if no tier gave a valid result.
+        """
+        self.requests += 1
+        best: Optional[Tuple[Any, str]] = None
+        error: Optional[Exception] = None
+        for index, model in enumerate(self.tiers):
+            stats = self.tier_stats[model.name]
+            started = time.perf_counter()
+            try:
+                text = await model.generate(prompt)
+            except Exception as e:
+                stats.errors += 1
+                error = e
+                print(f"Error calling {model.name}: {str(e)}")
+                continue
+            finally:
+                stats.record(time.perf_counter() - started)
+            try:
+                result = parse(text)
+            except InvalidModelOutput as e:
+                stats.invalid += 1
+                error = e
+                continue
+            best = (result, model.name)
+            if index < len(self.tiers) - 1 and escalate(result):
+                stats.escalated += 1
+                continue
+            break
+
+        if best is None:
+            raise error
+        self.tier_stats[best[1]].served += 1
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tiers": self.names,
+            "requests": self.requests,
+            "by_tier": {name: stats.to_dict() for name, stats in self.tier_stats.items()},
+        }
+
+
+def gemini_cascade(model_names: List[str], generation_config: Dict[str, Any], limits: RateLimits) -> ModelCascade:
+    return ModelCascade([GeminiModel(name, generation_config, limits.for_model(name)) for name in model_names])
+
+
+def parse_model_names(value: str) -> List[str]:
+    """A comma-separated tier list, cheapest first, e.g. "gemini-1.5-flash,gemini-1.5-pro" """
+    return [name.strip() for name in value.split(",") if name.strip()]
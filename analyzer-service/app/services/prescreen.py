@@ -0,0 +1,124 @@
+# analyzer-service/app/services/prescreen.py
+"""Rule-based pre-screening of leads, before any scraping or model call.
+
+Each rule looks only at the lead's own fields and either returns a rationale,
+rejecting the lead, or None. Only leads no rule rejects go on to the web
+research and the LLM analysis. Rules only ever say "No": a promising lead
+still gets the full analysis, whose company details the team matcher uses.
+
+Configuration:
+- PRESCREEN_RULES: comma-separated names of the enabled rules (default: all
+  of RULES; empty disables pre-screening)
+- PRESCREEN_MIN_REVENUE: revenue below which a lead is rejected outright.
+  The analysis prompt asks for $500,000; the default of $100,000 only
+  catches leads nowhere near it, leaving borderline ones to the model.
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from ..models import AnalysisResult
+
+PRESCREEN_MIN_REVENUE = float(os.getenv("PRESCREEN_MIN_REVENUE", "100000"))
+
+
+def revenue_far_below_minimum(lead: Dict[str, Any]) -> Optional[str]:
+    revenue = lead.get("revenue")
+    if revenue is not None and revenue < PRESCREEN_MIN_REVENUE:
+        return (
+            f"Reported annual revenue of ${revenue:,.0f} is far below our $500,000 minimum "
+            f"(pre-screen threshold ${PRESCREEN_MIN_REVENUE:,.0f})"
+        )
+    return None
+
+
+def no_stated_need(lead: Dict[str, Any]) -> Optional[str]:
+    # A missing service type alone isn't conclusive; the message often says what they want
+    if not (lead.get("service_type") or "").strip() and not (lead.get("message") or "").strip():
+        return "No service type and no message, so there is no stated requirement to assess"
+    return None
+
+
+# Checked in this order; the first rule that fires decides
+RULES: Dict[str, Callable[[Dict[str, Any]], Optional[str]]] = {
+    "revenue_far_below_minimum": revenue_far_below_minimum,
+    "no_stated_need": no_stated_need,
+}
+
+
+def enabled_rules() -> List[str]:
+    configured = os.getenv("PRESCREEN_RULES")
+    if configured is None:
+        return list(RULES)
+    names = [name.strip() for name in configured.split(",") if name.strip()]
+    unknown = [name for name in names if name not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown PRESCREEN_RULES: {', '.join(unknown)}")
+    return names
+
+
+class PreScreener:
+    """Created once per process; counts how many leads each rule short-circuits"""
+
+    def __init__(self, rule_names: Optional[List[str]] = None):
+        self.rules: List[Tuple[str, Callable[[Dict[str, Any]], Optional[str]]]] = [
+            (name, RULES[name]) for name in (enabled_rules() if rule_names is None else rule_names)
+        ]
+        self.screened = 0
+        self.passed = 0
+        self.reused = 0  # Rejections already stored as the lead's latest analysis
+        self.rejected_by_rule: Counter = Counter()
+
+    def screen(self, lead_data: Dict[str, Any]) -> Optional[AnalysisResult]:
+        """A rule-based "No" for a clear-cut lead, or None if it needs the full analysis"""
+        self.screened += 1
+        for name, rule in self.rules:
+            rationale = rule(lead_data)
+            if rationale:
+                self.rejected_by_rule[name] += 1
+                return AnalysisResult(
+                    lead_id=lead_data["id"],
+                    company_details={
+                        "estimated_revenue": lead_data.get("revenue"),
+                        "key_findings": [rationale],
+                    },
+                    llm_analysis=f"Pre-screened by rule '{name}': {rationale}",
+                    final_decision="No",
+                    prescreen_rule=name,
+                )
+        self.passed += 1
+        return None
+
+    def fingerprint(self, result: AnalysisResult) -> str:
+        """Hash of a rule's verdict on one lead; the same verdict on a re-trigger hashes the same.
+
+        Unlike an LLM analysis, a rule verdict costs nothing to recompute, so the lead
+        is part of the hash and a verdict is only ever reused for its own lead.
+        """
+        canonical = json.dumps(
+            {
+                "lead_id": result.lead_id,
+                "prescreen_rule": result.prescreen_rule,
+                "company_details": result.company_details,
+                "llm_analysis": result.llm_analysis,
+                "final_decision": result.final_decision,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        rejected = sum(self.rejected_by_rule.values())
+        return {
+            "rules": [name for name, _ in self.rules],
+            "screened": self.screened,
+            "passed_to_llm": self.passed,
+            "rejected": rejected,
+            "reused": self.reused,
+            "rejected_by_rule": {name: self.rejected_by_rule[name] for name, _ in self.rules},
+            "rejection_rate": round(rejected / self.screened, 4) if self.screened else 0.0,
+        }
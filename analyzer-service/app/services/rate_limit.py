@@ -0,0 +1,84 @@
+# analyzer-service/app/services/rate_limit.py
+"""Token buckets shared by every Gemini call in the process, one per model.
+
+Tokens refill at the configured requests-per-minute quota and callers wait,
+in arrival order, for one before calling the model. Interactive analyses and
+batch jobs draw from the same bucket, so a batch can't push single requests
+into 429s; it just uses whatever quota they leave.
+
+Gemini quotas are per model. GEMINI_REQUESTS_PER_MINUTE applies to each
+model, unless overridden for one with e.g.
+GEMINI_REQUESTS_PER_MINUTE_GEMINI_1_5_FLASH.
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Dict, Any
+
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+# Calls allowed back to back after an idle spell
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))
+
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE, burst: int = GEMINI_BURST):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        # Held while waiting for a token, so waiters are served first come, first served
+        self._lock = asyncio.Lock()
+
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+        waited = time.monotonic() - started
+        self.acquired += 1
+        if waited > 0.001:
+            self.waited += 1
+            self.wait_seconds += waited
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.rate * 60,
+            "burst": self.capacity,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+def requests_per_minute(model_name: str) -> float:
+    suffix = re.sub(r"[^A-Z0-9]+", "_", model_name.upper()).strip("_")
+    return float(os.getenv(f"GEMINI_REQUESTS_PER_MINUTE_{suffix}", str(GEMINI_REQUESTS_PER_MINUTE)))
+
+
+class RateLimits:
+    """The bucket for each model, created on first use"""
+
+    def __init__(self):
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def for_model(self, model_name: str) -> TokenBucket:
+        bucket = self.buckets.get(model_name)
+        if bucket is None:
+            bucket = self.buckets[model_name] = TokenBucket(requests_per_minute(model_name))
+        return bucket
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: bucket.stats() for name, bucket in self.buckets.items()}
@@ -0,0 +1,47 @@
+# analyzer-service/app/services/singleflight.py
+"""In-process coalescing of concurrent calls that would do the same work.
+
+The first call for a key runs; calls for the same key made while it is in
+flight wait for it and get its result (or its exception) instead of running
+again. The shared run is shielded, so a caller that disconnects doesn't
+cancel it for the others. Nothing is kept once the run finishes: a later
+call runs again.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Any, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.started += 1
+        else:
+            self.joined += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception so it isn't reported as unhandled when every caller has gone
+        if not task.cancelled():
+            task.exception()
+
+    async def close(self):
+        """Cancel runs still in flight"""
+        for task in list(self._calls.values()):
+            task.cancel()
+        await asyncio.gather(*self._calls.values(), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._calls), "started": self.started, "joined": self.joined}
@@ -1,27 +1,61 @@
 # analyzer-service/app/services/web_scraper.py
+import asyncio
 import aiohttp
 from bs4 import BeautifulSoup
-import re
-import json
-import google.generativeai as genai
 import os
+import re
+import weakref
 from typing import Dict, Any, List, Optional
+from urllib.parse import unquote, urlparse
+
+from .company_cache import CompanyIntelCache, NO_RESULTS_ERROR
+from .content_select import select_content
+from .html_text import NotHtml, html_to_text, read_html
+from .llm import InvalidModelOutput, ModelCascade, parse_json_response, parse_model_names
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# How many search results are fetched, concurrently, per company
+SCRAPE_TOP_N = int(os.getenv("SCRAPE_TOP_N", "3"))
+# Whatever has been fetched by then is used; slower pages are abandoned
+SCRAPE_DEADLINE_SECONDS = float(os.getenv("SCRAPE_DEADLINE_SECONDS", "8"))
+# Per page, on top of the session-wide timeout
+PAGE_TIMEOUT = aiohttp.ClientTimeout(total=float(os.getenv("SCRAPE_PAGE_TIMEOUT_SECONDS", "5")), sock_connect=3)
+# Simultaneous fetches from one site across all analyses in this process
+MAX_FETCHES_PER_DOMAIN = int(os.getenv("SCRAPE_MAX_FETCHES_PER_DOMAIN", "2"))
+# Cheapest first; an unusable or empty extraction goes to the next tier
+EXTRACTION_MODEL_TIERS = parse_model_names(os.getenv("EXTRACTION_MODEL_TIERS", "gemini-1.5-flash,gemini-1.5-pro"))
+
+EXTRACTION_GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 1024,
+}
+
+# Text kept per page for content selection; the useful sections are often well down the page
+PAGE_TEXT_CHARS = 60000
+
+def parse_extraction(text: str) -> Dict[str, Any]:
+    data = parse_json_response(text)
+    if not isinstance(data, dict) or not data:
+        raise InvalidModelOutput("Extraction is not a non-empty JSON object")
+    return data
+
+
+def found_nothing(company_info: Dict[str, Any]) -> bool:
+    """Every field null or empty: worth a look by the stronger model before caching that"""
+    return not any(company_info.values())
+
 
 class WebScraper:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is not set")
-        
-        genai.configure(api_key=api_key)
-        
-        self.model = genai.GenerativeModel(
-            model_name="gemini-1.5-pro",
-            generation_config={
-                "temperature": 0.2,
-                "max_output_tokens": 1024,
-            }
-        )
+    """Created once per process around the shared scraping session (see clients.py)"""
+
+    def __init__(self, session: aiohttp.ClientSession, cache: CompanyIntelCache, models: ModelCascade):
+        # Pooled, keep-alive session; its default headers carry USER_AGENT
+        self.session = session
+        self.cache = cache
+        self.models = models
+        # One semaphore per site, dropped once no fetch holds or waits on it
+        self._domain_limits: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
         
         self.extraction_prompt = """
         Extract key business information from the following webpage content.
@@ -43,8 +77,12 @@ class WebScraper:
         Company being researched: {company_name}
         """
 
-    async def _search_company(self, company_name: str) -> List[Dict[str, str]]:
-        """Perform a simple search for company information"""
+    async def _search_company(self, company_name: str) -> Optional[List[Dict[str, str]]]:
+        """Perform a simple search for company information.
+
+        Returns None when the search itself failed (an error status, a timeout), so
+        that isn't mistaken for a company with no results, which gets cached.
+        """
         # In a real implementation, this would use a search API
         # Here we'll simulate a simple search result
         search_query = f"{company_name} company website"
@@ -52,145 +90,164 @@ class WebScraper:
         # Encode the query for URL
         encoded_query = search_query.replace(" ", "+")
         
-        async with aiohttp.ClientSession() as session:
-            # Using DuckDuckGo as it's more scraper-friendly
-            url = f"https://html.duckduckgo.com/html/?q={encoded_query}"
-            
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            
-            try:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        return []
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, "html.parser")
-                    
-                    results = []
-                    for result in soup.select(".result"):
-                        link_elem = result.select_one(".result__a")
-                        if not link_elem:
-                            continue
-                            
-                        link = link_elem.get("href", "")
-                        # Extract URL from DuckDuckGo's redirect URL
-                        match = re.search(r"uddg=([^&]+)", link)
-                        if match:
-                            url = match.group(1)
-                        else:
-                            continue
-                            
-                        # Get title
-                        title = link_elem.get_text(strip=True)
+        # Using DuckDuckGo as it's more scraper-friendly
+        url = f"https://html.duckduckgo.com/html/?q={encoded_query}"
+        
+        try:
+            async with self.session.get(url) as response:
+                if response.status != 200:
+                    print(f"Error searching for company: HTTP {response.status}")
+                    return None
+                
+                html = await response.text()
+                soup = BeautifulSoup(html, "lxml")
+                
+                results = []
+                for result in soup.select(".result"):
+                    link_elem = result.select_one(".result__a")
+                    if not link_elem:
+                        continue
                         
-                        # Get snippet
-                        snippet_elem = result.select_one(".result__snippet")
-                        snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
+                    link = link_elem.get("href", "")
+                    # Extract URL from DuckDuckGo's redirect URL (it is percent-encoded there)
+                    match = re.search(r"uddg=([^&]+)", link)
+                    if match:
+                        url = unquote(match.group(1))
+                    else:
+                        continue
                         
-                        results.append({
-                            "title": title,
-                            "url": url,
-                            "snippet": snippet
-                        })
+                    # Get title
+                    title = link_elem.get_text(strip=True)
+                    
+                    # Get snippet
+                    snippet_elem = result.select_one(".result__snippet")
+                    snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
+                    
+                    results.append({
+                        "title": title,
+                        "url": url,
+                        "snippet": snippet
+                    })
+                    
+                    if len(results) >= SCRAPE_TOP_N:
+                        break
                         
-                        if len(results) >= 3:  # Limit to top 3 results
-                            break
-                            
-                    return results
-            except Exception as e:
-                print(f"Error searching for company: {str(e)}")
-                return []
+                return results
+        except Exception as e:
+            print(f"Error searching for company: {str(e)}")
+            return None
 
     async def _scrape_webpage(self, url: str) -> Optional[str]:
         """Scrape content from a webpage"""
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        return None
-                        
-                    html = await response.text()
-                    soup = BeautifulSoup(html, "html.parser")
-                    
-                    # Remove script and style elements
-                    for script in soup(["script", "style", "nav", "footer", "header"]):
-                        script.decompose()
-                        
-                    # Get text
-                    text = soup.get_text()
-                    
-                    # Break into lines and remove leading and trailing space
-                    lines = (line.strip() for line in text.splitlines())
-                    # Break multi-headlines into a line each
-                    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                    # Remove blank lines
-                    text = '\n'.join(chunk for chunk in chunks if chunk)
-                    
-                    return text[:15000]  # Limit text length
+            async with self.session.get(url, timeout=PAGE_TIMEOUT) as response:
+                if response.status != 200:
+                    return None
+
+                # Only the head of an HTML page is downloaded; PDFs, images etc. are skipped unread
+                html = await read_html(response)
+                charset = response.charset
+            # Parsing is CPU-bound; off the event loop so it can't hold up the scrape deadline
+            return await asyncio.to_thread(html_to_text, html, charset, PAGE_TEXT_CHARS)
+        except NotHtml:
+            return None
         except Exception as e:
             print(f"Error scraping webpage {url}: {str(e)}")
             return None
 
+    def _domain_limit(self, url: str) -> asyncio.Semaphore:
+        domain = (urlparse(url).hostname or "").lower()
+        limit = self._domain_limits.get(domain)
+        if limit is None:
+            limit = asyncio.Semaphore(MAX_FETCHES_PER_DOMAIN)
+            self._domain_limits[domain] = limit
+        return limit
+
+    async def _scrape_limited(self, url: str) -> Optional[str]:
+        async with self._domain_limit(url):
+            return await self._scrape_webpage(url)
+
+    async def _scrape_pages(self, urls: List[str]) -> Dict[str, str]:
+        """Fetch `urls` concurrently; returns the text of those that succeeded before the deadline"""
+        tasks = {url: asyncio.create_task(self._scrape_limited(url)) for url in dict.fromkeys(urls)}
+        done, pending = await asyncio.wait(tasks.values(), timeout=SCRAPE_DEADLINE_SECONDS)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        # In search-rank order, so the best match leads the merged text
+        return {
+            url: task.result() for url, task in tasks.items()
+            if task in done and not task.cancelled() and task.exception() is None and task.result()
+        }
+
     async def _extract_company_info(self, text: str, company_name: str) -> Dict[str, Any]:
         """Extract structured information from webpage text using LLM"""
         if not text or len(text.strip()) < 100:
             return {"error": "Insufficient text content"}
             
         prompt = self.extraction_prompt.format(
-            content=text[:10000],  # Limit content length
+            content=text,  # Already cut to the token budget by select_content
             company_name=company_name
         )
         
         try:
-            response = await self.model.generate_content_async(prompt)
-            
-            # Parse JSON response
-            response_text = response.text
-            
-            # Clean the response if it contains markdown code blocks
-            if "```json" in response_text:
-                json_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_text = response_text.split("```")[1].split("```")[0].strip()
-            else:
-                json_text = response_text
-                
-            return json.loads(json_text)
+            company_info, _ = await self.models.generate(
+                prompt, parse=parse_extraction, escalate=found_nothing
+            )
+            return company_info
         except Exception as e:
             print(f"Error extracting company info: {str(e)}")
             return {"error": f"Failed to extract info: {str(e)}"}
 
-    async def scrape_company_info(self, company_name: str) -> Dict[str, Any]:
-        """Main method to search for and scrape company information"""
+    async def scrape_company_info(self, company_name: str, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+        """Main method to search for and scrape company information.
+
+        Served from the company cache when this company was researched recently,
+        so a repeat company costs no search, fetch or extraction call. `fingerprint`
+        is the lead's company_fingerprint, which spellings of one company share.
+        """
+        return await self.cache.get_or_fetch(
+            company_name, lambda: self._research_company(company_name), fingerprint
+        )
+
+    async def _research_company(self, company_name: str) -> Dict[str, Any]:
         # Search for company
         search_results = await self._search_company(company_name)
         
+        if search_results is None:
+            # Not cacheable, so the next analysis of this company searches again
+            return {
+                "company_name": company_name,
+                "error": "Search failed"
+            }
+        
         if not search_results:
             return {
                 "company_name": company_name,
-                "error": "No search results found"
+                "error": NO_RESULTS_ERROR
             }
         
         # Get the most relevant URL (first result)
         main_url = search_results[0]["url"]
         
-        # Scrape the webpage
-        webpage_text = await self._scrape_webpage(main_url)
+        # Another spelling of this company may already have led us to the same site
+        known = await self.cache.get_domain(main_url)
+        if known is not None:
+            return {**known, "company_name": company_name, "search_results": search_results}
+        
+        # Scrape the top results concurrently, keeping whatever finished by the deadline
+        pages = await self._scrape_pages([result["url"] for result in search_results])
         
-        if not webpage_text:
+        if not pages:
             return {
                 "company_name": company_name,
                 "website_url": main_url,
                 "error": "Failed to scrape webpage"
             }
         
-        # Extract company information
+        # Extract company information from the most relevant text of all fetched pages at once
+        webpage_text = select_content(pages, company_name)
         company_info = await self._extract_company_info(webpage_text, company_name)
         
         # Add metadata
@@ -198,6 +255,7 @@ class WebScraper:
             "company_name": company_name,
             "website_url": main_url,
             "search_results": search_results,
+            "sources": list(pages),
             "found_data": company_info
         }
         
@@ -6,9 +6,20 @@ from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 
 from .routes import router
+from .services.chatbot_service import ChatbotService
+from .services.sessions import SessionStore
 
 app = FastAPI(title="Lead Automation Chatbot Service")
 
+@app.on_event("startup")
+async def startup():
+    # One service for the process, so sessions and their live chats outlast a request
+    app.state.chatbot_service = ChatbotService(SessionStore())
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.chatbot_service.sessions.close()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -7,9 +7,14 @@ class Message(BaseModel):
     content: str
 
 class ChatRequest(BaseModel):
-    messages: List[Message]
+    """The user's new message, in the session from an earlier response (none on the first turn)"""
+    session_id: Optional[str] = None
+    message: Optional[str] = None
+    # Older clients post the whole conversation instead; it seeds a new session
+    messages: Optional[List[Message]] = None
 
 class ChatResponse(BaseModel):
+    session_id: str
     response: str
     extracted_data: Optional[Dict[str, Any]] = None
 
@@ -1,13 +1,17 @@
 # chatbot-service/app/routes.py
+import asyncio
+import json
 import os
+import time
 from fastapi import APIRouter, Request, HTTPException, Depends
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 import httpx
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
 
 from .models import ChatRequest, ChatResponse, LeadData
 from .services.chatbot_service import ChatbotService
+from .services.sessions import ChatState
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -15,8 +19,64 @@ templates = Jinja2Templates(directory="app/templates")
 DATABASE_SERVICE_URL = os.getenv("DATABASE_SERVICE_URL", "http://localhost:8000")
 ANALYZER_SERVICE_URL = os.getenv("ANALYZER_SERVICE_URL", "http://localhost:8002")
 
-async def get_chatbot_service():
-    return ChatbotService()
+# Lead fields that feed the analysis prompt; a change to contact details alone isn't worth a re-analysis
+ANALYSIS_FIELDS = {"position", "revenue", "service_type", "message"}
+
+# Lead saves started after a streamed reply, kept referenced until they finish
+_lead_tasks: Set[asyncio.Task] = set()
+
+async def get_chatbot_service(request: Request) -> ChatbotService:
+    return request.app.state.chatbot_service
+
+async def resolve_session(chat_request: ChatRequest, chatbot_service: ChatbotService) -> Tuple[ChatState, str]:
+    """The session to continue, or a new one if it's new, expired or evicted, and the user's new message"""
+    message = chat_request.message
+    earlier = []
+    if message is None:
+        if not chat_request.messages:
+            raise HTTPException(status_code=400, detail="Pass message (with session_id after the first turn)")
+        *earlier, last = chat_request.messages
+        message = last.content
+
+    session = None
+    if chat_request.session_id:
+        session = await chatbot_service.sessions.get(chat_request.session_id)
+    if session is None:
+        session = chatbot_service.start_session(earlier)
+    return session, message
+
+async def save_lead(extracted_data: Optional[Dict[str, Any]]):
+    """Upsert the lead once the conversation has enough details, and have it analysed if they changed"""
+    if not extracted_data or not all(key in extracted_data for key in ["company_name", "contact_name", "email"]):
+        return
+    try:
+        # Create a LeadData object for validation
+        lead_data = LeadData(**extracted_data)
+        
+        # Save to database service; every later turn of the same conversation
+        # updates this lead instead of creating a new one
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{DATABASE_SERVICE_URL}/leads/upsert",
+                json=lead_data.dict(exclude_none=True)
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                # Only (re)analyze a new lead, or one whose analysis inputs changed
+                if result["created"] or ANALYSIS_FIELDS.intersection(result["changed_fields"]):
+                    lead_id = result["lead"]["id"]
+                    await client.post(
+                        f"{ANALYZER_SERVICE_URL}/analyze/{lead_id}",
+                        json={}
+                    )
+            else:
+                print(f"Failed to save lead: {response.text}")
+    except Exception as e:
+        print(f"Error processing lead data: {str(e)}")
+
+def format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
 
 @router.get("/", response_class=HTMLResponse)
 async def get_chat_page(request: Request):
@@ -31,35 +91,69 @@ async def chat(
     chat_request: ChatRequest,
     chatbot_service: ChatbotService = Depends(get_chatbot_service)
 ):
+    session, message = await resolve_session(chat_request, chatbot_service)
+
     # Process the chat with Gemini
-    response_text, extracted_data = await chatbot_service.process_chat(chat_request.messages)
+    response_text, extracted_data = await chatbot_service.process_chat(session, message)
     
     # If we have enough data, save it to the database
-    if extracted_data and all(key in extracted_data for key in ["company_name", "contact_name", "email"]):
-        try:
-            # Create a LeadData object for validation
-            lead_data = LeadData(**extracted_data)
-            
-            # Save to database service
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{DATABASE_SERVICE_URL}/leads/",
-                    json=lead_data.dict(exclude_none=True)
-                )
-                
-                if response.status_code == 200:
-                    # Trigger analyzer service to process the lead
-                    lead_id = response.json()["id"]
-                    await client.post(
-                        f"{ANALYZER_SERVICE_URL}/analyze/{lead_id}",
-                        json={}
-                    )
-                else:
-                    print(f"Failed to save lead: {response.text}")
-        except Exception as e:
-            print(f"Error processing lead data: {str(e)}")
+    await save_lead(extracted_data)
     
     return ChatResponse(
+        session_id=session.session_id,
         response=response_text,
         extracted_data=extracted_data
-    )
\ No newline at end of file
+    )
+
+@router.post("/api/chat/stream")
+async def chat_stream(
+    chat_request: ChatRequest,
+    chatbot_service: ChatbotService = Depends(get_chatbot_service)
+):
+    """Like POST /api/chat, but the reply is streamed as server-sent events while Gemini writes it.
+
+    Events, in order: `session` {session_id}; `token` {text} per chunk of the reply;
+    `extracted` {extracted_data} once the turn is recorded; `done` {ttft_ms, total_ms}.
+    A failure ends the stream with `error` {detail}.
+    """
+    session, message = await resolve_session(chat_request, chatbot_service)
+    return StreamingResponse(
+        stream_turn(chatbot_service, session, message),
+        media_type="text/event-stream",
+        # Proxies must pass chunks through as they come, not buffer the reply
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def stream_turn(chatbot_service: ChatbotService, session: ChatState, message: str) -> AsyncIterator[bytes]:
+    started = time.perf_counter()
+    first_token = None
+    extracted_data = None
+    yield format_sse("session", {"session_id": session.session_id})
+    try:
+        async for kind, value in chatbot_service.stream_chat(session, message):
+            if kind == "text":
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                yield format_sse("token", {"text": value})
+            else:
+                extracted_data = value
+                yield format_sse("extracted", {"extracted_data": extracted_data})
+    except Exception as e:
+        print(f"Error streaming chat reply: {str(e)}")
+        yield format_sse("error", {"detail": "The reply could not be generated"})
+        return
+    yield format_sse("done", {
+        "ttft_ms": round(first_token * 1000, 1) if first_token is not None else None,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+    # Upserting and analysing the lead can take a while; the browser already has everything,
+    # and closing the tab now shouldn't cancel it
+    task = asyncio.create_task(save_lead(extracted_data))
+    _lead_tasks.add(task)
+    task.add_done_callback(_lead_tasks.discard)
+
+@router.get("/debug/chat-sessions")
+async def get_chat_session_stats(chatbot_service: ChatbotService = Depends(get_chatbot_service)):
+    """Live sessions, model input size and reply latency per turn, and time to first token when streamed"""
+    return chatbot_service.stats()
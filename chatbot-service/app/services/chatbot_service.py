@@ -1,11 +1,22 @@
 # chatbot-service/app/services/chatbot_service.py
 import os
 import json
+import time
+from collections import deque
 import google.generativeai as genai
-from typing import List, Dict, Any, Tuple, Optional
+from typing import AsyncIterator, List, Dict, Any, Tuple
+
+from ..models import Message
+from .sessions import HISTORY_TOKEN_BUDGET, MODEL_ROLE, USER_ROLE, ChatState, SessionStore, Turn, estimate_tokens
+
+# Streamed turns whose time to first token is kept for percentiles
+TTFT_SAMPLES = 1000
+
+# The model's reply to the system prompt, which opens every conversation
+SYSTEM_PROMPT_ACKNOWLEDGEMENT = "I understand my role. I'll engage with potential leads in a friendly, conversational manner while collecting the necessary information gradually. I'll be ready to answer questions about your services while extracting key data for your database."
 
 class ChatbotService:
-    def __init__(self):
+    def __init__(self, sessions: SessionStore):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
@@ -68,31 +79,117 @@ class ChatbotService:
         If you can't determine a particular value with confidence, use null.
         """
 
-    async def process_chat(self, messages: List[Dict[str, str]]) -> Tuple[str, Optional[Dict[str, Any]]]:
-        # Prepare messages for Gemini
-        gemini_messages = []
-        
-        # Add system prompt
-        gemini_messages.append({"role": "user", "parts": [self.system_prompt]})
-        gemini_messages.append({"role": "model", "parts": ["I understand my role. I'll engage with potential leads in a friendly, conversational manner while collecting the necessary information gradually. I'll be ready to answer questions about your services while extracting key data for your database."]})
-        
-        # Add user messages
-        for message in messages:
-            # Fix: Access the message object as a Pydantic model using attribute notation
-            gemini_messages.append({
-                "role": "user" if message.role == "user" else "model",
-                "parts": [message.content]
-            })
-        
-        # Get response from Gemini
-        chat = self.model.start_chat(history=gemini_messages)
-        response = await chat.send_message_async("Please respond to the user's latest message")
-        
-        # Extract structured information
-        extraction_response = await chat.send_message_async(self.extraction_prompt)
-        
+        self.sessions = sessions
+        self.turns = 0
+        self.input_tokens_total = 0
+        self.input_tokens_max = 0
+        self.reply_seconds_total = 0.0
+        self.reply_seconds_max = 0.0
+        self.ttft_seconds = deque(maxlen=TTFT_SAMPLES)
+
+    def start_session(self, messages: List[Message] = ()) -> ChatState:
+        """A new session, seeded with a conversation a client kept itself"""
+        state = self.sessions.create()
+        state.turns = [
+            Turn(USER_ROLE if message.role == "user" else MODEL_ROLE, message.content) for message in messages
+        ]
+        state.trim(HISTORY_TOKEN_BUDGET)
+        return state
+
+    def _history(self, state: ChatState) -> List[Dict[str, Any]]:
+        system_prompt = self.system_prompt
+        known = {key: value for key, value in state.extracted.items() if value is not None}
+        if state.trimmed_turns and known:
+            # Dropped turns may have carried these; restate them so the model doesn't ask again
+            system_prompt += (
+                "\nThe start of this conversation is no longer shown. "
+                f"Details the lead has already given: {json.dumps(known)}\n"
+            )
+        history = [
+            {"role": USER_ROLE, "parts": [system_prompt]},
+            {"role": MODEL_ROLE, "parts": [SYSTEM_PROMPT_ACKNOWLEDGEMENT]},
+        ]
+        history.extend({"role": turn.role, "parts": [turn.text]} for turn in state.turns)
+        return history
+
+    def _chat(self, state: ChatState):
+        if state.chat is None:
+            # First turn on this worker; afterwards the ChatSession carries the history itself
+            state.chat = self.model.start_chat(history=self._history(state))
+        return state.chat
+
+    def _input_tokens(self, state: ChatState, message: str) -> int:
+        return sum(
+            estimate_tokens(part) for content in self._history(state) for part in content["parts"]
+        ) + estimate_tokens(message)
+
+    async def process_chat(self, state: ChatState, message: str) -> Tuple[str, Dict[str, Any]]:
+        """Reply to the user's new message in this session; returns the reply and the lead details so far"""
+        async with state.lock:
+            chat = self._chat(state)
+            input_tokens = self._input_tokens(state, message)
+            started = time.perf_counter()
+            response = await chat.send_message_async(message)
+            self._record_turn(input_tokens, time.perf_counter() - started)
+            return response.text, await self._finish_turn(state, message, response.text)
+
+    async def stream_chat(self, state: ChatState, message: str) -> AsyncIterator[Tuple[str, Any]]:
+        """Reply to the user's new message as it is generated.
+
+        Yields ("text", chunk) for each piece of the reply as Gemini streams it,
+        then ("extracted", lead details so far) once the turn is recorded.
+        """
+        async with state.lock:
+            chat = self._chat(state)
+            input_tokens = self._input_tokens(state, message)
+            started = time.perf_counter()
+            first_token = None
+            chunks = []
+            try:
+                response = await chat.send_message_async(message, stream=True)
+                async for chunk in response:
+                    if not chunk.text:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                        self.ttft_seconds.append(first_token)
+                    chunks.append(chunk.text)
+                    yield "text", chunk.text
+            except BaseException:
+                # Failed, or the client went away: keep the partial reply out of the conversation.
+                # Not rewind(): it reads the reply's first candidate, which a stream that failed
+                # early doesn't have, and its IndexError would replace the original error.
+                # The session's turns don't include this exchange yet, so reset the chat to them.
+                chat.history = self._history(state)
+                raise
+            self._record_turn(input_tokens, time.perf_counter() - started)
+            yield "extracted", await self._finish_turn(state, message, "".join(chunks))
+
+    async def _finish_turn(self, state: ChatState, message: str, reply: str) -> Dict[str, Any]:
+        """Record the exchange, extract lead details and save the session; returns the details so far"""
+        state.turns.append(Turn(USER_ROLE, message))
+        state.turns.append(Turn(MODEL_ROLE, reply))
+
+        for key, value in (await self._extract(state.chat)).items():
+            # A detail given earlier stays known even if this extraction missed it
+            if value is not None or key not in state.extracted:
+                state.extracted[key] = value
+
+        if state.trim(HISTORY_TOKEN_BUDGET):
+            state.chat.history = self._history(state)
+        await self.sessions.save(state)
+        return dict(state.extracted)
+
+    async def _extract(self, chat) -> Dict[str, Any]:
+        """Lead details from the conversation, without adding the extraction exchange to it"""
+        try:
+            extraction_response = await chat.send_message_async(self.extraction_prompt)
+        except Exception as e:
+            print(f"Error extracting data: {str(e)}")
+            return {}
+        chat.rewind()
+
         # Parse the extracted JSON
-        extracted_data = None
         try:
             # Clean the response to get only the JSON part
             json_text = extraction_response.text
@@ -106,6 +203,34 @@ class ChatbotService:
             extracted_data = json.loads(json_text)
         except Exception as e:
             print(f"Error extracting data: {str(e)}")
-            extracted_data = {}
-        
-        return response.text, extracted_data
\ No newline at end of file
+            return {}
+        return extracted_data if isinstance(extracted_data, dict) else {}
+
+    def _record_turn(self, input_tokens: int, seconds: float):
+        self.turns += 1
+        self.input_tokens_total += input_tokens
+        self.input_tokens_max = max(self.input_tokens_max, input_tokens)
+        self.reply_seconds_total += seconds
+        self.reply_seconds_max = max(self.reply_seconds_max, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "turns": self.turns,
+            "mean_input_tokens": round(self.input_tokens_total / self.turns) if self.turns else 0,
+            "max_input_tokens": self.input_tokens_max,
+            "mean_reply_ms": round(self.reply_seconds_total / self.turns * 1000, 1) if self.turns else 0.0,
+            "max_reply_ms": round(self.reply_seconds_max * 1000, 1),
+            # Streamed turns only: from sending the message to the first chunk of the reply
+            "ttft_ms": _percentiles(self.ttft_seconds),
+            "sessions": self.sessions.stats(),
+        }
+
+
+def _percentiles(samples) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        name: round(ordered[min(int(len(ordered) * q), len(ordered) - 1)] * 1000, 1)
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("max", 1.0))
+    }
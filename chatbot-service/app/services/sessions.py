@@ -0,0 +1,237 @@
+# chatbot-service/app/services/sessions.py
+"""Server-side chat sessions.
+
+The client used to post the whole conversation on every turn, and the
+service rebuilt the Gemini history from it, system prompt included, so
+request size and model input grew with every turn. Now the client posts
+only its new message with a session id, and the session keeps the
+conversation (and the live ChatSession built from it) on the server.
+
+- Memory: a bounded LRU of sessions; a session idle for longer than
+  SESSION_TTL_SECONDS is gone.
+- Disk (optional, CHAT_SESSION_DB_PATH): every turn is written to SQLite, so
+  a session evicted from memory, started on another worker or before a
+  restart carries on where it left off.
+- History is bounded: once the turns exceed CHAT_HISTORY_TOKEN_BUDGET the
+  oldest are dropped. What they established is kept as the lead details
+  extracted so far, which the chatbot restates to the model.
+"""
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", str(30 * 60)))
+# Empty keeps sessions in memory only
+SESSION_DB_PATH = os.getenv("CHAT_SESSION_DB_PATH", "")
+# Estimated tokens of conversation kept, on top of the system prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+CHARS_PER_TOKEN = 4
+
+# Writes between deletions of expired sessions from disk
+PURGE_EVERY_WRITES = 100
+
+USER_ROLE = "user"
+MODEL_ROLE = "model"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class Turn:
+    role: str  # USER_ROLE or MODEL_ROLE
+    text: str
+
+
+@dataclass
+class ChatState:
+    session_id: str
+    turns: List[Turn] = field(default_factory=list)
+    # Lead details extracted so far, merged across turns
+    extracted: Dict[str, Any] = field(default_factory=dict)
+    # Turns dropped to stay within the history budget
+    trimmed_turns: int = 0
+    # Bumped on every saved turn; tells a worker its copy is behind the disk
+    version: int = 0
+    updated_at: float = field(default_factory=time.time)
+    # The live google.generativeai ChatSession, built on first use by the chatbot
+    chat: Any = None
+    # One turn at a time per session
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def expired(self) -> bool:
+        return time.time() - self.updated_at > SESSION_TTL_SECONDS
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(turn.text) for turn in self.turns)
+
+    def trim(self, token_budget: int = HISTORY_TOKEN_BUDGET) -> bool:
+        """Drop the oldest exchanges until the turns fit `token_budget`; returns whether any were dropped.
+
+        The latest exchange is always kept.
+        """
+        tokens = self.history_tokens()
+        dropped = 0
+        while tokens > token_budget and len(self.turns) - dropped > 2:
+            tokens -= sum(estimate_tokens(turn.text) for turn in self.turns[dropped:dropped + 2])
+            dropped += 2
+        if dropped:
+            del self.turns[:dropped]
+            self.trimmed_turns += dropped
+        return dropped > 0
+
+
+class SessionStore:
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        max_sessions: int = MAX_SESSIONS,
+    ):
+        self.max_sessions = max_sessions
+        self._memory: "OrderedDict[str, ChatState]" = OrderedDict()
+
+        self._db = None
+        self._writes = 0
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Disk calls run in worker threads; one connection guarded by a lock
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db_lock = threading.Lock()
+            with self._db_lock:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA busy_timeout=5000")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                    "session_id TEXT PRIMARY KEY, turns TEXT NOT NULL, extracted TEXT NOT NULL, "
+                    "trimmed_turns INTEGER NOT NULL, version INTEGER NOT NULL, updated_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS ix_chat_sessions_updated_at ON chat_sessions (updated_at)")
+                self._db.commit()
+            self._purge_disk()
+
+        self.created = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.expired = 0
+
+    async def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+
+    # Disk
+
+    def _read_disk(self, session_id: str, newer_than: int = -1) -> Optional[ChatState]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT turns, extracted, trimmed_turns, version, updated_at FROM chat_sessions "
+                "WHERE session_id = ? AND version > ?",
+                (session_id, newer_than),
+            ).fetchone()
+        if row is None:
+            return None
+        return ChatState(
+            session_id=session_id,
+            turns=[Turn(**turn) for turn in json.loads(row[0])],
+            extracted=json.loads(row[1]),
+            trimmed_turns=row[2],
+            version=row[3],
+            updated_at=row[4],
+        )
+
+    def _write_disk(self, state: ChatState):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chat_sessions "
+                "(session_id, turns, extracted, trimmed_turns, version, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    state.session_id,
+                    json.dumps([{"role": turn.role, "text": turn.text} for turn in state.turns]),
+                    json.dumps(state.extracted),
+                    state.trimmed_turns,
+                    state.version,
+                    state.updated_at,
+                ),
+            )
+            self._db.commit()
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            self._purge_disk()
+
+    def _purge_disk(self):
+        with self._db_lock:
+            self._db.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (time.time() - SESSION_TTL_SECONDS,))
+            self._db.commit()
+
+    # Sessions
+
+    def _remember(self, state: ChatState):
+        self._memory[state.session_id] = state
+        self._memory.move_to_end(state.session_id)
+        while len(self._memory) > self.max_sessions:
+            self._memory.popitem(last=False)
+            self.evicted += 1
+
+    def create(self) -> ChatState:
+        state = ChatState(session_id=secrets.token_urlsafe(16))
+        self._remember(state)
+        self.created += 1
+        return state
+
+    async def get(self, session_id: str) -> Optional[ChatState]:
+        """The session, unless it doesn't exist or has expired"""
+        state = self._memory.get(session_id)
+        if self._db is not None:
+            # Another worker may have taken turns in this session since we last saw it
+            newer = await asyncio.to_thread(self._read_disk, session_id, state.version if state else -1)
+            if newer is not None:
+                state = newer
+                self.disk_hits += 1
+                self._remember(state)
+            elif state is not None:
+                self.memory_hits += 1
+        elif state is not None:
+            self.memory_hits += 1
+
+        if state is None:
+            self.misses += 1
+            return None
+        if state.expired():
+            self.expired += 1
+            self._memory.pop(session_id, None)
+            return None
+        self._memory.move_to_end(session_id)
+        return state
+
+    async def save(self, state: ChatState):
+        """Record a completed turn"""
+        state.version += 1
+        state.updated_at = time.time()
+        self._remember(state)
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, state)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions_in_memory": len(self._memory),
+            "max_sessions": self.max_sessions,
+            "persistent": self._db is not None,
+            "created": self.created,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
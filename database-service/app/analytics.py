@@ -0,0 +1,170 @@
+# database-service/app/analytics.py
+"""Incrementally maintained pipeline analytics.
+
+Summary rows are bumped by SQLite triggers, so they are updated in the same
+transaction as every insert into leads, analyses and team_matches, whichever
+code path performed it (single create, group commit, bulk ingestion).
+
+Rebuild from existing data with: python -m app.analytics rebuild
+"""
+import asyncio
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import (
+    DBDailyLeadStats, DBDailyDecisionStats, DBDailyTeamMatchStats,
+    AnalyticsBucket, AnalyticsSummary
+)
+
+BUCKETS = ("day", "week")
+
+# Window used when the caller gives no range
+DEFAULT_RANGE_DAYS = 30
+
+# created_at is written by the application; fall back to now so a missing value can't break the insert
+_DAY = "date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP))"
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_leads_daily_stats AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO daily_lead_stats (day, leads) VALUES ({_DAY}, 1)
+        ON CONFLICT (day) DO UPDATE SET leads = leads + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_daily_stats AFTER INSERT ON analyses
+    BEGIN
+        INSERT INTO daily_decision_stats (day, final_decision, analyses)
+        VALUES ({_DAY}, COALESCE(NEW.final_decision, 'Unknown'), 1)
+        ON CONFLICT (day, final_decision) DO UPDATE SET analyses = analyses + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_team_matches_daily_stats_assigned AFTER INSERT ON team_matches
+    WHEN NEW.team_member_id IS NOT NULL
+    BEGIN
+        INSERT INTO daily_team_match_stats (day, team_member_id, matches)
+        VALUES ({_DAY}, NEW.team_member_id, 1)
+        ON CONFLICT (day, team_member_id) DO UPDATE SET matches = matches + 1;
+    END
+    """,
+]
+
+REBUILD_STATEMENTS = [
+    "DELETE FROM daily_lead_stats",
+    "DELETE FROM daily_decision_stats",
+    "DELETE FROM daily_team_match_stats",
+    """
+    INSERT INTO daily_lead_stats (day, leads)
+    SELECT date(COALESCE(created_at, CURRENT_TIMESTAMP)), count(*) FROM leads GROUP BY 1
+    """,
+    """
+    INSERT INTO daily_decision_stats (day, final_decision, analyses)
+    SELECT date(COALESCE(created_at, CURRENT_TIMESTAMP)), COALESCE(final_decision, 'Unknown'), count(*)
+    FROM analyses GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO daily_team_match_stats (day, team_member_id, matches)
+    SELECT date(COALESCE(created_at, CURRENT_TIMESTAMP)), team_member_id, count(*)
+    FROM team_matches WHERE team_member_id IS NOT NULL GROUP BY 1, 2
+    """,
+]
+
+
+# Earlier definitions; the team match one also counted matches without a team member
+SUPERSEDED_TRIGGERS = ["trg_team_matches_daily_stats"]
+
+
+def create_triggers(conn):
+    for name in SUPERSEDED_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    for statement in TRIGGERS:
+        conn.exec_driver_sql(statement)
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        # ISO weeks, starting on Monday
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+async def get_summary(
+    db: AsyncSession,
+    bucket: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> AnalyticsSummary:
+    """Read the summary tables for [start, end]; cost is proportional to days in range, not rows"""
+    end = end or date.today()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if bucket == "week":
+        start = bucket_start(start, bucket)
+
+    buckets: Dict[date, AnalyticsBucket] = {}
+
+    def get_bucket(day: date) -> AnalyticsBucket:
+        key = bucket_start(day, bucket)
+        if key not in buckets:
+            buckets[key] = AnalyticsBucket(
+                start=key, leads=0, decisions={}, matches=0, matches_by_team_member={}
+            )
+        return buckets[key]
+
+    result = await db.execute(
+        select(DBDailyLeadStats).where(DBDailyLeadStats.day.between(start, end))
+    )
+    for row in result.scalars():
+        get_bucket(row.day).leads += row.leads
+
+    result = await db.execute(
+        select(DBDailyDecisionStats).where(DBDailyDecisionStats.day.between(start, end))
+    )
+    for row in result.scalars():
+        decisions = get_bucket(row.day).decisions
+        decisions[row.final_decision] = decisions.get(row.final_decision, 0) + row.analyses
+
+    result = await db.execute(
+        select(DBDailyTeamMatchStats).where(DBDailyTeamMatchStats.day.between(start, end))
+    )
+    for row in result.scalars():
+        entry = get_bucket(row.day)
+        entry.matches += row.matches
+        entry.matches_by_team_member[row.team_member_id] = (
+            entry.matches_by_team_member.get(row.team_member_id, 0) + row.matches
+        )
+
+    return AnalyticsSummary(
+        bucket=bucket,
+        start=start,
+        end=end,
+        buckets=[buckets[key] for key in sorted(buckets)],
+    )
+
+
+async def rebuild(engine) -> None:
+    """Recompute every summary table from the base tables in one transaction"""
+    async with engine.begin() as conn:
+        for statement in REBUILD_STATEMENTS:
+            await conn.exec_driver_sql(statement)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.analytics rebuild")
+        sys.exit(2)
+
+    from .database import engine, init_db
+
+    async def main():
+        await init_db()
+        await rebuild(engine)
+        print("Analytics summary tables rebuilt")
+
+    asyncio.run(main())
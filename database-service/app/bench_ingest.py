@@ -0,0 +1,83 @@
+# database-service/app/bench_ingest.py
+"""Benchmark lead ingestion: one POST /leads/ per lead against POST /leads/bulk.
+
+Runs the app in-process against a scratch SQLite file, like the query-plan
+check. Also times the bulk body splitter on one long line delivered in
+small chunks, which must stay linear in the line length.
+
+Usage: python -m app.bench_ingest [bulk_rows] [single_rows]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# A single line under MAX_LINE_BYTES, fed to the splitter in small chunks
+LONG_LINE_BYTES = 512 * 1024
+LONG_LINE_CHUNK_BYTES = 64
+
+
+def lead(index: int) -> dict:
+    return {
+        "company_name": f"Bench Company {index}",
+        "contact_name": f"Contact {index}",
+        "email": f"contact{index}@bench{index}.test",
+        "service_type": "SEO",
+        "message": "Looking for a new website and ongoing SEO work.",
+    }
+
+
+def time_line_splitting(line_bytes: int = LONG_LINE_BYTES, chunk_bytes: int = LONG_LINE_CHUNK_BYTES) -> float:
+    from .bulk import iter_lines
+
+    data = b"x" * line_bytes + b"\n"
+
+    async def chunks():
+        for start in range(0, len(data), chunk_bytes):
+            yield data[start:start + chunk_bytes]
+
+    async def split():
+        return [line async for line in iter_lines(chunks())]
+
+    started = time.perf_counter()
+    asyncio.run(split())
+    return time.perf_counter() - started
+
+
+def main(bulk_rows: int, single_rows: int):
+    workdir = tempfile.mkdtemp(prefix="bench-ingest-")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Imported late so the engine binds to the scratch database
+    from fastapi.testclient import TestClient
+    from .main import app
+
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        for index in range(single_rows):
+            response = client.post("/leads/", json=lead(index))
+            response.raise_for_status()
+        single_seconds = time.perf_counter() - started
+
+        body = "\n".join(json.dumps(lead(single_rows + index)) for index in range(bulk_rows)).encode()
+        started = time.perf_counter()
+        response = client.post("/leads/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        bulk_seconds = time.perf_counter() - started
+        result = response.json()
+
+    print(f"POST /leads/      {single_rows} rows  {single_rows / single_seconds:,.0f} rows/s")
+    print(f"POST /leads/bulk  {bulk_rows} rows  {bulk_rows / bulk_seconds:,.0f} rows/s "
+          f"(inserted={result['inserted']}, errors={len(result['errors'])})")
+    print(f"iter_lines        one {LONG_LINE_BYTES // 1024} KB line in {LONG_LINE_CHUNK_BYTES} B chunks  "
+          f"{time_line_splitting() * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) > 2 or not all(arg.isdigit() for arg in args):
+        print("Usage: python -m app.bench_ingest [bulk_rows] [single_rows]")
+        sys.exit(2)
+    main(int(args[0]) if args else 20000, int(args[1]) if len(args) > 1 else 500)
@@ -0,0 +1,98 @@
+# database-service/app/bench_search.py
+"""Benchmark GET /search on selective and near-universal queries.
+
+Runs the app in-process against a scratch SQLite file, seeded with leads
+(through POST /leads/bulk) and an analysis for every other lead, then
+times each query with exact bm25 ranking of every match and with ranking
+capped at the newest RANK_CANDIDATES matches.
+
+Usage: python -m app.bench_search [leads] [repeats]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Every lead's message contains these, so they match (nearly) all rows
+COMMON_TERMS = ["website", "seo"]
+
+SERVICES = ["SEO", "Web Design", "PPC", "Branding", "Content"]
+
+
+def lead(index: int) -> dict:
+    return {
+        "company_name": f"Bench Company {index}",
+        "contact_name": f"Contact {index}",
+        "email": f"contact{index}@bench{index}.test",
+        "service_type": SERVICES[index % len(SERVICES)],
+        "message": f"Looking for a new website and ongoing SEO work, reference {index}.",
+    }
+
+
+def analysis(lead_id: int) -> dict:
+    return {
+        "lead_id": lead_id,
+        "company_details": {"lead": lead_id},
+        "llm_analysis": f"Lead {lead_id} runs a regional business with an outdated website. " * 5,
+        "final_decision": "Yes" if lead_id % 3 else "No",
+    }
+
+
+async def run(leads: int, repeats: int):
+    import httpx
+    from . import search
+    from .database import write_session
+    from .main import app
+    from .models import DBAnalysis
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            body = "\n".join(json.dumps(lead(index)) for index in range(leads)).encode()
+            response = await client.post(
+                "/leads/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}, timeout=None
+            )
+            response.raise_for_status()
+
+            # Straight through a session; the search triggers index them all the same
+            async with write_session() as db:
+                db.add_all(DBAnalysis(**analysis(lead_id)) for lead_id in range(1, leads + 1, 2))
+                await db.commit()
+
+            queries = {
+                "selective": f"Bench Company {leads // 2}",
+                "prefix": f"reference {leads // 3}*",
+                **{f"common '{term}'": term for term in COMMON_TERMS},
+            }
+            capped = search.RANK_CANDIDATES
+            print(f"{leads} leads, {(leads + 1) // 2} analyses")
+            for label, query in queries.items():
+                timings = {}
+                for mode, candidates in (("exact", leads + 1), ("capped", capped)):
+                    search.RANK_CANDIDATES = candidates
+                    started = time.perf_counter()
+                    for _ in range(repeats):
+                        response = await client.get("/search", params={"q": query, "limit": 20})
+                        response.raise_for_status()
+                    timings[mode] = (time.perf_counter() - started) / repeats * 1000
+                search.RANK_CANDIDATES = capped
+                print(f"{label:16} exact {timings['exact']:7.1f} ms   capped at {capped} {timings['capped']:7.1f} ms")
+    finally:
+        await app.router.shutdown()
+
+
+def main(leads: int, repeats: int):
+    workdir = tempfile.mkdtemp(prefix="bench-search-")
+    # Set before the app is imported, so the engine binds to the scratch database
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    asyncio.run(run(leads, repeats))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) > 2 or not all(arg.isdigit() for arg in args):
+        print("Usage: python -m app.bench_search [leads] [repeats]")
+        sys.exit(2)
+    main(int(args[0]) if args else 100000, int(args[1]) if len(args) > 1 else 5)
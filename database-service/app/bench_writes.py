@@ -0,0 +1,135 @@
+# database-service/app/bench_writes.py
+"""Benchmark concurrent inserts through the group-commit writer.
+
+Runs the app in-process against a scratch SQLite file and fires POSTs at
+the create endpoints with a fixed number in flight, reporting requests per
+second and failed requests (before the writer queue these were "database
+is locked" errors). Then stores ranked match lists both ways, one POST
+/team-matches/ per match against one POST /team-matches/bulk per list,
+reporting lists per second and SQL statements per list.
+
+Usage: python -m app.bench_writes [requests] [concurrency ...]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Any, List, Tuple
+
+# Ranked match lists stored each way, and matches per list
+MATCH_LISTS = 200
+MATCHES_PER_LIST = 10
+
+
+async def fire(client, path: str, payload: Callable[[int], Dict[str, Any]], requests: int, concurrency: int) -> Tuple[float, int]:
+    """Send `requests` POSTs to `path` with `concurrency` in flight; returns (requests/s, failures)"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            index = queue.get_nowait()
+            response = await client.post(path, json=payload(index))
+            if response.status_code != 200:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return requests / (time.perf_counter() - started), failures
+
+
+async def store_match_lists(client, lead_id: int, member_ids: List[int], bulk: bool) -> float:
+    """Store MATCH_LISTS ranked lists for `lead_id`; returns lists/s"""
+    started = time.perf_counter()
+    for _ in range(MATCH_LISTS):
+        matches = [
+            {"team_member_id": member_id, "relevance_score": 1 - rank / len(member_ids)}
+            for rank, member_id in enumerate(member_ids)
+        ]
+        if bulk:
+            response = await client.post("/team-matches/bulk", json={"lead_id": lead_id, "matches": matches})
+            response.raise_for_status()
+        else:
+            for match in matches:
+                response = await client.post("/team-matches/", json={"lead_id": lead_id, **match})
+                response.raise_for_status()
+    return MATCH_LISTS / (time.perf_counter() - started)
+
+
+async def run(requests: int, concurrency_levels: List[int]):
+    import httpx
+    from sqlalchemy import event
+    from .database import engine
+    from .main import app
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            lead = await client.post("/leads/", json={
+                "company_name": "Bench", "contact_name": "Bench", "email": "bench@bench.test",
+            })
+            member = await client.post("/team-members/", json={
+                "name": "Bench", "email": "member@bench.test", "skills": ["seo"], "role": "Strategist",
+                "expertise_summary": "n/a",
+            })
+            lead_id, member_id = lead.json()["id"], member.json()["id"]
+
+            endpoints = {
+                "/analyses/": lambda index: {
+                    "lead_id": lead_id, "company_details": {"index": index},
+                    "llm_analysis": "Benchmark analysis text. " * 20, "final_decision": "Yes",
+                },
+                "/team-matches/": lambda index: {
+                    "lead_id": lead_id, "team_member_id": member_id, "relevance_score": index / requests,
+                },
+            }
+            for concurrency in concurrency_levels:
+                for path, payload in endpoints.items():
+                    rate, failures = await fire(client, path, payload, requests, concurrency)
+                    print(f"POST {path:15} concurrency={concurrency:<4} {rate:7,.0f} req/s  failures={failures}")
+
+            member_ids = [member_id]
+            for index in range(1, MATCHES_PER_LIST):
+                response = await client.post("/team-members/", json={
+                    "name": f"Bench {index}", "email": f"member{index}@bench.test", "skills": ["seo"],
+                    "role": "Strategist", "expertise_summary": "n/a",
+                })
+                member_ids.append(response.json()["id"])
+
+            statements = 0
+
+            def count_statement(*args):
+                nonlocal statements
+                statements += 1
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+            try:
+                for bulk in (False, True):
+                    statements = 0
+                    rate = await store_match_lists(client, lead_id, member_ids, bulk)
+                    path = "/team-matches/bulk" if bulk else "/team-matches/"
+                    print(f"{MATCHES_PER_LIST} matches via POST {path:18} {rate:7,.0f} lists/s  "
+                          f"{statements / MATCH_LISTS:.1f} statements/list")
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+    finally:
+        await app.router.shutdown()
+
+
+def main(requests: int, concurrency_levels: List[int]):
+    workdir = tempfile.mkdtemp(prefix="bench-writes-")
+    # Set before the app is imported, so the engine binds to the scratch database
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}"
+    asyncio.run(run(requests, concurrency_levels))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not all(arg.isdigit() for arg in args):
+        print("Usage: python -m app.bench_writes [requests] [concurrency ...]")
+        sys.exit(2)
+    main(int(args[0]) if args else 2000, [int(arg) for arg in args[1:]] or [50, 200])
@@ -0,0 +1,157 @@
+# database-service/app/bulk.py
+import csv
+import json
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .dedupe import dedupe_keys
+from .events import broker
+from .models import DBLead, LeadCreate, BulkRowError, BulkIngestResult
+
+# Rows per multi-row INSERT / transaction
+BULK_CHUNK_SIZE = 500
+
+# Cap on the number of row errors echoed back so a bad upload can't grow the response unbounded
+MAX_REPORTED_ERRORS = 1000
+
+# Refuse single lines longer than this, otherwise a file without newlines would be buffered whole
+MAX_LINE_BYTES = 1024 * 1024
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed byte body into decoded lines, holding at most one partial line in memory.
+
+    The partial line is kept as a list of pieces and joined once its newline
+    arrives, so a long line costs linear time however many chunks it spans.
+    """
+    pending: List[bytes] = []
+    pending_size = 0
+    async for chunk in chunks:
+        *lines, rest = chunk.split(b"\n")
+        if lines:
+            pending.append(lines[0])
+            lines[0] = b"".join(pending)
+            pending, pending_size = [], 0
+            for line in lines:
+                yield line.rstrip(b"\r").decode("utf-8-sig")
+        if rest:
+            pending.append(rest)
+            pending_size += len(rest)
+        if pending_size > MAX_LINE_BYTES:
+            raise ValueError(f"Line exceeds {MAX_LINE_BYTES} bytes")
+    if pending:
+        yield b"".join(pending).rstrip(b"\r").decode("utf-8-sig")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row number, parsed object) for every non-blank NDJSON line"""
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, e
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (row number, dict) for every CSV record; the first record is the header"""
+    header: Optional[List[str]] = None
+    row_number = 0
+    record = ""
+    async for line in lines:
+        # A quoted field may span lines, keep accumulating until the quotes balance
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        current, record = record, ""
+        if not current.strip():
+            continue
+        values = next(csv.reader([current]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty CSV cells mean "not provided"
+        yield row_number, {key: (value if value != "" else None) for key, value in zip(header, values)}
+    if record:
+        row_number += 1
+        yield row_number, ValueError("Unterminated quoted field")
+
+
+def _row_error(row_number: int, error: Exception) -> BulkRowError:
+    if isinstance(error, ValidationError):
+        details = [
+            {"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]}
+            for err in error.errors()
+        ]
+    else:
+        details = [{"loc": [], "msg": str(error), "type": type(error).__name__}]
+    return BulkRowError(row=row_number, errors=details)
+
+
+async def _flush(db: AsyncSession, batch: List[Dict[str, Any]]) -> int:
+    if not batch:
+        return 0
+    # Rows for a prospect that already exists are skipped, not merged: use /leads/upsert for that.
+    # A Core insert on the table, so the result carries the number of rows actually inserted.
+    result = await db.execute(
+        insert(DBLead.__table__).on_conflict_do_nothing(index_elements=["email_normalized", "company_fingerprint"]),
+        batch,
+    )
+    await db.commit()
+    broker.notify()
+    inserted = result.rowcount
+    batch.clear()
+    return inserted
+
+
+async def ingest_leads(
+    db: AsyncSession,
+    rows: AsyncIterator[Tuple[int, Any]],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> BulkIngestResult:
+    """Validate rows one at a time and insert the valid ones in chunked multi-row transactions.
+
+    Invalid rows are reported and skipped; they never abort the rest of the upload.
+    Rows whose lead already exists (same normalized email and company) count as duplicates.
+    """
+    received = inserted = failed = 0
+    errors: List[BulkRowError] = []
+    batch: List[Dict[str, Any]] = []
+
+    async for row_number, row in rows:
+        received += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            if not isinstance(row, dict):
+                raise ValueError("Row must be a JSON object")
+            batch.append(dedupe_keys(LeadCreate(**row).dict()))
+        except (ValidationError, ValueError) as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(_row_error(row_number, e))
+            continue
+
+        if len(batch) >= chunk_size:
+            inserted += await _flush(db, batch)
+
+    inserted += await _flush(db, batch)
+
+    return BulkIngestResult(
+        received=received,
+        inserted=inserted,
+        failed=failed,
+        duplicates=received - failed - inserted,
+        errors=errors,
+        errors_truncated=failed > len(errors),
+    )
@@ -0,0 +1,144 @@
+# database-service/app/cache.py
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, Hashable, Optional, Set, Tuple
+
+from fastapi import Request, Response
+
+CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def to_response(self, request: Request) -> Response:
+        """Serve the cached body, or an empty 304 if the caller already has this version"""
+        headers = {"ETag": self.etag, **self.headers}
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class ResponseCache:
+    """Bounded in-process LRU of serialized GET responses.
+
+    Keys are tuples whose first element is a namespace ("lead", "team_members", ...).
+    Each namespace carries a generation counter that is bumped on invalidation; a
+    reader records the generation before querying and the fill is dropped if a
+    write invalidated the namespace in the meantime, so a slow read can never
+    re-insert a stale row.
+
+    Entries are also indexed by their first two key elements (namespace and id),
+    so dropping every projection of one row costs the number of entries for that
+    row, not a scan of the whole cache.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], CachedResponse]" = OrderedDict()
+        self._generations: Dict[Hashable, int] = {}
+        # (namespace, id) -> cached keys starting with it
+        self._groups: Dict[Tuple[Hashable, ...], Set[Tuple[Hashable, ...]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, namespace: Hashable) -> int:
+        return self._generations.get(namespace, 0)
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Tuple[Hashable, ...], body: bytes, generation: int,
+            headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        entry = CachedResponse(body=body, etag=make_etag(body), headers=headers or {})
+        if self.max_entries <= 0 or generation != self.generation(key[0]):
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._groups.setdefault(key[:2], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._ungroup(evicted)
+            self.evictions += 1
+        return entry
+
+    def _ungroup(self, key: Tuple[Hashable, ...]):
+        group = self._groups.get(key[:2])
+        if group is not None:
+            group.discard(key)
+            if not group:
+                del self._groups[key[:2]]
+
+    def invalidate(self, key: Tuple[Hashable, ...]):
+        """Drop a single entry, e.g. ("analysis", lead_id) after a new analysis for that lead"""
+        self._generations[key[0]] = self.generation(key[0]) + 1
+        if self._entries.pop(key, None) is not None:
+            self._ungroup(key)
+            self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: Tuple[Hashable, Hashable]):
+        """Drop every entry whose key starts with (namespace, id), e.g. each ("analysis", lead_id, fields) projection"""
+        if len(prefix) != 2:
+            raise ValueError("invalidate_prefix takes a (namespace, id) prefix; use invalidate_namespace for a namespace")
+        self._generations[prefix[0]] = self.generation(prefix[0]) + 1
+        stale = self._groups.pop(prefix, set())
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def invalidate_namespace(self, namespace: Hashable):
+        """Drop every entry in a namespace, e.g. all cached team-member list pages"""
+        self._generations[namespace] = self.generation(namespace) + 1
+        stale = [key for key in self._entries if key[0] == namespace]
+        for key in stale:
+            del self._entries[key]
+            self._ungroup(key)
+        self.invalidations += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+cache = ResponseCache()
+
+
+def dump_json(schema, row) -> bytes:
+    return schema.model_validate(row, from_attributes=True).model_dump_json().encode()
+
+
+def dump_json_list(schema, rows) -> bytes:
+    return b"[" + b",".join(dump_json(schema, row) for row in rows) + b"]"
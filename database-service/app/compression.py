@@ -0,0 +1,124 @@
+# database-service/app/compression.py
+import asyncio
+import json
+import logging
+import zlib
+from typing import Any, Optional, Union
+
+from sqlalchemy import Text, select, type_coerce, update
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+# Marks a zlib-compressed value; anything else read back is stored verbatim (short or legacy rows)
+MAGIC = b"ZL1"
+
+# Values shorter than this aren't worth the CPU, zlib's header would eat most of the saving
+MIN_COMPRESS_BYTES = 256
+
+COMPRESSION_LEVEL = 6
+
+# Rows rewritten per transaction by the background recompression pass
+RECOMPRESS_BATCH_SIZE = 200
+
+
+def compress_text(value: Optional[str]) -> Optional[Union[str, bytes]]:
+    if value is None:
+        return None
+    raw = value.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return value
+    return MAGIC + zlib.compress(raw, COMPRESSION_LEVEL)
+
+
+def inflate_text(value: Optional[Union[str, bytes]]) -> Optional[str]:
+    """Inverse of compress_text; also accepts plain text written before compression existed"""
+    if value is None or isinstance(value, str):
+        return value
+    if value.startswith(MAGIC):
+        return zlib.decompress(value[len(MAGIC):]).decode("utf-8")
+    return value.decode("utf-8")
+
+
+def is_compressed(value: Any) -> bool:
+    return isinstance(value, bytes) and value.startswith(MAGIC)
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored zlib-compressed; inflated only when the column is selected"""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return inflate_text(value)
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON column stored as zlib-compressed serialized JSON"""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(json.dumps(value, separators=(",", ":")))
+
+    def process_result_value(self, value, dialect):
+        text = inflate_text(value)
+        return json.loads(text) if text is not None else None
+
+
+def _needs_recompression(value: Any) -> bool:
+    if value is None or is_compressed(value):
+        return False
+    raw = value.encode("utf-8") if isinstance(value, str) else value
+    return len(raw) >= MIN_COMPRESS_BYTES
+
+
+async def recompress_analyses(engine, batch_size: int = RECOMPRESS_BATCH_SIZE) -> int:
+    """Compress analyses rows written before compression existed.
+
+    Walks the table by primary key in small batches, one short transaction each,
+    and yields to the event loop in between so it can run in the background
+    alongside normal traffic. Returns the number of rows rewritten.
+    """
+    from .models import DBAnalysis
+
+    # Read the raw stored bytes/text, bypassing the column types' own inflation
+    table = DBAnalysis.__table__
+
+    last_id = 0
+    rewritten = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                select(
+                    table.c.id,
+                    type_coerce(table.c.llm_analysis, Text()).label("llm_analysis"),
+                    type_coerce(table.c.company_details, Text()).label("company_details"),
+                )
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                values = {}
+                if _needs_recompression(row.llm_analysis):
+                    values["llm_analysis"] = inflate_text(row.llm_analysis)
+                if _needs_recompression(row.company_details):
+                    values["company_details"] = json.loads(inflate_text(row.company_details))
+                if values:
+                    await conn.execute(update(table).where(table.c.id == row.id).values(**values))
+                    rewritten += 1
+        await asyncio.sleep(0)
+
+    if rewritten:
+        logger.info(f"Recompressed {rewritten} analyses rows")
+    return rewritten
@@ -1,21 +1,67 @@
 # database-service/app/database.py
 import os
+from sqlalchemy import event, inspect
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from .models import Base
+from .analytics import create_triggers
+from .compression import inflate_text
+from .dedupe import backfill_dedupe_keys
+from .events import create_event_triggers
+from .search import create_search_index
+from .profiling import profiler
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/lead_automation.db")
 
 # Make sure the database directory exists
 os.makedirs(os.path.dirname(DATABASE_URL.replace("sqlite+aiosqlite:///", "")), exist_ok=True)
 
+# Size of the read connection pool; writes always go through a single connection
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+
+# Single writer connection. All inserts funnel through the group-commit queue in
+# write_queue.py, so SQLite never has writers queueing on its database lock.
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,
     future=True,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=1,
+    max_overflow=0,
 )
 
+# Readers get their own pool; under WAL they never block on, or block, the writer
+read_engine = create_async_engine(
+    DATABASE_URL,
+    future=True,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=0,
+)
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL only fsyncs at checkpoints, still durable against app crashes
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+    # Used by the search index triggers to read compressed analysis text
+    dbapi_connection.create_function("inflate_text", 1, inflate_text, deterministic=True)
+
+# Statement timing per endpoint, served at /debug/queries
+profiler.instrument(engine)
+profiler.instrument(read_engine)
+
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine.sync_engine, "connect", _configure_sqlite)
+    event.listen(read_engine.sync_engine, "connect", _configure_sqlite)
+
 async_session = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+write_session = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
@@ -23,8 +69,40 @@ async def get_db():
     async with async_session() as session:
         yield session
 
+async def get_write_db():
+    async with write_session() as session:
+        yield session
+
 async def init_db():
     async with engine.begin() as conn:
         # Uncomment the following line to recreate all tables on startup
         # await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all skips tables that already exist, so add columns and indexes introduced since
+        added = await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(create_triggers)
+        await conn.run_sync(create_search_index)
+        await conn.run_sync(create_event_triggers)
+        # After the triggers are current, so keying old rows doesn't publish change events
+        if "leads.email_normalized" in added:
+            await conn.run_sync(backfill_dedupe_keys)
+        await conn.run_sync(_create_missing_indexes)
+
+def _create_missing_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def _add_missing_columns(conn):
+    """ALTER in nullable columns added to the models after their table was created"""
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+            added.append(f"{table.name}.{column.name}")
+    return added
@@ -0,0 +1,170 @@
+# database-service/app/dedupe.py
+"""Lead identity: normalized email plus a company fingerprint.
+
+(email_normalized, company_fingerprint) is unique across leads, so the same
+prospect chatting several times updates one row instead of creating a new
+lead, and a new scrape and LLM analysis, on every turn.
+
+Backfill keys for rows written before these columns existed with:
+python -m app.dedupe backfill
+"""
+import asyncio
+import re
+import unicodedata
+from typing import Dict, Any, List, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import DBLead, Lead, LeadUpsertResult
+
+# Words that don't distinguish one company from another: "Acme, Inc." and "ACME Corp" are the same prospect
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation", "co", "company",
+    "gmbh", "ag", "sa", "sas", "sarl", "srl", "spa", "bv", "nv", "plc", "pty", "oy", "ab", "as",
+}
+
+# Lead fields that are merged on upsert; the identity fields are not, a different spelling
+# of the same email or company name never overwrites the stored one
+MERGE_FIELDS = ("contact_name", "position", "phone", "revenue", "service_type", "message")
+
+BACKFILL_BATCH_SIZE = 1000
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def company_fingerprint(company_name: str) -> str:
+    """Case-, accent-, punctuation- and legal-suffix-insensitive form of a company name"""
+    decomposed = unicodedata.normalize("NFKD", company_name.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    words = _WORD.findall(stripped)
+    if words and words[0] == "the":
+        words = words[1:]
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words) or company_name.strip().casefold()
+
+
+def dedupe_keys(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Lead column values with the identity columns filled in"""
+    return {
+        **values,
+        "email_normalized": normalize_email(values["email"]),
+        "company_fingerprint": company_fingerprint(values["company_name"]),
+    }
+
+
+def merge_lead(lead, values: Dict[str, Any]) -> List[str]:
+    """Copy non-null incoming fields that differ onto `lead`; returns the changed field names"""
+    changed = []
+    for name in MERGE_FIELDS:
+        value = values.get(name)
+        if value is not None and value != getattr(lead, name):
+            setattr(lead, name, value)
+            changed.append(name)
+    return changed
+
+
+async def upsert_lead(db: AsyncSession, values: Dict[str, Any]) -> LeadUpsertResult:
+    """Create the lead, or merge `values` into the existing lead with the same identity.
+
+    `db` must be a write session: the service has a single writer connection, so the
+    lookup and the write can't interleave with another writer in this process.
+    """
+    values = dedupe_keys(values)
+    for attempt in range(2):
+        result = await db.execute(
+            select(DBLead).where(
+                DBLead.email_normalized == values["email_normalized"],
+                DBLead.company_fingerprint == values["company_fingerprint"],
+            )
+        )
+        lead = result.scalars().first()
+        if lead is not None:
+            changed = merge_lead(lead, values)
+            if changed:
+                await db.commit()
+            return LeadUpsertResult(
+                lead=Lead.model_validate(lead, from_attributes=True), created=False, changed_fields=changed
+            )
+
+        lead = DBLead(**values)
+        db.add(lead)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another process created it between our lookup and insert; merge into theirs
+            await db.rollback()
+            if attempt:
+                raise
+            continue
+        return LeadUpsertResult(lead=Lead.model_validate(lead, from_attributes=True), created=True)
+
+
+def backfill_dedupe_keys(conn) -> Tuple[int, int]:
+    """Fill in identity columns for leads that have none (sync Connection).
+
+    The oldest lead of each identity gets the key; later duplicates keep NULL, which
+    the unique index allows, so the backfill never fails on data that predates it.
+    Returns (rows keyed, duplicates left unkeyed).
+    """
+    taken: Set[Tuple[str, str]] = set(
+        conn.execute(text(
+            "SELECT email_normalized, company_fingerprint FROM leads WHERE email_normalized IS NOT NULL"
+        )).all()
+    )
+    keyed = duplicates = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, email, company_name FROM leads "
+                "WHERE id > :last_id AND email_normalized IS NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            key = (normalize_email(row.email), company_fingerprint(row.company_name))
+            if key in taken:
+                duplicates += 1
+                continue
+            taken.add(key)
+            updates.append({"id": row.id, "email_normalized": key[0], "company_fingerprint": key[1]})
+        if updates:
+            conn.execute(
+                text(
+                    "UPDATE leads SET email_normalized = :email_normalized, "
+                    "company_fingerprint = :company_fingerprint WHERE id = :id"
+                ),
+                updates,
+            )
+            keyed += len(updates)
+    return keyed, duplicates
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python -m app.dedupe backfill")
+        sys.exit(2)
+
+    from .database import engine, init_db
+
+    async def main():
+        await init_db()
+        async with engine.begin() as conn:
+            keyed, duplicates = await conn.run_sync(backfill_dedupe_keys)
+        print(f"Keyed {keyed} leads, left {duplicates} duplicates unkeyed")
+
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+# database-service/app/events.py
+"""Change-data event log.
+
+Every insert into leads, analyses, team_matches and team_members (and every
+update of a lead) appends a row to `events` from a SQLite trigger, in the same
+transaction as the change itself, so the log can never miss or invent a write.
+Consumers read it in `seq` order and resume from the last `seq` they processed:
+
+    GET /events?after=<seq>&wait=25              long-poll, returns an EventPage
+    GET /events?after=<seq>  (Accept: text/event-stream)   server-sent events
+
+In-process writers call `broker.notify()` after committing so waiting consumers
+wake immediately; writes from other processes are picked up by polling every
+EVENTS_POLL_INTERVAL seconds.
+
+Events older than EVENTS_RETENTION_DAYS are deleted in the background, so a
+consumer that stays away longer than that resumes after a gap.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.future import select
+
+from .models import DBEvent, Event
+
+# Upper bound on how long a consumer waits without re-reading the table
+EVENTS_POLL_INTERVAL = float(os.getenv("DB_EVENTS_POLL_INTERVAL", "1.0"))
+
+# Longest long-poll a client may ask for
+MAX_WAIT_SECONDS = 30
+
+# Age after which events are deleted; 0 keeps them forever
+EVENTS_RETENTION_DAYS = float(os.getenv("DB_EVENTS_RETENTION_DAYS", "7"))
+
+# Time between pruning passes
+EVENTS_PRUNE_INTERVAL = float(os.getenv("DB_EVENTS_PRUNE_INTERVAL", "3600"))
+
+# Rows deleted per transaction, so a pass never holds the write lock for long
+EVENTS_PRUNE_BATCH_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+# SSE comment sent when idle so proxies don't close the connection
+SSE_HEARTBEAT_SECONDS = 15
+
+# Events sent per read on an SSE stream
+SSE_BATCH_SIZE = 500
+
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_events_insert AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('lead', 'created', NEW.id, NEW.id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_events_update_fields
+    AFTER UPDATE OF company_name, contact_name, position, email, phone, revenue, service_type, message
+    ON leads
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('lead', 'updated', NEW.id, NEW.id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_events_insert AFTER INSERT ON analyses
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('analysis', 'created', NEW.id, NEW.lead_id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_team_matches_events_insert AFTER INSERT ON team_matches
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('team_match', 'created', NEW.id, NEW.lead_id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_team_members_events_insert AFTER INSERT ON team_members
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('team_member', 'created', NEW.id, NULL, CURRENT_TIMESTAMP);
+    END
+    """,
+]
+
+
+# Earlier definitions that fired on any column, including backfilled identity keys
+SUPERSEDED_TRIGGERS = ["trg_leads_events_update"]
+
+
+def create_event_triggers(conn):
+    for name in SUPERSEDED_TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    for statement in TRIGGERS:
+        conn.exec_driver_sql(statement)
+
+
+class EventBroker:
+    """Wakes consumers waiting for new events.
+
+    `version` is bumped on every notify. A consumer reads it before querying and
+    passes it to `wait`, which returns at once if a commit landed in between, so
+    a notification can't slip through the gap between the query and the wait.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._changed: Optional[asyncio.Event] = None
+
+    def notify(self):
+        self.version += 1
+        changed, self._changed = self._changed, None
+        if changed is not None:
+            changed.set()
+
+    async def wait(self, version: int, timeout: float):
+        if self.version != version:
+            return
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+broker = EventBroker()
+
+
+async def read_events(session_factory, after: int, limit: int) -> List[Event]:
+    # A short session per read, so idle consumers never hold a pooled connection
+    async with session_factory() as session:
+        result = await session.execute(
+            select(DBEvent).where(DBEvent.seq > after).order_by(DBEvent.seq).limit(limit)
+        )
+        return [Event.model_validate(row, from_attributes=True) for row in result.scalars()]
+
+
+async def poll_events(session_factory, after: int, limit: int, wait: float) -> List[Event]:
+    """Return events after `after`, waiting up to `wait` seconds for the first one"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(wait, MAX_WAIT_SECONDS)
+    while True:
+        version = broker.version
+        events = await read_events(session_factory, after, limit)
+        remaining = deadline - loop.time()
+        if events or remaining <= 0:
+            return events
+        await broker.wait(version, min(remaining, EVENTS_POLL_INTERVAL))
+
+
+def format_sse(event: Event) -> bytes:
+    return (
+        f"id: {event.seq}\n"
+        f"event: {event.entity}.{event.action}\n"
+        f"data: {event.model_dump_json()}\n\n"
+    ).encode()
+
+
+async def stream_events(session_factory, after: int, request: Request) -> AsyncIterator[bytes]:
+    """Server-sent events from `after` onwards until the client disconnects"""
+    loop = asyncio.get_running_loop()
+    # Clients reconnect with Last-Event-ID after this many milliseconds
+    yield b"retry: 2000\n\n"
+    last_sent = loop.time()
+    while not await request.is_disconnected():
+        version = broker.version
+        events = await read_events(session_factory, after, SSE_BATCH_SIZE)
+        if events:
+            yield b"".join(format_sse(event) for event in events)
+            after = events[-1].seq
+            last_sent = loop.time()
+            continue
+        if loop.time() - last_sent >= SSE_HEARTBEAT_SECONDS:
+            yield b": keepalive\n\n"
+            last_sent = loop.time()
+        await broker.wait(version, EVENTS_POLL_INTERVAL)
+
+
+async def prune_events(engine, retention_days: float = EVENTS_RETENTION_DAYS,
+                       batch_size: int = EVENTS_PRUNE_BATCH_SIZE) -> int:
+    """Delete events older than `retention_days`; returns the number deleted.
+
+    Walks the log oldest first by seq, one short transaction per batch, and
+    stops at the first event young enough to keep, so a pass with nothing to
+    delete reads a single batch.
+    """
+    # Triggers stamp created_at with CURRENT_TIMESTAMP: UTC, in this format
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+    last_seq = 0
+    deleted = 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text("SELECT seq, created_at FROM events WHERE seq > :after ORDER BY seq LIMIT :batch"),
+                {"after": last_seq, "batch": batch_size},
+            )
+            rows = result.all()
+            expired = 0
+            while expired < len(rows) and rows[expired].created_at < cutoff:
+                expired += 1
+            if expired:
+                await conn.execute(
+                    text("DELETE FROM events WHERE seq > :after AND seq <= :upto"),
+                    {"after": last_seq, "upto": rows[expired - 1].seq},
+                )
+                deleted += expired
+                last_seq = rows[expired - 1].seq
+        if expired < batch_size:
+            break
+        await asyncio.sleep(0)
+
+    if deleted:
+        logger.info(f"Pruned {deleted} events older than {retention_days:g} days")
+    return deleted
+
+
+async def prune_events_periodically(engine, interval: float = EVENTS_PRUNE_INTERVAL):
+    """Run prune_events every `interval` seconds, starting now, until cancelled"""
+    while True:
+        try:
+            await prune_events(engine)
+        except Exception:
+            logger.exception("Pruning events failed")
+        await asyncio.sleep(interval)
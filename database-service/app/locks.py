@@ -0,0 +1,80 @@
+# database-service/app/locks.py
+"""Per-lead analysis leases shared by every analyzer worker.
+
+The analyzer coalesces concurrent analyses of a lead within one process;
+with several uvicorn workers (or hosts) it needs a lock they all see. A lease
+is one row per lead:
+
+- Acquire is a single upsert that only takes the row over if the lease has
+  expired or was released, or already belongs to the caller (a renewal), so
+  two workers can never both hold it.
+- Release keeps the row, ending the lease and recording the analysis the run
+  stored. Workers that were waiting see that and serve it instead of running
+  the pipeline again.
+- A worker that dies holding a lease blocks the lead only until it expires.
+
+Times are this service's clock, so workers never compare clocks.
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import AnalysisLock, DBAnalysisLock
+
+# Longest lease a caller may ask for; longer runs renew theirs
+MAX_LOCK_TTL_SECONDS = 600
+
+
+def to_schema(row: DBAnalysisLock, now: datetime) -> AnalysisLock:
+    return AnalysisLock(
+        lead_id=row.lead_id,
+        owner=row.owner,
+        expires_at=row.expires_at,
+        analysis_id=row.analysis_id,
+        held=row.expires_at > now,
+    )
+
+
+async def get_lock(db: AsyncSession, lead_id: int) -> Optional[AnalysisLock]:
+    row = await db.get(DBAnalysisLock, lead_id)
+    return to_schema(row, datetime.utcnow()) if row else None
+
+
+async def acquire_lock(db: AsyncSession, lead_id: int, owner: str, ttl_seconds: float) -> Tuple[bool, AnalysisLock]:
+    """Take or renew the lease on `lead_id` for `owner`; returns whether it is now theirs, and the lease"""
+    now = datetime.utcnow()
+    statement = insert(DBAnalysisLock).values(
+        lead_id=lead_id, owner=owner, expires_at=now + timedelta(seconds=ttl_seconds), analysis_id=None
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[DBAnalysisLock.lead_id],
+        set_={
+            "owner": statement.excluded.owner,
+            "expires_at": statement.excluded.expires_at,
+            "analysis_id": None,
+        },
+        # A released lease has expired, so only a live lease of another owner blocks the update
+        where=(DBAnalysisLock.expires_at <= now) | (DBAnalysisLock.owner == statement.excluded.owner),
+    )
+    await db.execute(statement)
+    await db.commit()
+    row = (await db.execute(select(DBAnalysisLock).where(DBAnalysisLock.lead_id == lead_id))).scalars().one()
+    return row.owner == owner and row.expires_at > now, to_schema(row, now)
+
+
+async def release_lock(db: AsyncSession, lead_id: int, owner: str, analysis_id: Optional[int]) -> Optional[AnalysisLock]:
+    """End `owner`'s lease, recording the analysis it stored; None if the lease isn't theirs"""
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(DBAnalysisLock)
+        .where(DBAnalysisLock.lead_id == lead_id, DBAnalysisLock.owner == owner)
+        .values(expires_at=now, analysis_id=analysis_id)
+    )
+    await db.commit()
+    if result.rowcount == 0:
+        return None
+    return await get_lock(db, lead_id)
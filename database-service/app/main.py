@@ -1,99 +1,435 @@
 # database-service/app/main.py
+import asyncio
+import json
 import os
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import contains_eager
 from typing import List, Optional, Dict, Any
+from datetime import date
 
-from .database import get_db, init_db
+from .analytics import BUCKETS, get_summary
+from .search import search_leads
+from .events import EVENTS_RETENTION_DAYS, broker, poll_events, prune_events_periodically, stream_events
+from .profiling import EndpointContextMiddleware, profiler
+from .cache import cache, dump_json, dump_json_list
+from .bulk import iter_lines, iter_ndjson_rows, iter_csv_rows, ingest_leads
+from .compression import recompress_analyses
+from .dedupe import dedupe_keys, upsert_lead
+from .locks import MAX_LOCK_TTL_SECONDS, acquire_lock, get_lock, release_lock
+from .database import engine, async_session, get_db, get_write_db, init_db
+from .write_queue import writer
+from .pagination import InvalidCursor, encode_cursor, keyset_page, stream_ndjson
 from .models import (
-    LeadBase, LeadCreate, Lead, 
-    TeamMemberBase, TeamMemberCreate, TeamMember,
-    AnalysisBase, AnalysisCreate, Analysis,
-    TeamMatchBase, TeamMatchCreate, TeamMatch
+    LeadBase, LeadCreate, Lead, DBLead, LeadUpsertResult,
+    TeamMemberBase, TeamMemberCreate, TeamMember, DBTeamMember,
+    AnalysisBase, AnalysisCreate, Analysis, DBAnalysis,
+    TeamMatchBase, TeamMatchCreate, TeamMatch, DBTeamMatch,
+    TeamMatchWithMember, TeamMatchBulkCreate, LeadBundle, AnalyticsSummary, SearchResults, EventPage, BulkIngestResult,
+    AnalysisLock, AnalysisLockRequest, AnalysisLockRelease
 )
 
 app = FastAPI(title="Lead Automation Database Service")
+app.add_middleware(EndpointContextMiddleware)
+
+# Upper bound on ids accepted by a single ?ids= batch lookup
+MAX_BATCH_IDS = 500
 
 @app.on_event("startup")
 async def startup():
     await init_db()
+    await writer.start()
+    # Compress analyses written before compressed storage existed, without blocking startup
+    app.state.recompress_task = asyncio.create_task(recompress_analyses(engine))
+    app.state.prune_events_task = (
+        asyncio.create_task(prune_events_periodically(engine)) if EVENTS_RETENTION_DAYS > 0 else None
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.recompress_task.cancel()
+    if app.state.prune_events_task is not None:
+        app.state.prune_events_task.cancel()
+    await writer.stop()
+
+def parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+async def get_by_ids(model, ids: str, db: AsyncSession):
+    result = await db.execute(select(model).where(model.id.in_(parse_ids(ids))).order_by(model.id))
+    return result.scalars().all()
+
+def parse_fields(schema, fields: Optional[str]) -> List[str]:
+    """Validate a comma-separated projection against the response schema"""
+    if not fields:
+        return []
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in schema.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+async def list_page(model, cursor: Optional[str], skip: int, limit: int, db: AsyncSession):
+    """Keyset-paginated list; returns the rows and the headers carrying the next-page token.
+
+    `skip` is still honoured for old callers but costs O(skip); pass `cursor` instead.
+    """
+    try:
+        query = keyset_page(model, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if skip and not cursor:
+        query = query.offset(skip)
+    result = await db.execute(query)
+    rows = result.scalars().all()
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].id)
+    return rows, headers
 
 # Lead Routes
 @app.post("/leads/", response_model=Lead)
-async def create_lead(lead: LeadCreate, db: AsyncSession = Depends(get_db)):
-    db_lead = Lead(**lead.dict())
-    db.add(db_lead)
-    await db.commit()
-    await db.refresh(db_lead)
-    return db_lead
+async def create_lead(lead: LeadCreate):
+    try:
+        return await writer.submit(DBLead, dedupe_keys(lead.dict()))
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="A lead with this email and company already exists; use /leads/upsert")
+
+@app.post("/leads/upsert", response_model=LeadUpsertResult)
+async def upsert_lead_route(lead: LeadCreate, db: AsyncSession = Depends(get_write_db)):
+    """Create a lead, or merge non-null fields into the lead with the same email and company.
+
+    `changed_fields` lists what was updated on an existing lead, so callers can skip
+    re-analysing a prospect when nothing material changed.
+    """
+    result = await upsert_lead(db, lead.dict())
+    if result.changed_fields:
+        cache.invalidate(("lead", result.lead.id))
+    if result.created or result.changed_fields:
+        broker.notify()
+    return result
+
+@app.post("/leads/bulk", response_model=BulkIngestResult)
+async def bulk_create_leads(request: Request, format: Optional[str] = None, db: AsyncSession = Depends(get_write_db)):
+    """Stream NDJSON or CSV leads from the request body into chunked multi-row inserts"""
+    content_type = request.headers.get("content-type", "")
+    if format is None:
+        format = "csv" if "csv" in content_type else "ndjson"
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    lines = iter_lines(request.stream())
+    rows = iter_csv_rows(lines) if format == "csv" else iter_ndjson_rows(lines)
+    try:
+        return await ingest_leads(db, rows)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed upload: {str(e)}")
+
+@app.get("/leads/export")
+async def export_leads():
+    """Stream every lead as NDJSON"""
+    return StreamingResponse(stream_ndjson(DBLead, Lead), media_type="application/x-ndjson")
 
 @app.get("/leads/{lead_id}", response_model=Lead)
-async def get_lead(lead_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Lead).where(Lead.id == lead_id))
+async def get_lead(lead_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    key = ("lead", lead_id)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation("lead")
+        result = await db.execute(select(DBLead).where(DBLead.id == lead_id))
+        lead = result.scalars().first()
+        if not lead:
+            raise HTTPException(status_code=404, detail="Lead not found")
+        entry = cache.put(key, dump_json(Lead, lead), generation)
+    return entry.to_response(request)
+
+@app.get("/leads/{lead_id}/bundle", response_model=LeadBundle)
+async def get_lead_bundle(lead_id: int, db: AsyncSession = Depends(get_db)):
+    """Lead plus its latest analysis, team matches with members, and the always-notify recipients"""
+    result = await db.execute(select(DBLead).where(DBLead.id == lead_id))
     lead = result.scalars().first()
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
-    return lead
+
+    result = await db.execute(
+        select(DBAnalysis)
+        .where(DBAnalysis.lead_id == lead_id)
+        .order_by(DBAnalysis.created_at.desc(), DBAnalysis.id.desc())
+        .limit(1)
+    )
+    analysis = result.scalars().first()
+
+    result = await db.execute(
+        select(DBTeamMatch)
+        .join(DBTeamMatch.team_member)
+        .options(contains_eager(DBTeamMatch.team_member))
+        .where(DBTeamMatch.lead_id == lead_id)
+        .order_by(DBTeamMatch.relevance_score.desc())
+    )
+    team_matches = result.scalars().all()
+
+    result = await db.execute(select(DBTeamMember).where(DBTeamMember.always_notify == True))
+    default_recipients = result.scalars().all()
+
+    return LeadBundle(
+        lead=Lead.model_validate(lead, from_attributes=True),
+        analysis=Analysis.model_validate(analysis, from_attributes=True) if analysis else None,
+        team_matches=[TeamMatchWithMember.model_validate(match, from_attributes=True) for match in team_matches],
+        default_recipients=[TeamMember.model_validate(member, from_attributes=True) for member in default_recipients],
+    )
 
 @app.get("/leads/", response_model=List[Lead])
-async def get_leads(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Lead).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_leads(
+    response: Response,
+    ids: Optional[str] = None,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    if ids is not None:
+        return await get_by_ids(DBLead, ids, db)
+    rows, headers = await list_page(DBLead, cursor, skip, limit, db)
+    response.headers.update(headers)
+    return rows
 
 # Team Member Routes
 @app.post("/team-members/", response_model=TeamMember)
-async def create_team_member(team_member: TeamMemberCreate, db: AsyncSession = Depends(get_db)):
-    db_team_member = TeamMember(**team_member.dict())
-    db.add(db_team_member)
-    await db.commit()
-    await db.refresh(db_team_member)
+async def create_team_member(team_member: TeamMemberCreate):
+    db_team_member = await writer.submit(DBTeamMember, team_member.dict())
+    cache.invalidate_namespace("team_members")
     return db_team_member
 
+@app.get("/team-members/export")
+async def export_team_members():
+    """Stream every team member as NDJSON"""
+    return StreamingResponse(stream_ndjson(DBTeamMember, TeamMember), media_type="application/x-ndjson")
+
+@app.get("/team-members/default-recipients", response_model=List[TeamMember])
+async def get_default_recipients(request: Request, db: AsyncSession = Depends(get_db)):
+    """Team members flagged always_notify, who receive every lead brief"""
+    key = ("team_members", "default-recipients")
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation("team_members")
+        result = await db.execute(select(DBTeamMember).where(DBTeamMember.always_notify == True))
+        entry = cache.put(key, dump_json_list(TeamMember, result.scalars().all()), generation)
+    return entry.to_response(request)
+
 @app.get("/team-members/{team_member_id}", response_model=TeamMember)
-async def get_team_member(team_member_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(TeamMember).where(TeamMember.id == team_member_id))
-    team_member = result.scalars().first()
-    if not team_member:
-        raise HTTPException(status_code=404, detail="Team member not found")
-    return team_member
+async def get_team_member(team_member_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    key = ("team_member", team_member_id)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation("team_member")
+        result = await db.execute(select(DBTeamMember).where(DBTeamMember.id == team_member_id))
+        team_member = result.scalars().first()
+        if not team_member:
+            raise HTTPException(status_code=404, detail="Team member not found")
+        entry = cache.put(key, dump_json(TeamMember, team_member), generation)
+    return entry.to_response(request)
 
 @app.get("/team-members/", response_model=List[TeamMember])
-async def get_team_members(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(TeamMember).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_team_members(
+    request: Request,
+    ids: Optional[str] = None,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_db)
+):
+    # The matcher re-reads the full list for every lead, so list pages are cached too
+    key = ("team_members", ids, cursor, skip, limit)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation("team_members")
+        if ids is not None:
+            rows, headers = await get_by_ids(DBTeamMember, ids, db), {}
+        else:
+            rows, headers = await list_page(DBTeamMember, cursor, skip, limit, db)
+        entry = cache.put(key, dump_json_list(TeamMember, rows), generation, headers)
+    return entry.to_response(request)
 
 # Analysis Routes
 @app.post("/analyses/", response_model=Analysis)
-async def create_analysis(analysis: AnalysisCreate, db: AsyncSession = Depends(get_db)):
-    db_analysis = Analysis(**analysis.dict())
-    db.add(db_analysis)
-    await db.commit()
-    await db.refresh(db_analysis)
+async def create_analysis(analysis: AnalysisCreate):
+    db_analysis = await writer.submit(DBAnalysis, analysis.dict())
+    cache.invalidate_prefix(("analysis", analysis.lead_id))
     return db_analysis
 
 @app.get("/analyses/{lead_id}", response_model=Analysis)
-async def get_analysis_by_lead(lead_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Analysis).where(Analysis.lead_id == lead_id))
+async def get_analysis_by_lead(
+    lead_id: int,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Latest analysis for a lead.
+
+    `fields` (e.g. `?fields=final_decision`) returns only those columns, so callers
+    that don't need `llm_analysis`/`company_details` never load or inflate them.
+    """
+    columns = parse_fields(Analysis, fields)
+    key = ("analysis", lead_id, fields)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation("analysis")
+        query = (
+            select(DBAnalysis)
+            .where(DBAnalysis.lead_id == lead_id)
+            # Ties, e.g. analyses saved in the same group commit, go to the last one written
+            .order_by(DBAnalysis.created_at.desc(), DBAnalysis.id.desc())
+            .limit(1)
+        )
+        if columns:
+            query = query.with_only_columns(*[getattr(DBAnalysis, column) for column in columns])
+            result = await db.execute(query)
+            analysis = result.mappings().first()
+        else:
+            result = await db.execute(query)
+            analysis = result.scalars().first()
+        if not analysis:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        body = json.dumps(jsonable_encoder(dict(analysis))).encode() if columns else dump_json(Analysis, analysis)
+        entry = cache.put(key, body, generation)
+    return entry.to_response(request)
+
+@app.get("/analyses/by-fingerprint/{fingerprint}", response_model=Analysis)
+async def get_analysis_by_fingerprint(fingerprint: str, db: AsyncSession = Depends(get_db)):
+    """Latest analysis computed from identical inputs, for the analyzer to reuse instead of calling the LLM"""
+    result = await db.execute(
+        select(DBAnalysis)
+        .where(DBAnalysis.fingerprint == fingerprint)
+        .order_by(DBAnalysis.created_at.desc())
+        .limit(1)
+    )
     analysis = result.scalars().first()
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
     return analysis
 
+# Analysis Lock Routes
+@app.post("/locks/analysis/{lead_id}", response_model=AnalysisLock)
+async def acquire_analysis_lock(lead_id: int, request: AnalysisLockRequest, db: AsyncSession = Depends(get_write_db)):
+    """Take, or renew, the lease on analysing a lead; 409 with the current lease if another owner holds it"""
+    if not 0 < request.ttl_seconds <= MAX_LOCK_TTL_SECONDS:
+        raise HTTPException(status_code=400, detail=f"ttl_seconds must be between 0 and {MAX_LOCK_TTL_SECONDS}")
+    acquired, lock = await acquire_lock(db, lead_id, request.owner, request.ttl_seconds)
+    if not acquired:
+        raise HTTPException(status_code=409, detail=jsonable_encoder(lock))
+    return lock
+
+@app.get("/locks/analysis/{lead_id}", response_model=AnalysisLock)
+async def get_analysis_lock(lead_id: int, db: AsyncSession = Depends(get_db)):
+    """The lead's lease, live or not; polled by workers waiting for another one's analysis"""
+    lock = await get_lock(db, lead_id)
+    if lock is None:
+        raise HTTPException(status_code=404, detail="Lock not found")
+    return lock
+
+@app.post("/locks/analysis/{lead_id}/release", response_model=AnalysisLock)
+async def release_analysis_lock(lead_id: int, request: AnalysisLockRelease, db: AsyncSession = Depends(get_write_db)):
+    """End the lease, recording the analysis the run stored for the workers waiting on it"""
+    lock = await release_lock(db, lead_id, request.owner, request.analysis_id)
+    if lock is None:
+        raise HTTPException(status_code=409, detail="Lock is not held by this owner")
+    return lock
+
 # Team Match Routes
 @app.post("/team-matches/", response_model=TeamMatch)
-async def create_team_match(team_match: TeamMatchCreate, db: AsyncSession = Depends(get_db)):
-    db_team_match = TeamMatch(**team_match.dict())
-    db.add(db_team_match)
-    await db.commit()
-    await db.refresh(db_team_match)
+async def create_team_match(team_match: TeamMatchCreate):
+    db_team_match = await writer.submit(DBTeamMatch, team_match.dict())
+    cache.invalidate(("team_matches", team_match.lead_id))
     return db_team_match
 
+@app.post("/team-matches/bulk", response_model=List[TeamMatch])
+async def bulk_create_team_matches(team_matches: TeamMatchBulkCreate):
+    db_team_matches = await writer.submit_many(DBTeamMatch, [
+        {"lead_id": team_matches.lead_id, **match.dict()} for match in team_matches.matches
+    ])
+    cache.invalidate(("team_matches", team_matches.lead_id))
+    return db_team_matches
+
 @app.get("/team-matches/{lead_id}", response_model=List[TeamMatch])
-async def get_team_matches_by_lead(lead_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(TeamMatch).where(TeamMatch.lead_id == lead_id))
-    matches = result.scalars().all()
-    return matches
+async def get_team_matches_by_lead(lead_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    key = ("team_matches", lead_id)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation("team_matches")
+        result = await db.execute(select(DBTeamMatch).where(DBTeamMatch.lead_id == lead_id))
+        entry = cache.put(key, dump_json_list(TeamMatch, result.scalars().all()), generation)
+    return entry.to_response(request)
+
+# Analytics Routes
+@app.get("/analytics", response_model=AnalyticsSummary)
+async def get_analytics(
+    bucket: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Funnel numbers per day or week: leads, analysis decisions and team matches"""
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(BUCKETS)}")
+    return await get_summary(db, bucket, start, end)
+
+# Search Routes
+@app.get("/search", response_model=SearchResults)
+async def search(q: str, limit: int = 20, offset: int = 0, db: AsyncSession = Depends(get_db)):
+    """Ranked full-text search over lead company names, messages and latest analyses.
+
+    A broad query ranks only its newest RANK_CANDIDATES matches; older matches follow, newest first.
+    """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    return await search_leads(db, q, limit, max(offset, 0))
+
+# Change Feed Routes
+@app.get("/events", response_model=EventPage)
+async def get_events(request: Request, after: int = 0, limit: int = 100, wait: float = 0):
+    """Events with seq > `after`, oldest first.
+
+    Long-poll by passing `wait` (seconds, up to 30): the request returns as soon as an
+    event arrives. With `Accept: text/event-stream` the response is an open SSE stream
+    instead, resuming from the Last-Event-ID header when a client reconnects.
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    if "text/event-stream" in request.headers.get("accept", ""):
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():
+            after = int(last_event_id)
+        return StreamingResponse(
+            stream_events(async_session, after, request),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    events = await poll_events(async_session, after, limit, max(wait, 0))
+    return EventPage(events=events, last_seq=events[-1].seq if events else after)
+
+# Debug Routes
+@app.get("/debug/cache")
+async def get_cache_stats():
+    """Hit/miss/eviction counters for the in-process response cache"""
+    return cache.stats()
+
+@app.get("/debug/queries")
+async def get_query_stats(reset: bool = False):
+    """Per-endpoint statement latency histograms and the most recent slow queries"""
+    stats = profiler.stats()
+    if reset:
+        profiler.reset()
+    return stats
 
 if __name__ == "__main__":
     import uvicorn
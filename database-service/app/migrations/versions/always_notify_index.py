@@ -0,0 +1,21 @@
+# database-service/app/migrations/versions/always_notify_index.py
+"""Index team_members.always_notify for the default-recipients lookup
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# Revision identifiers
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_team_members_always_notify', 'team_members', ['always_notify'])
+
+def downgrade():
+    op.drop_index('ix_team_members_always_notify', table_name='team_members')
@@ -0,0 +1,28 @@
+# database-service/app/migrations/versions/analysis_fingerprint.py
+"""Add the analysis input fingerprint and its index
+
+Existing analyses keep a NULL fingerprint and are never reused.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('analyses', sa.Column('fingerprint', sa.String(), nullable=True))
+    op.create_index('ix_analyses_fingerprint', 'analyses', ['fingerprint'])
+
+def downgrade():
+    op.drop_index('ix_analyses_fingerprint', table_name='analyses')
+    # Not batch mode: it rebuilds the table, and SQLite drops every trigger on analyses with it.
+    # DROP COLUMN needs SQLite 3.35, as INSERT ... RETURNING already does.
+    op.execute("ALTER TABLE analyses DROP COLUMN fingerprint")
@@ -0,0 +1,28 @@
+# database-service/app/migrations/versions/analysis_locks.py
+"""Add the per-lead analysis lease table
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'analysis_locks',
+        sa.Column('lead_id', sa.Integer(), primary_key=True),
+        sa.Column('owner', sa.String(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('analysis_id', sa.Integer(), nullable=True),
+    )
+
+def downgrade():
+    op.drop_table('analysis_locks')
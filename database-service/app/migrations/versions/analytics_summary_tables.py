@@ -0,0 +1,79 @@
+# database-service/app/migrations/versions/analytics_summary_tables.py
+"""Add pipeline analytics summary tables and the triggers that maintain them
+
+Run `python -m app.analytics rebuild` afterwards to backfill from existing rows.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+# As shipped with this revision; later revisions replace triggers rather than edit these
+_DAY = "date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP))"
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_leads_daily_stats AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO daily_lead_stats (day, leads) VALUES ({_DAY}, 1)
+        ON CONFLICT (day) DO UPDATE SET leads = leads + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_daily_stats AFTER INSERT ON analyses
+    BEGIN
+        INSERT INTO daily_decision_stats (day, final_decision, analyses)
+        VALUES ({_DAY}, COALESCE(NEW.final_decision, 'Unknown'), 1)
+        ON CONFLICT (day, final_decision) DO UPDATE SET analyses = analyses + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_team_matches_daily_stats AFTER INSERT ON team_matches
+    BEGIN
+        INSERT INTO daily_team_match_stats (day, team_member_id, matches)
+        VALUES ({_DAY}, NEW.team_member_id, 1)
+        ON CONFLICT (day, team_member_id) DO UPDATE SET matches = matches + 1;
+    END
+    """,
+]
+
+def upgrade():
+    op.create_table(
+        'daily_lead_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('leads', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table(
+        'daily_decision_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('final_decision', sa.String(), nullable=False),
+        sa.Column('analyses', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'final_decision')
+    )
+    op.create_table(
+        'daily_team_match_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('team_member_id', sa.Integer(), nullable=False),
+        sa.Column('matches', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'team_member_id')
+    )
+    for statement in TRIGGERS:
+        op.execute(statement)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_team_matches_daily_stats")
+    op.execute("DROP TRIGGER IF EXISTS trg_analyses_daily_stats")
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_daily_stats")
+    op.drop_table('daily_team_match_stats')
+    op.drop_table('daily_decision_stats')
+    op.drop_table('daily_lead_stats')
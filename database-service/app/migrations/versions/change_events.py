@@ -0,0 +1,78 @@
+# database-service/app/migrations/versions/change_events.py
+"""Add the append-only events table and the triggers that feed it
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+# As shipped with this revision; later revisions replace triggers rather than edit these
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_events_insert AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('lead', 'created', NEW.id, NEW.id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_events_update AFTER UPDATE ON leads
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('lead', 'updated', NEW.id, NEW.id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_events_insert AFTER INSERT ON analyses
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('analysis', 'created', NEW.id, NEW.lead_id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_team_matches_events_insert AFTER INSERT ON team_matches
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('team_match', 'created', NEW.id, NEW.lead_id, CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_team_members_events_insert AFTER INSERT ON team_members
+    BEGIN
+        INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+        VALUES ('team_member', 'created', NEW.id, NULL, CURRENT_TIMESTAMP);
+    END
+    """,
+]
+
+def upgrade():
+    op.create_table(
+        'events',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('lead_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True
+    )
+    for statement in TRIGGERS:
+        op.execute(statement)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_team_members_events_insert")
+    op.execute("DROP TRIGGER IF EXISTS trg_team_matches_events_insert")
+    op.execute("DROP TRIGGER IF EXISTS trg_analyses_events_insert")
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_events_update")
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_events_insert")
+    op.drop_table('events')
@@ -0,0 +1,68 @@
+# database-service/app/migrations/versions/compress_analyses.py
+"""Compress analyses.llm_analysis and analyses.company_details
+
+SQLite stores the compressed BLOBs in the existing columns as-is, so there is
+no DDL; this rewrites rows written before compression, committing every batch
+so the database stays writable while it runs. The service also performs the
+same pass in the background on startup, so running this is optional.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+"""
+
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+# Must match app/compression.py
+MAGIC = b"ZL1"
+MIN_COMPRESS_BYTES = 256
+BATCH_SIZE = 200
+
+def _compress(value):
+    if value is None or isinstance(value, bytes):
+        return value
+    raw = value.encode("utf-8")
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return value
+    return MAGIC + zlib.compress(raw, 6)
+
+def _inflate(value):
+    if isinstance(value, bytes) and value.startswith(MAGIC):
+        return zlib.decompress(value[len(MAGIC):]).decode("utf-8")
+    return value
+
+def _rewrite(transform):
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text(
+                "SELECT id, llm_analysis, company_details FROM analyses "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for row_id, llm_analysis, company_details in rows:
+            conn.execute(
+                sa.text("UPDATE analyses SET llm_analysis = :llm, company_details = :details WHERE id = :id"),
+                {"llm": transform(llm_analysis), "details": transform(company_details), "id": row_id},
+            )
+        conn.commit()
+
+def upgrade():
+    _rewrite(_compress)
+
+def downgrade():
+    _rewrite(_inflate)
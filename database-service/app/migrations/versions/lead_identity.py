@@ -0,0 +1,45 @@
+# database-service/app/migrations/versions/lead_identity.py
+"""Add normalized lead identity columns and their unique index
+
+Existing leads are keyed oldest first; later duplicates of the same prospect
+keep NULL identity columns, which the unique index permits.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+# The 007 lead update trigger, restored on downgrade
+PREVIOUS_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_leads_events_update AFTER UPDATE ON leads
+BEGIN
+    INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+    VALUES ('lead', 'updated', NEW.id, NEW.id, CURRENT_TIMESTAMP);
+END
+"""
+
+def upgrade():
+    from app.dedupe import backfill_dedupe_keys
+    # The 007 lead update trigger fired on any column and would publish an event per backfilled row
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_events_update")
+    op.add_column('leads', sa.Column('email_normalized', sa.String(), nullable=True))
+    op.add_column('leads', sa.Column('company_fingerprint', sa.String(), nullable=True))
+    backfill_dedupe_keys(op.get_bind())
+    op.create_index('ux_leads_identity', 'leads', ['email_normalized', 'company_fingerprint'], unique=True)
+
+def downgrade():
+    op.drop_index('ux_leads_identity', table_name='leads')
+    # Not batch mode: it rebuilds the table, and SQLite drops every trigger on leads with it.
+    # DROP COLUMN needs SQLite 3.35, as INSERT ... RETURNING already does.
+    op.execute("ALTER TABLE leads DROP COLUMN company_fingerprint")
+    op.execute("ALTER TABLE leads DROP COLUMN email_normalized")
+    op.execute(PREVIOUS_TRIGGER)
@@ -0,0 +1,78 @@
+# database-service/app/migrations/versions/lead_search_index.py
+"""Add the lead_search FTS5 index and the triggers that keep it in sync
+
+The analyses triggers call the inflate_text SQL function, which the service
+registers on its own connections. Run `python -m app.search rebuild`
+afterwards to backfill from existing rows.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# Revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# As shipped with this revision; later revisions replace triggers rather than edit these
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS lead_search USING fts5(
+    company_name, message, llm_analysis,
+    tokenize = 'porter unicode61'
+)
+"""
+
+TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_search_insert AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO lead_search (rowid, company_name, message)
+        VALUES (NEW.id, NEW.company_name, NEW.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_search_update AFTER UPDATE OF company_name, message ON leads
+    BEGIN
+        UPDATE lead_search SET company_name = NEW.company_name, message = NEW.message
+        WHERE rowid = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_leads_search_delete AFTER DELETE ON leads
+    BEGIN
+        DELETE FROM lead_search WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_search_insert AFTER INSERT ON analyses
+    BEGIN
+        UPDATE lead_search SET llm_analysis = inflate_text(NEW.llm_analysis)
+        WHERE rowid = NEW.lead_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_search_update AFTER UPDATE OF llm_analysis ON analyses
+    WHEN NEW.id = (SELECT max(id) FROM analyses WHERE lead_id = NEW.lead_id)
+    BEGIN
+        UPDATE lead_search SET llm_analysis = inflate_text(NEW.llm_analysis)
+        WHERE rowid = NEW.lead_id;
+    END
+    """,
+]
+
+def upgrade():
+    op.execute(CREATE_TABLE)
+    for statement in TRIGGERS:
+        op.execute(statement)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_analyses_search_update")
+    op.execute("DROP TRIGGER IF EXISTS trg_analyses_search_insert")
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_search_delete")
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_search_update")
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_search_insert")
+    op.execute("DROP TABLE IF EXISTS lead_search")
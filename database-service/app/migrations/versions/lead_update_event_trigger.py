@@ -0,0 +1,37 @@
+# database-service/app/migrations/versions/lead_update_event_trigger.py
+"""Publish lead "updated" events only for changes to lead fields
+
+Replaces the 007 trigger trg_leads_events_update, which fired on an update
+of any column, with trg_leads_events_update_fields. Revision 008 drops the
+old trigger before backfilling the identity columns, and its downgrade
+restores it; this one creates the replacement.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_leads_events_update_fields
+AFTER UPDATE OF company_name, contact_name, position, email, phone, revenue, service_type, message
+ON leads
+BEGIN
+    INSERT INTO events (entity, action, entity_id, lead_id, created_at)
+    VALUES ('lead', 'updated', NEW.id, NEW.id, CURRENT_TIMESTAMP);
+END
+"""
+
+def upgrade():
+    op.execute(TRIGGER)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_leads_events_update_fields")
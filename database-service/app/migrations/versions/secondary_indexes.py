@@ -0,0 +1,26 @@
+# database-service/app/migrations/versions/secondary_indexes.py
+"""Add secondary indexes for per-lead lookups
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# Revision identifiers
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_leads_email', 'leads', ['email'])
+    # Serves both "analyses for a lead" and "latest analysis for a lead"
+    op.create_index('ix_analyses_lead_id_created_at', 'analyses', ['lead_id', 'created_at'])
+    op.create_index('ix_team_matches_lead_id', 'team_matches', ['lead_id'])
+
+def downgrade():
+    op.drop_index('ix_team_matches_lead_id', table_name='team_matches')
+    op.drop_index('ix_analyses_lead_id_created_at', table_name='analyses')
+    op.drop_index('ix_leads_email', table_name='leads')
@@ -0,0 +1,48 @@
+# database-service/app/migrations/versions/team_match_stats_trigger.py
+"""Count only team matches with a team member in the daily match stats
+
+Replaces trg_team_matches_daily_stats, which also counted matches with a
+NULL team member (each in a row of its own, as NULL never conflicts), with
+a trigger that skips them like the analytics rebuild does.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# Revision identifiers
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+# The 005 definition, restored on downgrade
+PREVIOUS_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_team_matches_daily_stats AFTER INSERT ON team_matches
+BEGIN
+    INSERT INTO daily_team_match_stats (day, team_member_id, matches)
+    VALUES (date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), NEW.team_member_id, 1)
+    ON CONFLICT (day, team_member_id) DO UPDATE SET matches = matches + 1;
+END
+"""
+
+TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_team_matches_daily_stats_assigned AFTER INSERT ON team_matches
+WHEN NEW.team_member_id IS NOT NULL
+BEGIN
+    INSERT INTO daily_team_match_stats (day, team_member_id, matches)
+    VALUES (date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP)), NEW.team_member_id, 1)
+    ON CONFLICT (day, team_member_id) DO UPDATE SET matches = matches + 1;
+END
+"""
+
+def upgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_team_matches_daily_stats")
+    op.execute(TRIGGER)
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS trg_team_matches_daily_stats_assigned")
+    op.execute(PREVIOUS_TRIGGER)
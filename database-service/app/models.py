@@ -1,32 +1,42 @@
 # database-service/app/models.py
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, ForeignKey, Date, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
+
+from .compression import CompressedText, CompressedJSON
 
 Base = declarative_base()
 
 # SQLAlchemy Models
-class Lead(Base):
+# Prefixed with DB so they are not shadowed by the Pydantic schemas below
+class DBLead(Base):
     __tablename__ = "leads"
 
     id = Column(Integer, primary_key=True, index=True)
     company_name = Column(String, nullable=False)
     contact_name = Column(String, nullable=False)
     position = Column(String)
-    email = Column(String, nullable=False)
+    email = Column(String, nullable=False, index=True)
     phone = Column(String)
     revenue = Column(Float)
     service_type = Column(String)
     message = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Identity of the prospect (see dedupe.py); NULL only on duplicates that predate the columns
+    email_normalized = Column(String)
+    company_fingerprint = Column(String)
     
-    analyses = relationship("Analysis", back_populates="lead")
-    team_matches = relationship("TeamMatch", back_populates="lead")
+    analyses = relationship("DBAnalysis", back_populates="lead")
+    team_matches = relationship("DBTeamMatch", back_populates="lead")
+
+    __table_args__ = (
+        Index("ux_leads_identity", "email_normalized", "company_fingerprint", unique=True),
+    )
 
-class TeamMember(Base):
+class DBTeamMember(Base):
     __tablename__ = "team_members"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -35,33 +45,86 @@ class TeamMember(Base):
     skills = Column(JSON)  # List of skills
     role = Column(String)
     expertise_summary = Column(Text)
-    always_notify = Column(Boolean, default=False)
+    always_notify = Column(Boolean, default=False, index=True)
     
-    team_matches = relationship("TeamMatch", back_populates="team_member")
+    team_matches = relationship("DBTeamMatch", back_populates="team_member")
 
-class Analysis(Base):
+class DBAnalysis(Base):
     __tablename__ = "analyses"
 
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"))
-    company_details = Column(JSON)
-    llm_analysis = Column(Text)
+    # Multi-kilobyte LLM output, stored zlib-compressed
+    company_details = Column(CompressedJSON)
+    llm_analysis = Column(CompressedText)
     final_decision = Column(String)  # "Yes", "No", "Maybe"
+    # Hash of everything the analysis was computed from (see the analyzer's AnalyzerService.fingerprint)
+    fingerprint = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    lead = relationship("Lead", back_populates="analyses")
+    lead = relationship("DBLead", back_populates="analyses")
+
+    # Covers lookups by lead and "latest analysis for a lead" in one index
+    __table_args__ = (
+        Index("ix_analyses_lead_id_created_at", "lead_id", "created_at"),
+        Index("ix_analyses_fingerprint", "fingerprint"),
+    )
 
-class TeamMatch(Base):
+class DBTeamMatch(Base):
     __tablename__ = "team_matches"
 
     id = Column(Integer, primary_key=True, index=True)
-    lead_id = Column(Integer, ForeignKey("leads.id"))
+    lead_id = Column(Integer, ForeignKey("leads.id"), index=True)
     team_member_id = Column(Integer, ForeignKey("team_members.id"))
     relevance_score = Column(Float)  # A score indicating how well the team member matches the lead
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    lead = relationship("Lead", back_populates="team_matches")
-    team_member = relationship("TeamMember", back_populates="team_matches")
+    lead = relationship("DBLead", back_populates="team_matches")
+    team_member = relationship("DBTeamMember", back_populates="team_matches")
+
+# Pipeline analytics summary tables, maintained by triggers (see analytics.py)
+class DBDailyLeadStats(Base):
+    __tablename__ = "daily_lead_stats"
+
+    day = Column(Date, primary_key=True)
+    leads = Column(Integer, nullable=False, default=0)
+
+class DBDailyDecisionStats(Base):
+    __tablename__ = "daily_decision_stats"
+
+    day = Column(Date, primary_key=True)
+    final_decision = Column(String, primary_key=True)
+    analyses = Column(Integer, nullable=False, default=0)
+
+class DBDailyTeamMatchStats(Base):
+    __tablename__ = "daily_team_match_stats"
+
+    day = Column(Date, primary_key=True)
+    team_member_id = Column(Integer, primary_key=True)
+    matches = Column(Integer, nullable=False, default=0)
+
+# Append-only change feed, written by triggers (see events.py)
+class DBEvent(Base):
+    __tablename__ = "events"
+    # AUTOINCREMENT so a sequence number is never handed out twice, even after deletes
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String, nullable=False)  # "lead", "analysis", "team_match", "team_member"
+    action = Column(String, nullable=False)  # "created", "updated"
+    entity_id = Column(Integer, nullable=False)
+    lead_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Per-lead analysis leases, so concurrent analyzer workers run one analysis at a time (see locks.py)
+class DBAnalysisLock(Base):
+    __tablename__ = "analysis_locks"
+
+    lead_id = Column(Integer, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    # Set when the owner released the lease after storing this analysis
+    analysis_id = Column(Integer)
 
 # Pydantic Models
 class LeadBase(BaseModel):
@@ -79,11 +142,19 @@ class LeadCreate(LeadBase):
 
 class Lead(LeadBase):
     id: int
+    # Normalized company name (see dedupe.company_fingerprint); NULL on later duplicates of old leads
+    company_fingerprint: Optional[str] = None
     created_at: datetime
 
     class Config:
         orm_mode = True
 
+class LeadUpsertResult(BaseModel):
+    lead: Lead
+    created: bool
+    # Fields the upsert changed on an existing lead; empty means nothing new was learned
+    changed_fields: List[str] = []
+
 class TeamMemberBase(BaseModel):
     name: str
     email: str
@@ -106,6 +177,7 @@ class AnalysisBase(BaseModel):
     company_details: Dict[str, Any]
     llm_analysis: str
     final_decision: str
+    fingerprint: Optional[str] = None
 
 class AnalysisCreate(AnalysisBase):
     pass
@@ -117,6 +189,22 @@ class Analysis(AnalysisBase):
     class Config:
         orm_mode = True
 
+class AnalysisLockRequest(BaseModel):
+    owner: str  # Unique per analysis run
+    ttl_seconds: float = 120
+
+class AnalysisLockRelease(BaseModel):
+    owner: str
+    # The analysis the run stored; None if it failed
+    analysis_id: Optional[int] = None
+
+class AnalysisLock(BaseModel):
+    lead_id: int
+    owner: str
+    expires_at: datetime
+    analysis_id: Optional[int] = None
+    held: bool  # The lease hasn't expired or been released
+
 class TeamMatchBase(BaseModel):
     lead_id: int
     team_member_id: int
@@ -130,4 +218,70 @@ class TeamMatch(TeamMatchBase):
     created_at: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+class RankedMatch(BaseModel):
+    team_member_id: int
+    relevance_score: float
+
+class TeamMatchBulkCreate(BaseModel):
+    """A lead's full ranked match list, stored in one statement"""
+    lead_id: int
+    matches: List[RankedMatch]
+
+class TeamMatchWithMember(TeamMatch):
+    team_member: TeamMember
+
+class LeadBundle(BaseModel):
+    """Everything needed to brief the team on a lead, in one response"""
+    lead: Lead
+    analysis: Optional[Analysis] = None
+    team_matches: List[TeamMatchWithMember]
+    default_recipients: List[TeamMember]
+
+class AnalyticsBucket(BaseModel):
+    start: date
+    leads: int
+    decisions: Dict[str, int]
+    matches: int
+    matches_by_team_member: Dict[int, int]
+
+class AnalyticsSummary(BaseModel):
+    bucket: str
+    start: date
+    end: date
+    buckets: List[AnalyticsBucket]
+
+class SearchHit(BaseModel):
+    lead_id: int
+    company_name: Optional[str] = None
+    score: float  # bm25, lower is more relevant
+    snippet: Optional[str] = None
+
+class SearchResults(BaseModel):
+    query: str
+    hits: List[SearchHit]
+    next_offset: Optional[int] = None
+
+class Event(BaseModel):
+    seq: int
+    entity: str
+    action: str
+    entity_id: int
+    lead_id: Optional[int] = None
+    created_at: datetime
+
+class EventPage(BaseModel):
+    events: List[Event]
+    last_seq: int  # Pass back as `after` to continue from here
+
+class BulkRowError(BaseModel):
+    row: int
+    errors: List[Dict[str, Any]]
+
+class BulkIngestResult(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    duplicates: int = 0  # Rows skipped because the lead already exists
+    errors: List[BulkRowError]
+    errors_truncated: bool = False
@@ -0,0 +1,57 @@
+# database-service/app/pagination.py
+import base64
+import json
+from typing import AsyncIterator, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy.future import select
+
+from .database import async_session
+
+# Rows fetched per round trip when streaming a full export
+EXPORT_CHUNK_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_id: int) -> str:
+    """Build an opaque continuation token pointing just past `last_id`"""
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(model, cursor: Optional[str], limit: int):
+    """Select one page ordered by primary key, starting after the cursor.
+
+    `id` is assigned in insertion order, so it also orders rows by `created_at`
+    while letting SQLite seek straight to the page through the primary key.
+    """
+    query = select(model).order_by(model.id).limit(limit)
+    if cursor:
+        query = query.where(model.id > decode_cursor(cursor))
+    return query
+
+
+async def stream_ndjson(model, schema: Type[BaseModel], chunk_size: int = EXPORT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield every row of `model` as NDJSON, holding at most one chunk of rows in memory"""
+    # The request-scoped session may be closed before the body is fully sent, so use our own
+    async with async_session() as session:
+        # Plain column rows rather than ORM objects, so nothing accumulates in the identity map
+        result = await session.stream(
+            select(*model.__table__.columns).order_by(model.id).execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield b"".join(
+                schema.model_validate(row, from_attributes=True).model_dump_json().encode() + b"\n"
+                for row in rows
+            )
@@ -0,0 +1,217 @@
+# database-service/app/profiling.py
+"""Per-endpoint query profiling and slow-query log.
+
+SQLAlchemy cursor events time every statement and attribute it to the HTTP
+route being served (set by EndpointContextMiddleware through a contextvar).
+The group-commit writer runs each queued insert under the endpoint that
+submitted it (`attribute_queries`). Other statements issued outside a
+request, e.g. by the background recompression task, are attributed to
+BACKGROUND.
+
+Latencies go into fixed-bucket histograms, so memory is bounded by the number
+of routes rather than by traffic. Statements slower than DB_SLOW_QUERY_MS are
+always logged and kept in a bounded ring; histogram updates are sampled at
+DB_QUERY_SAMPLE_RATE. The collected data is served at GET /debug/queries.
+"""
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+SAMPLE_RATE = float(os.getenv("DB_QUERY_SAMPLE_RATE", "1.0"))
+
+# Upper bounds (ms) of the latency buckets; anything slower lands in the last, open bucket
+BUCKET_BOUNDS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Slow statements remembered for /debug/queries
+SLOW_LOG_SIZE = 200
+
+# Statement text is truncated in the slow log; bound parameters are never recorded
+MAX_STATEMENT_CHARS = 500
+
+BACKGROUND = "<background>"
+
+_current_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("query_profiling_scope", default=None)
+# Overrides the request scope, for work done on behalf of a request in another task
+_attributed_endpoint: ContextVar[Optional[str]] = ContextVar("query_profiling_endpoint", default=None)
+
+
+def current_endpoint() -> str:
+    endpoint = _attributed_endpoint.get()
+    if endpoint is not None:
+        return endpoint
+    scope = _current_scope.get()
+    if scope is None:
+        return BACKGROUND
+    # FastAPI's router adds scope["route"] to the same dict once the request is matched.
+    # The route template, not the raw path, keeps the number of histograms bounded.
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "<unmatched>"
+    return f"{scope.get('method', '')} {path}"
+
+
+@contextmanager
+def attribute_queries(endpoint: str) -> Iterator[None]:
+    """Attribute statements run inside the block to `endpoint`, as returned by current_endpoint()"""
+    token = _attributed_endpoint.set(endpoint)
+    try:
+        yield
+    finally:
+        _attributed_endpoint.reset(token)
+
+
+class EndpointContextMiddleware:
+    """Plain ASGI middleware that makes the current request visible to the query hooks"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+@dataclass
+class EndpointStats:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(BUCKET_BOUNDS_MS) + 1))
+
+    def record(self, elapsed_ms: float, rows: Optional[int]):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if rows is not None and rows > 0:
+            self.rows += rows
+        for index, bound in enumerate(BUCKET_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given percentile (None if it is the open bucket)"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets[:-1]):
+            seen += bucket_count
+            if seen >= target:
+                return BUCKET_BOUNDS_MS[index]
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}ms" for bound in BUCKET_BOUNDS_MS] + [f"gt_{BUCKET_BOUNDS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "rows": self.rows,
+            "buckets": dict(zip(labels, self.buckets)),
+        }
+
+
+class QueryProfiler:
+    def __init__(self, slow_query_ms: float = SLOW_QUERY_MS, sample_rate: float = SAMPLE_RATE):
+        self.slow_query_ms = slow_query_ms
+        self.sample_rate = sample_rate
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.slow_queries: deque = deque(maxlen=SLOW_LOG_SIZE)
+        self.statements = 0
+
+    def instrument(self, engine):
+        """Attach the timing hooks to an AsyncEngine"""
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_execute)
+        event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        self.statements += 1
+        slow = elapsed_ms >= self.slow_query_ms
+        if not slow and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        rows = _row_count(cursor)
+        endpoint = current_endpoint()
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+        stats.record(elapsed_ms, rows)
+
+        if slow:
+            self.slow_queries.append({
+                "at": datetime.utcnow().isoformat(),
+                "endpoint": endpoint,
+                "duration_ms": round(elapsed_ms, 3),
+                "rows": rows,
+                "executemany": executemany,
+                "statement": " ".join(statement.split())[:MAX_STATEMENT_CHARS],
+            })
+            logger.warning(f"Slow query ({elapsed_ms:.1f} ms) in {endpoint}: {' '.join(statement.split())[:200]}")
+
+    def _on_error(self, exception_context):
+        # after_cursor_execute doesn't fire for a failed statement, drop its start time
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    def reset(self):
+        self.endpoints.clear()
+        self.slow_queries.clear()
+        self.statements = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_query_ms": self.slow_query_ms,
+            "statements": self.statements,
+            "endpoints": {
+                endpoint: stats.to_dict()
+                for endpoint, stats in sorted(self.endpoints.items(), key=lambda item: -item[1].total_ms)
+            },
+            "slow_queries": list(reversed(self.slow_queries)),
+        }
+
+
+def _row_count(cursor) -> Optional[int]:
+    """Rows returned by a SELECT (or RETURNING) or affected by an UPDATE or DELETE, when known"""
+    if cursor.description is None:
+        return cursor.rowcount if cursor.rowcount >= 0 else None
+    # rowcount is -1 for statements that return rows. The aiosqlite adapter fetches all of
+    # them during execute() and buffers them on the cursor, so they can be counted here;
+    # streamed (server-side) results are fetched later and are not counted.
+    if getattr(cursor, "server_side", False):
+        return None
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if isinstance(rows, list) else None
+
+
+profiler = QueryProfiler()
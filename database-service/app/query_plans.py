@@ -0,0 +1,148 @@
+# database-service/app/query_plans.py
+"""Query-plan regression check for the database service.
+
+Drives every GET route against a scratch SQLite database, captures the
+statements the service issues, and runs EXPLAIN QUERY PLAN on each one.
+Any full table scan that is not explicitly allowed fails the run, as does
+a GET route that has no entry in PLAN_CHECKS.
+
+Usage: python -m app.query_plans
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Tuple
+
+
+@dataclass
+class PlanCheck:
+    route: str  # Route template as registered on the app
+    path: str  # Concrete path that exercises it
+    # Tables this route may legitimately walk in full, e.g. an export or a LIMITed walk of the primary key
+    allowed_scans: Tuple[str, ...] = field(default_factory=tuple)
+
+
+PLAN_CHECKS: List[PlanCheck] = [
+    PlanCheck("/leads/{lead_id}", "/leads/1"),
+    # First page walks the primary key in order and stops at LIMIT
+    PlanCheck("/leads/", "/leads/?limit=10", allowed_scans=("leads",)),
+    PlanCheck("/leads/", "/leads/?ids=1,2"),
+    PlanCheck("/leads/export", "/leads/export", allowed_scans=("leads",)),
+    PlanCheck("/leads/{lead_id}/bundle", "/leads/1/bundle"),
+    PlanCheck("/team-members/{team_member_id}", "/team-members/1"),
+    PlanCheck("/team-members/", "/team-members/?limit=10", allowed_scans=("team_members",)),
+    PlanCheck("/team-members/", "/team-members/?ids=1"),
+    PlanCheck("/team-members/export", "/team-members/export", allowed_scans=("team_members",)),
+    PlanCheck("/team-members/default-recipients", "/team-members/default-recipients"),
+    PlanCheck("/analyses/{lead_id}", "/analyses/1"),
+    PlanCheck("/analyses/by-fingerprint/{fingerprint}", "/analyses/by-fingerprint/abc"),
+    PlanCheck("/locks/analysis/{lead_id}", "/locks/analysis/1"),
+    PlanCheck("/team-matches/{lead_id}", "/team-matches/1"),
+    PlanCheck("/analytics", "/analytics?bucket=week"),
+    PlanCheck("/search", "/search?q=acme"),
+    PlanCheck("/events", "/events?after=0"),
+]
+
+# GET routes that never touch the database
+NO_QUERY_ROUTES = {"/debug/cache", "/debug/queries"}
+
+SEED_REQUESTS: List[Tuple[str, Dict[str, Any]]] = [
+    ("/team-members/", {
+        "name": "Plan Check", "email": "plan-check@example.com", "skills": ["seo"],
+        "role": "Strategist", "expertise_summary": "n/a", "always_notify": True,
+    }),
+    ("/leads/", {"company_name": "Acme", "contact_name": "Jane Doe", "email": "jane@acme.test"}),
+    ("/leads/upsert", {"company_name": "Acme Inc.", "contact_name": "Jane Doe", "email": "Jane@acme.test", "phone": "555"}),
+    ("/analyses/", {"lead_id": 1, "company_details": {}, "llm_analysis": "n/a", "final_decision": "Yes", "fingerprint": "abc"}),
+    ("/team-matches/", {"lead_id": 1, "team_member_id": 1, "relevance_score": 0.9}),
+    ("/locks/analysis/1", {"owner": "plan-check"}),
+    ("/locks/analysis/1/release", {"owner": "plan-check", "analysis_id": 1}),
+]
+
+
+def _is_query(statement: str) -> bool:
+    return statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def _scanned_tables(conn: sqlite3.Connection, statement: str, parameters) -> List[str]:
+    """Return the tables a statement reads with a full scan"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        # e.g. "SCAN leads", "SCAN leads USING INDEX ix_x"; covering-index and rowid seeks report SEARCH.
+        # FTS5 lookups report "SCAN <table> VIRTUAL TABLE INDEX ..." but go through the full-text index.
+        if detail.startswith("SCAN ") and "VIRTUAL TABLE INDEX" not in detail:
+            scans.append(detail.split()[1])
+    return scans
+
+
+def run_checks() -> List[str]:
+    workdir = tempfile.mkdtemp(prefix="query-plans-")
+    db_path = os.path.join(workdir, "plans.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+
+    # Imported late so the engine binds to the scratch database
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from .database import engine, read_engine
+    from .main import app
+
+    captured: List[Tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and _is_query(statement):
+            captured.append((statement, parameters))
+
+    for bound_engine in (engine, read_engine):
+        event.listen(bound_engine.sync_engine, "before_cursor_execute", capture)
+
+    failures: List[str] = []
+
+    get_routes = {
+        route.path for route in app.routes
+        if isinstance(route, APIRoute) and "GET" in route.methods
+    }
+    unchecked = get_routes - NO_QUERY_ROUTES - {check.route for check in PLAN_CHECKS}
+    for route in sorted(unchecked):
+        failures.append(f"{route}: GET route has no PLAN_CHECKS entry")
+
+    with TestClient(app) as client:
+        plan_conn = sqlite3.connect(db_path)
+
+        for path, payload in SEED_REQUESTS:
+            captured.clear()
+            response = client.post(path, json=payload)
+            if response.status_code != 200:
+                failures.append(f"POST {path}: seeding failed with {response.status_code}")
+            for statement, parameters in captured:
+                for table in _scanned_tables(plan_conn, statement, parameters):
+                    failures.append(f"POST {path}: full scan of {table}\n    {statement}")
+
+        for check in PLAN_CHECKS:
+            captured.clear()
+            response = client.get(check.path)
+            if response.status_code != 200:
+                failures.append(f"GET {check.path}: returned {response.status_code}")
+            if not captured:
+                failures.append(f"GET {check.path}: issued no queries")
+            for statement, parameters in captured:
+                for table in _scanned_tables(plan_conn, statement, parameters):
+                    if table not in check.allowed_scans:
+                        failures.append(f"GET {check.path}: full scan of {table}\n    {statement}")
+
+        plan_conn.close()
+
+    return failures
+
+
+if __name__ == "__main__":
+    failures = run_checks()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(PLAN_CHECKS)} routes checked, no unexpected table scans")
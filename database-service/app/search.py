@@ -0,0 +1,211 @@
+# database-service/app/search.py
+"""Full-text search over leads and their latest analysis, backed by SQLite FTS5.
+
+`lead_search` holds one row per lead (rowid = lead id) and is kept in sync by
+triggers on leads and analyses. analyses.llm_analysis is stored compressed, so
+the triggers call the `inflate_text` SQL function that database.py registers
+on every connection; writes to analyses must go through the service's engines.
+
+Rebuild the index from existing data with: python -m app.search rebuild
+"""
+import asyncio
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import SearchHit, SearchResults
+
+SEARCH_TABLE = "lead_search"
+
+# Highlight markers around matched terms in snippets
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_TOKENS = 16
+
+# Broad queries are ranked among this many of their newest matches; older matches follow unranked
+RANK_CANDIDATES = 2000
+
+CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    company_name, message, llm_analysis,
+    tokenize = 'porter unicode61'
+)
+"""
+
+# Only the latest analysis of a lead is indexed
+_IS_LATEST_ANALYSIS = "NEW.id = (SELECT max(id) FROM analyses WHERE lead_id = NEW.lead_id)"
+
+TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_leads_search_insert AFTER INSERT ON leads
+    BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, company_name, message)
+        VALUES (NEW.id, NEW.company_name, NEW.message);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_leads_search_update AFTER UPDATE OF company_name, message ON leads
+    BEGIN
+        UPDATE {SEARCH_TABLE} SET company_name = NEW.company_name, message = NEW.message
+        WHERE rowid = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_leads_search_delete AFTER DELETE ON leads
+    BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_search_insert AFTER INSERT ON analyses
+    BEGIN
+        UPDATE {SEARCH_TABLE} SET llm_analysis = inflate_text(NEW.llm_analysis)
+        WHERE rowid = NEW.lead_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_analyses_search_update AFTER UPDATE OF llm_analysis ON analyses
+    WHEN {_IS_LATEST_ANALYSIS}
+    BEGIN
+        UPDATE {SEARCH_TABLE} SET llm_analysis = inflate_text(NEW.llm_analysis)
+        WHERE rowid = NEW.lead_id;
+    END
+    """,
+]
+
+REBUILD_STATEMENTS = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, company_name, message, llm_analysis)
+    SELECT leads.id, leads.company_name, leads.message, inflate_text(analyses.llm_analysis)
+    FROM leads
+    LEFT JOIN analyses ON analyses.id = (
+        SELECT max(id) FROM analyses WHERE analyses.lead_id = leads.id
+    )
+    """,
+]
+
+
+def create_search_index(conn):
+    """Create the FTS table and its triggers, backfilling if the table is new"""
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).first()
+    conn.exec_driver_sql(CREATE_TABLE)
+    for statement in TRIGGERS:
+        conn.exec_driver_sql(statement)
+    if not exists:
+        for statement in REBUILD_STATEMENTS:
+            conn.exec_driver_sql(statement)
+
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query.
+
+    Every word (or "quoted phrase") becomes a quoted FTS5 string, ANDed
+    together, so user input can never be parsed as FTS5 operators. A trailing
+    `*` is kept as a prefix match.
+    """
+    terms: List[str] = []
+    for phrase, word in _TERM.findall(query):
+        term = phrase or word
+        prefix = term.endswith("*") and not phrase
+        term = term.rstrip("*") if prefix else term
+        if not term.strip():
+            continue
+        quoted = '"' + term.replace('"', '""') + '"'
+        terms.append(quoted + "*" if prefix else quoted)
+    return " ".join(terms)
+
+
+async def _rank_floor(db: AsyncSession, match: str, candidates: int) -> int:
+    """Lowest rowid among the newest `candidates` matches, or 0 if fewer match"""
+    result = await db.execute(
+        text(f"""
+            SELECT rowid FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH :match
+            ORDER BY rowid DESC
+            LIMIT 1 OFFSET :skip
+        """),
+        {"match": match, "skip": candidates - 1},
+    )
+    return result.scalar() or 0
+
+
+async def _search_page(
+    db: AsyncSession, params: dict, where: str, order: str, limit: int, offset: int
+) -> List[SearchHit]:
+    result = await db.execute(
+        text(f"""
+            SELECT rowid AS lead_id,
+                   company_name,
+                   bm25({SEARCH_TABLE}) AS score,
+                   snippet({SEARCH_TABLE}, -1, :start, :end, '…', :tokens) AS snippet
+            FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH :match AND {where}
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+        """),
+        {**params, "limit": limit, "offset": offset},
+    )
+    return [SearchHit(**row) for row in result.mappings()]
+
+
+async def search_leads(db: AsyncSession, query: str, limit: int, offset: int) -> SearchResults:
+    match = build_match_query(query)
+    if not match:
+        return SearchResults(query=query, hits=[], next_offset=None)
+
+    # bm25 scores every matching row before sorting, so a term that appears in most
+    # leads costs a full index pass. Walking the doclist newest-first is cheap, so
+    # rank only the newest RANK_CANDIDATES matches and list older ones after them,
+    # newest first. The window depends on the query alone, never on the page, so
+    # paging through a query neither repeats nor skips a match; selective queries
+    # are ranked in full.
+    floor = await _rank_floor(db, match, RANK_CANDIDATES)
+    params = {
+        "match": match, "floor": floor, "start": SNIPPET_START, "end": SNIPPET_END,
+        "tokens": SNIPPET_TOKENS,
+    }
+
+    hits: List[SearchHit] = []
+    if not floor or offset < RANK_CANDIDATES:
+        hits = await _search_page(db, params, "rowid >= :floor", "rank", limit, offset)
+    if floor and len(hits) < limit:
+        # Past the ranked window, which holds exactly RANK_CANDIDATES matches
+        hits += await _search_page(
+            db, params, "rowid < :floor", "rowid DESC", limit - len(hits), max(offset - RANK_CANDIDATES, 0)
+        )
+    return SearchResults(
+        query=query,
+        hits=hits,
+        next_offset=offset + limit if len(hits) == limit else None,
+    )
+
+
+async def rebuild(engine) -> None:
+    async with engine.begin() as conn:
+        for statement in REBUILD_STATEMENTS:
+            await conn.exec_driver_sql(statement)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.search rebuild")
+        sys.exit(2)
+
+    from .database import engine, init_db
+
+    async def main():
+        await init_db()
+        await rebuild(engine)
+        print("Search index rebuilt")
+
+    asyncio.run(main())
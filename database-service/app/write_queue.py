@@ -0,0 +1,171 @@
+# database-service/app/write_queue.py
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import write_session
+from .events import broker
+from .profiling import attribute_queries, current_endpoint
+
+logger = logging.getLogger(__name__)
+
+# How long the writer waits for more inserts to join a batch once the first one arrives
+GROUP_COMMIT_WINDOW = 0.005  # seconds
+GROUP_COMMIT_MAX_BATCH = 256
+
+
+@dataclass
+class _PendingWrite:
+    model: Any
+    values: List[Dict[str, Any]]
+    future: asyncio.Future
+    # Route that queued the write, so its statements are profiled under that route
+    endpoint: str
+
+
+class GroupCommitWriter:
+    """Single-writer commit queue.
+
+    Inserts submitted concurrently are collected for up to `window` seconds
+    and committed together in one transaction (one fsync), then each caller
+    gets back its own persisted rows. Rows are written with INSERT ... RETURNING,
+    one statement per model and submitting route per batch, so ids and defaults come back without a
+    follow-up SELECT. If the shared transaction fails, every
+    insert in the batch is retried in its own transaction so one bad row only
+    fails its own caller.
+    """
+
+    def __init__(self, session_factory=write_session, window: float = GROUP_COMMIT_WINDOW,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush whatever is queued, then stop the writer task"""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, model, values: Dict[str, Any]):
+        """Queue an insert of `model(**values)` and wait for it to be committed"""
+        rows = await self.submit_many(model, [values])
+        return rows[0]
+
+    async def submit_many(self, model, values: List[Dict[str, Any]]):
+        """Queue several rows that must land in the same transaction; returns them in order"""
+        if self._task is None:
+            raise RuntimeError("GroupCommitWriter is not running")
+        if not values:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingWrite(model, values, future, current_endpoint()))
+        return await future
+
+    async def _collect(self) -> List[_PendingWrite]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            # Take everything already queued without waiting, then wait out the window
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                logger.error(f"Group commit of {len(batch)} rows failed: {str(e)}")
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _insert(self, session, batch: List[_PendingWrite]) -> List[List[Any]]:
+        """Insert every pending write, one INSERT ... RETURNING per model and endpoint; returns rows per item"""
+        # A model is written by few routes, so splitting by endpoint costs few extra statements
+        groups: Dict[Tuple[Any, str], List[_PendingWrite]] = {}
+        for item in batch:
+            groups.setdefault((item.model, item.endpoint), []).append(item)
+
+        results: Dict[int, List[Any]] = {}
+        for (model, endpoint), items in groups.items():
+            values = [row for item in items for row in item.values]
+            with attribute_queries(endpoint):
+                result = await session.scalars(insert(model).returning(model), values)
+            # SQLite doesn't promise RETURNING order, but it hands out INTEGER PRIMARY KEY
+            # values in VALUES order and we are the only writer, so id order is input order
+            rows = sorted(result.all(), key=lambda row: row.id)
+            offset = 0
+            for item in items:
+                results[id(item)] = rows[offset:offset + len(item.values)]
+                offset += len(item.values)
+        return [results[id(item)] for item in batch]
+
+    async def _commit(self, batch: List[_PendingWrite]):
+        try:
+            async with self.session_factory() as session:
+                rows = await self._insert(session, batch)
+                await session.commit()
+        except SQLAlchemyError:
+            # Isolate the failing insert(s) so the rest of the batch still lands
+            await self._commit_individually(batch)
+            return
+
+        self.batches += 1
+        self.rows += sum(len(item_rows) for item_rows in rows)
+        broker.notify()
+        for item, item_rows in zip(batch, rows):
+            if not item.future.done():
+                item.future.set_result(item_rows)
+
+    async def _commit_individually(self, batch: List[_PendingWrite]):
+        for item in batch:
+            try:
+                async with self.session_factory() as session:
+                    [rows] = await self._insert(session, [item])
+                    await session.commit()
+            except SQLAlchemyError as e:
+                if not item.future.done():
+                    item.future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(rows)
+            broker.notify()
+            if not item.future.done():
+                item.future.set_result(rows)
+
+
+writer = GroupCommitWriter()
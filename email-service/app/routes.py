@@ -4,7 +4,7 @@ from typing import List, Optional
 import logging
 
 from app.models import EmailRequest, EmailResponse
-from app.services.email_service import EmailService
+from app.services.email_service import EmailService, NO_ANALYSIS
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -78,8 +78,9 @@ async def preview_email_template(
 ):
     """Preview the email template for a lead without sending it"""
     try:
-        lead_details = await email_service.get_lead_details(lead_id)
-        lead_analysis = await email_service.get_lead_analysis(lead_id)
+        bundle = await email_service.get_lead_bundle(lead_id)
+        lead_details = bundle["lead"]
+        lead_analysis = bundle["analysis"] or dict(NO_ANALYSIS)
         
         html_content = await email_service.render_email_template(
             lead_details, 
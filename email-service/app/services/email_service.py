@@ -28,6 +28,9 @@ EMAIL_FROM = os.environ.get("EMAIL_FROM")
 DATABASE_SERVICE_URL = os.environ.get("DATABASE_SERVICE_URL")
 TEAM_MATCHER_URL = os.environ.get("TEAM_MATCHER_URL")
 
+# Shown in place of the analysis when the lead hasn't been analyzed
+NO_ANALYSIS = {"company_details": "Not available", "llm_analysis": "Not available", "final_decision": "Unknown"}
+
 # Configure Jinja2 environment
 template_env = Environment(loader=FileSystemLoader("app/templates"))
 
@@ -44,38 +47,27 @@ class EmailService:
                 logger.error(f"Error fetching lead details: {str(e)}")
                 raise HTTPException(status_code=404, detail=f"Lead not found: {str(e)}")
 
-    async def get_lead_analysis(self, lead_id: int) -> Dict[str, Any]:
-        """Fetch lead analysis from the database service"""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(f"{DATABASE_SERVICE_URL}/analyses/{lead_id}")
-                response.raise_for_status()
-                return response.json()
-            except httpx.HTTPError as e:
-                logger.error(f"Error fetching lead analysis: {str(e)}")
-                return {"company_details": "Not available", "llm_analysis": "Not available", "final_decision": "Unknown"}
-
-    async def get_matched_team_members(self, lead_id: int) -> List[Dict[str, Any]]:
-        """Fetch matched team members from the team-matcher service"""
+    async def get_lead_bundle(self, lead_id: int) -> Dict[str, Any]:
+        """Fetch the lead, its latest analysis, team matches and default recipients in one call"""
         async with httpx.AsyncClient() as client:
             try:
-                response = await client.get(f"{TEAM_MATCHER_URL}/match/{lead_id}")
+                response = await client.get(f"{DATABASE_SERVICE_URL}/leads/{lead_id}/bundle")
                 response.raise_for_status()
                 return response.json()
             except httpx.HTTPError as e:
-                logger.error(f"Error fetching matched team members: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Error fetching team members: {str(e)}")
+                logger.error(f"Error fetching lead bundle: {str(e)}")
+                raise HTTPException(status_code=404, detail=f"Lead not found: {str(e)}")
 
-    async def get_default_recipients(self) -> List[Dict[str, Any]]:
-        """Fetch default recipients who always receive briefs"""
+    async def get_lead_analysis(self, lead_id: int) -> Dict[str, Any]:
+        """Fetch lead analysis from the database service"""
         async with httpx.AsyncClient() as client:
             try:
-                response = await client.get(f"{DATABASE_SERVICE_URL}/team-members/default-recipients")
+                response = await client.get(f"{DATABASE_SERVICE_URL}/analyses/{lead_id}")
                 response.raise_for_status()
                 return response.json()
             except httpx.HTTPError as e:
-                logger.error(f"Error fetching default recipients: {str(e)}")
-                return []
+                logger.error(f"Error fetching lead analysis: {str(e)}")
+                return dict(NO_ANALYSIS)
 
     async def generate_email_subject(self, lead_details: Dict[str, Any]) -> str:
         """Generate an email subject using Gemini AI"""
@@ -195,15 +187,16 @@ class EmailService:
                                cc_emails: Optional[List[str]] = None,
                                include_default_recipients: bool = True) -> Dict[str, Any]:
         """Process and send email for a lead"""
-        # Get all required data
-        lead_details = await self.get_lead_details(lead_id)
-        lead_analysis = await self.get_lead_analysis(lead_id)
-        matched_team_members = await self.get_matched_team_members(lead_id)
+        # Get all required data in a single round trip
+        bundle = await self.get_lead_bundle(lead_id)
+        lead_details = bundle["lead"]
+        lead_analysis = bundle["analysis"] or dict(NO_ANALYSIS)
+        matched_team_members = [match["team_member"] for match in bundle["team_matches"]]
         
         # Get default recipients if needed
         default_recipients = []
         if include_default_recipients:
-            default_recipients = await self.get_default_recipients()
+            default_recipients = bundle["default_recipients"]
         
         # Combine all recipients
         recipients = [member["email"] for member in matched_team_members]
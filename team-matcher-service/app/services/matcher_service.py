@@ -145,10 +145,31 @@ class MatcherService:
         # Return top 3 matches
         return results[:3]
     
+    async def save_matches(self, lead_id: int, matches: List[Dict[str, Any]]) -> None:
+        """Store the ranked match list in the database service in a single write"""
+        async with httpx.AsyncClient() as client:
+            response = await client.post(
+                f"{self.database_url}/team-matches/bulk",
+                json={
+                    "lead_id": lead_id,
+                    "matches": [
+                        {"team_member_id": match["team_member_id"], "relevance_score": match["relevance_score"]}
+                        for match in matches
+                    ]
+                }
+            )
+            if response.status_code != 200:
+                raise ValueError(f"Failed to save team matches: {response.text}")
+    
     async def match_team_to_lead(self, lead_id: int, analysis_context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Match a team to a lead and return the result"""
         matches = await self.find_matches(lead_id, analysis_context)
         
+        try:
+            await self.save_matches(lead_id, matches)
+        except Exception as e:
+            print(f"Error saving team matches: {str(e)}")
+        
         return {
             "lead_id": lead_id,
             "matches": matches